@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Delta Chat MCP - Database probing benchmark
+Creates candidate files (Delta Chat databases, other SQLite databases and
+non-database files) and compares the old probing approach, two plain
+read-write connections per file, with the read-only single-pass probe.
+
+Usage: python benchmarks/bench_db_probe.py [--files 1000]
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deltachat_mcp.db_discovery import has_sqlite_header, probe_database  # noqa: E402
+
+
+def make_candidates(directory: Path, count: int):
+    paths = []
+    for i in range(count):
+        path = directory / f"candidate-{i}.db"
+        kind = i % 3
+        if kind == 2:
+            path.write_bytes(b"not a database " * 64)
+        else:
+            conn = sqlite3.connect(str(path))
+            if kind == 0:
+                conn.execute("CREATE TABLE config (key TEXT, value TEXT)")
+                conn.execute("CREATE TABLE chats (id INTEGER)")
+                conn.execute("INSERT INTO config VALUES ('addr', 'bot@example.org')")
+            else:
+                conn.execute("CREATE TABLE notes (body TEXT)")
+            conn.commit()
+            conn.close()
+        paths.append(path)
+    return paths
+
+
+def legacy_probe(path: Path):
+    """Previous behaviour: table check and config read on separate connections"""
+    try:
+        conn = sqlite3.connect(str(path))
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        conn.close()
+        if sum(1 for t in tables if any(h in t.lower() for h in ('config', 'chats', 'msgs'))) < 2:
+            return None
+        conn = sqlite3.connect(str(path))
+        rows = conn.execute("SELECT key, value FROM config").fetchall()
+        conn.close()
+        return rows
+    except sqlite3.Error:
+        return None
+
+
+def new_probe(path: Path):
+    if not has_sqlite_header(path):
+        return None
+    result = probe_database(path)
+    return result['config'] if result['is_delta_chat'] else None
+
+
+def bench(name, probe, paths):
+    start = time.perf_counter()
+    hits = sum(1 for path in paths if probe(path) is not None)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:>9.1f} ms total  {elapsed / len(paths) * 1e6:>8.1f} us/file  {hits} hits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark probing of candidate Delta Chat databases")
+    parser.add_argument("--files", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        paths = make_candidates(directory, args.files)
+        print(f"Probing {len(paths)} candidate files\n")
+
+        bench("legacy (2 rw connections)", legacy_probe, paths)
+        bench("read-only probe (cold)", new_probe, paths)
+        bench("read-only probe (cached)", new_probe, paths)
+
+        journals = [p for p in directory.iterdir() if p.name.endswith(('-journal', '-wal', '-shm'))]
+        print(f"\nJournal/WAL files left behind: {len(journals)}")
+
+
+if __name__ == "__main__":
+    main()
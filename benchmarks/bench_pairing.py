@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Delta Chat MCP - Discovery and pairing benchmark with local fake peers
+Starts fake Delta Chat WebSocket peers on loopback aliases (127.0.0.x, which
+Linux routes to lo without any setup) in a child process. Some accept the
+pairing request, some reject it and some accept the TCP connection but never
+answer (blackhole). NetworkDiscovery and AutoPairing are then driven end to
+end against them, and the harness reports time-to-first-discovery,
+time-to-pair, CPU time and peak open sockets. No network access is needed.
+
+Usage: python benchmarks/bench_pairing.py [--accept 1] [--reject 3] [--blackhole 3]
+                                          [--ports 42654,42655] [--network 127.0.0.0/24]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deltachat_mcp.config import Config  # noqa: E402
+from deltachat_mcp.pairing import AutoPairing, NetworkDiscovery  # noqa: E402
+
+NODE_ID = "bench-node"
+
+
+def peer_layout(args):
+    """Assign each fake peer a loopback alias and a port, round robin over the ports"""
+    kinds = ["accept"] * args.accept + ["reject"] * args.reject + ["blackhole"] * args.blackhole
+    return [{"kind": kind, "ip": f"127.0.0.{10 + i}", "port": args.ports[i % len(args.ports)]}
+            for i, kind in enumerate(kinds)]
+
+
+async def serve_peers(peers, accept_delay, ready, stop):
+    import websockets
+
+    async def pairing_handler(websocket, kind):
+        request = json.loads(await websocket.recv())
+        if kind == "accept" and request.get("node_id") == NODE_ID:
+            await asyncio.sleep(accept_delay)
+            await websocket.send(json.dumps({"type": "pairing_accepted"}))
+        else:
+            await websocket.send(json.dumps({"type": "pairing_rejected", "error": "not in pairing mode"}))
+
+    async def blackhole(reader, writer):
+        await reader.read()  # Hold the connection open, never answer
+        writer.close()
+
+    servers = []
+    for peer in peers:
+        if peer["kind"] == "blackhole":
+            servers.append(await asyncio.start_server(blackhole, peer["ip"], peer["port"]))
+        else:
+            handler = (lambda kind: lambda ws: pairing_handler(ws, kind))(peer["kind"])
+            servers.append(await websockets.serve(handler, peer["ip"], peer["port"]))
+    ready.set()
+    while not stop.is_set():
+        await asyncio.sleep(0.05)
+    for server in servers:
+        server.close()
+
+
+def peer_process(peers, accept_delay, ready, stop):
+    asyncio.run(serve_peers(peers, accept_delay, ready, stop))
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return 0
+
+
+class Usage:
+    """Wall time, CPU time and peak open descriptors of one phase"""
+
+    def __init__(self, name):
+        self.name = name
+        self.peak_fds = 0
+
+    async def _sample(self):
+        while True:
+            self.peak_fds = max(self.peak_fds, open_fds())
+            await asyncio.sleep(0.002)
+
+    async def __aenter__(self):
+        self._baseline_fds = open_fds()
+        self._rusage = resource.getrusage(resource.RUSAGE_SELF)
+        self._start = time.perf_counter()
+        self._sampler = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.wall = time.perf_counter() - self._start
+        self._sampler.cancel()
+        await asyncio.gather(self._sampler, return_exceptions=True)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.cpu = (usage.ru_utime - self._rusage.ru_utime) + (usage.ru_stime - self._rusage.ru_stime)
+        self.extra_fds = max(0, self.peak_fds - self._baseline_fds)
+
+    def report(self, result):
+        print(f"{self.name:<26} {self.wall * 1000:>9.1f} {self.cpu * 1000:>9.1f} {self.extra_fds:>9}  {result}")
+
+
+def backup_string(direct_addresses):
+    metadata = {"node_id": NODE_ID, "direct_addresses": direct_addresses}
+    return f"DCBACKUP3:bench-data&{json.dumps(metadata)}"
+
+
+async def run(args, peers, quiet):
+    print(f"{'phase':<26} {'wall ms':>9} {'cpu ms':>9} {'peak fds':>9}  result")
+
+    discovery = NetworkDiscovery()
+    clients = []
+    first = None
+    async with Usage("scan") as usage:
+        start = time.perf_counter()
+        with quiet():
+            async for client in discovery.scan_network_async(args.network):
+                if first is None:
+                    first = time.perf_counter() - start
+                clients.append(client)
+    usage.report(f"{len(clients)} of {len(peers)} peers found")
+    if first is not None:
+        print(f"{'  first discovery':<26} {first * 1000:>9.1f}")
+
+    pairing = AutoPairing()
+    pairing.network_discovery.clients.update(clients)
+    async with Usage("pair via sweep results") as usage:
+        with quiet():
+            paired = await pairing.pair(backup_string([]))
+    usage.report("paired" if paired else "failed")
+
+    async with Usage("pair again (neg. cache)") as usage:
+        pairing.paired_info = None
+        with quiet():
+            paired = await pairing.pair(backup_string([]))
+    usage.report(f"{'paired' if paired else 'failed'}, {len(pairing._refused)} hosts skipped")
+
+    direct = [f"{peer['ip']}:{peer['port']}" for peer in reversed(peers)]
+    async with Usage("pair via direct (acc. last)") as usage:
+        with quiet():
+            paired = await AutoPairing().pair(backup_string(direct))
+    usage.report("paired" if paired else "failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark discovery and pairing against fake local peers")
+    parser.add_argument("--accept", type=int, default=1)
+    parser.add_argument("--reject", type=int, default=3)
+    parser.add_argument("--blackhole", type=int, default=3)
+    parser.add_argument("--accept-delay", type=float, default=0.05, help="Seconds before peers accept")
+    parser.add_argument("--ports", default="42654,42655", help="Comma-separated peer ports")
+    parser.add_argument("--network", default="127.0.0.0/24")
+    parser.add_argument("--concurrency", type=int, default=Config.AUTO_PAIRING_SCAN_CONCURRENCY)
+    parser.add_argument("--host-deadline", type=float, default=Config.AUTO_PAIRING_HOST_DEADLINE)
+    parser.add_argument("--timeout", type=int, default=Config.AUTO_PAIRING_TIMEOUT, help="Pairing deadline")
+    parser.add_argument("--verbose", action="store_true", help="Show pairing log output")
+    args = parser.parse_args()
+    args.ports = [int(port) for port in args.ports.split(",")]
+
+    Config.AUTO_PAIRING_PORTS = ",".join(str(port) for port in args.ports)
+    Config.AUTO_PAIRING_SCAN_CONCURRENCY = args.concurrency
+    Config.AUTO_PAIRING_HOST_DEADLINE = args.host_deadline
+    Config.AUTO_PAIRING_TIMEOUT = args.timeout
+    Config.AUTO_PAIRING_ALLOW_LOOPBACK = True  # The fake peers' direct addresses are 127.0.0.x
+
+    peers = peer_layout(args)
+    print(f"Peers: {args.accept} accepting, {args.reject} rejecting, {args.blackhole} blackholed "
+          f"on ports {args.ports}; scanning {args.network}\n")
+
+    ready, stop = multiprocessing.Event(), multiprocessing.Event()
+    proc = multiprocessing.Process(target=peer_process, args=(peers, args.accept_delay, ready, stop), daemon=True)
+    proc.start()
+    try:
+        if not ready.wait(timeout=10):
+            sys.exit("Fake peers did not start")
+        quiet = contextlib.nullcontext if args.verbose else (lambda: contextlib.redirect_stdout(io.StringIO()))
+        asyncio.run(run(args, peers, quiet))
+    finally:
+        stop.set()
+        proc.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
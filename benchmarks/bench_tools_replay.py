@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Delta Chat MCP - Tool benchmark against recorded core traffic
+Replays a log written with RPC_RECORD_PATH and drives the MCP tools against
+it, fully offline.
+
+Every iteration starts with empty caches, so the numbers are core round
+trips; pass --cached to measure warm-cache calls instead.
+
+Usage: python benchmarks/bench_tools_replay.py rpc-log.jsonl.gz [--iterations N] [--speed fast|1.0]
+                                               [--cached | --uncached]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def cache_lookups(caches):
+    return sum(c.hits for c in caches), sum(c.misses for c in caches)
+
+
+async def run(iterations: int, chat_id: int, cached: bool):
+    from deltachat_mcp.tools import list_chats, get_messages, get_unread_count
+    from deltachat_mcp.instrumentation import rpc_stats
+    from deltachat_mcp.cache import chat_cache, message_cache
+    caches = (chat_cache, message_cache)
+
+    calls = [
+        ("list_chats", list_chats, {}),
+        ("get_unread_count", get_unread_count, {}),
+    ]
+    if chat_id:
+        calls.append(("get_messages", get_messages, {"chat_id": chat_id}))
+
+    print(f"Caches {'kept between' if cached else 'cleared before'} iterations\n")
+    print(f"{'tool':<20} {'calls':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'cache hits':>11}")
+    for name, tool, params in calls:
+        samples = []
+        hits_before, misses_before = cache_lookups(caches)
+        for _ in range(iterations):
+            if not cached:
+                for cache in caches:
+                    cache.invalidate()
+            start = time.perf_counter()
+            await tool(params)
+            samples.append(time.perf_counter() - start)
+        hits, misses = cache_lookups(caches)
+        hits, lookups = hits - hits_before, hits + misses - hits_before - misses_before
+        ratio = f"{hits / lookups:.0%}" if lookups else "-"
+        print(f"{name:<20} {len(samples):>6} {percentile(samples, 50) * 1000:>9.3f} "
+              f"{percentile(samples, 99) * 1000:>9.3f} {max(samples) * 1000:>9.3f} {ratio:>11}")
+
+    print("\nCore calls:")
+    for method, stats in rpc_stats.snapshot().items():
+        print(f"   {method:<40} {stats['calls']:>6} calls, p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MCP tools against a recorded core RPC log")
+    parser.add_argument("log", help="Log written with RPC_RECORD_PATH")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--speed", default="fast", help='Replay speed factor, or "fast" (default)')
+    parser.add_argument("--chat-id", type=int, default=0, help="Also benchmark get_messages on this chat")
+    caching = parser.add_mutually_exclusive_group()
+    caching.add_argument("--cached", dest="cached", action="store_true",
+                         help="Keep the tool caches between iterations")
+    caching.add_argument("--uncached", dest="cached", action="store_false",
+                         help="Clear the tool caches before every iteration (default)")
+    args = parser.parse_args()
+
+    # Must be set before the package reads its configuration
+    os.environ["RPC_REPLAY_PATH"] = args.log
+    os.environ["RPC_REPLAY_SPEED"] = args.speed
+    os.environ.pop("RPC_RECORD_PATH", None)
+
+    asyncio.run(run(args.iterations, args.chat_id, args.cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# deltachat_mcp/backup_import.py
+"""
+Backup import for second device setup
+The core imports backups from a file, so a payload that arrives as a string
+is written once to a file under the staging directory (in a worker thread)
+and the core gets that file's path. Payloads that already are files are
+handed to the core as they are. While the core imports, its ImexProgress
+events are followed, so the logs and the get_import_status tool report how
+far the import itself has got.
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from .config import Config
+
+_PROGRESS_INTERVAL = 2.0
+
+
+def _format_bytes(count: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024 or unit == 'GiB':
+            return f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def _imex_progress(event: Any) -> Optional[int]:
+    """Permille from an ImexProgress core event, None for any other event"""
+    if isinstance(event, dict):
+        inner = event.get('event')
+        if isinstance(inner, dict):
+            event = inner
+        kind, progress = event.get('kind'), event.get('progress')
+    else:
+        kind, progress = getattr(event, 'kind', None), getattr(event, 'progress', None)
+    kind = str(getattr(kind, 'value', kind) or '')
+    if kind != 'ImexProgress' or not isinstance(progress, int):
+        return None
+    return progress
+
+
+class BackupImporter:
+    """Write a backup payload to disk, hand it to the core and follow the import"""
+
+    def __init__(self, staging_dir: Optional[Path] = None):
+        self.staging_dir = Path(staging_dir or Config.BACKUP_IMPORT_DIR)
+        self._status = self._new_status('idle')
+
+    @staticmethod
+    def _new_status(state: str) -> Dict:
+        return {
+            'state': state,
+            'bytes_total': 0,
+            'progress': 0,  # Core import progress in permille
+            'started_at': None,
+            'import_seconds': None,
+            'error': None,
+        }
+
+    def status(self) -> Dict:
+        status = dict(self._status)
+        status['percent'] = round(status['progress'] / 10.0, 1)
+        return status
+
+    def _update(self, **changes):
+        self._status.update(changes)
+
+    # -- staging ---------------------------------------------------------
+
+    def _staging_path(self, node_id: str) -> Path:
+        return self.staging_dir / f"{hashlib.sha256(node_id.encode()).hexdigest()[:32]}.backup"
+
+    def _stage_sync(self, source: Union[str, bytes], path: Path) -> int:
+        data = source.encode('utf-8', 'replace') if isinstance(source, str) else source
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return len(data)
+
+    async def stage(self, source: Union[str, bytes], node_id: str) -> Path:
+        """Write ``source`` to the staging directory in a worker thread"""
+        path = self._staging_path(node_id)
+        self._update(state='staging', error=None)
+        try:
+            size = await asyncio.to_thread(self._stage_sync, source, path)
+        except Exception as e:
+            self._update(state='failed', error=str(e))
+            raise
+        self._update(bytes_total=size)
+        print(f"📦 Backup data staged: {_format_bytes(size)}", file=sys.stderr)
+        return path
+
+    # -- core import -----------------------------------------------------
+
+    async def _follow_progress(self, next_event: Callable[[], Awaitable[Any]]):
+        last_report = 0.0
+        while True:
+            try:
+                event = await next_event()
+            except Exception as e:
+                print(f"Warning: cannot follow backup import progress: {e}", file=sys.stderr)
+                return
+            progress = _imex_progress(event)
+            if progress is None:
+                continue
+            self._update(progress=progress)
+            now = time.monotonic()
+            if now - last_report >= _PROGRESS_INTERVAL or progress >= 1000:
+                last_report = now
+                print(f"📦 Core backup import at {progress / 10:.0f}%", file=sys.stderr)
+
+    async def import_backup(self, source: Union[str, bytes, Path], node_id: str,
+                            core_import: Callable[[str], Awaitable],
+                            next_event: Optional[Callable[[], Awaitable[Any]]] = None):
+        """Pass ``source`` to ``core_import`` as a file path, writing it to one first unless it is one
+
+        With ``next_event`` (the core's event reader), ImexProgress events are
+        followed while the core imports.
+        """
+        self._status = self._new_status('idle')
+        self._update(started_at=time.time())
+        staged = not isinstance(source, Path)
+        if staged:
+            import_path = await self.stage(source, node_id)
+        else:
+            import_path = source
+            self._update(bytes_total=source.stat().st_size)
+
+        self._update(state='importing')
+        follower = asyncio.create_task(self._follow_progress(next_event)) if next_event else None
+        started = time.monotonic()
+        try:
+            result = await core_import(str(import_path))
+        except Exception as e:
+            self._update(state='failed', error=str(e))
+            raise
+        finally:
+            if follower is not None:
+                follower.cancel()
+                await asyncio.gather(follower, return_exceptions=True)
+            if staged:
+                import_path.unlink(missing_ok=True)
+            self._update(import_seconds=round(time.monotonic() - started, 1))
+
+        self._update(state='done', progress=1000)
+        return result
+
+
+# Global instance
+backup_importer = BackupImporter()
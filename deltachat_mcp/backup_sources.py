@@ -0,0 +1,361 @@
+# deltachat_mcp/backup_sources.py
+"""
+Backup-string sources for automatic pairing
+Backup strings arrive from pluggable sources instead of being polled for:
+files dropped into BACKUP_DROP_DIR, a BACKUP_STRING written to .env (both
+watched with inotify where available), the desktop clipboard, and the
+submit_backup_string tool. Every string is validated and de-duplicated by
+hash before listeners such as the pairing loop hear about it.
+"""
+import abc
+import asyncio
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import shutil
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+from dotenv import dotenv_values, find_dotenv
+
+from .config import Config
+
+BACKUP_PREFIX = 'DCBACKUP3:'
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+POLL_INTERVAL = 5.0  # Directory polling where inotify is unavailable
+SEEN_LIMIT = 256  # Backup string hashes remembered for de-duplication
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def extract_backup_string(text: str) -> Optional[str]:
+    """The backup string contained in ``text``, if any"""
+    text = (text or '').strip()
+    return text if text.startswith(BACKUP_PREFIX) else None
+
+
+class _Inotify:
+    """Minimal inotify binding through libc"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: Path, mask: int):
+        if self._libc.inotify_add_watch(self.fd, str(path).encode(), mask) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def read_names(self) -> Set[str]:
+        names = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            names.add(data[offset:offset + length].rstrip(b'\0').decode(errors='replace'))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _snapshot(directory: Path) -> Dict[str, int]:
+    try:
+        return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(directory) if entry.is_file()}
+    except OSError:
+        return {}
+
+
+async def watch_directory(directory: Path) -> AsyncIterator[Set[str]]:
+    """Yield the names of files written or moved into ``directory``
+
+    Uses inotify on Linux; elsewhere the directory is stat-polled, which
+    still spawns no processes.
+    """
+    try:
+        inotify = _Inotify()
+    except (OSError, AttributeError):
+        inotify = None
+    if inotify is not None:
+        try:
+            inotify.add_watch(directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        except OSError:
+            inotify.close()
+            inotify = None
+
+    if inotify is None:
+        before = _snapshot(directory)
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            after = _snapshot(directory)
+            changed = {name for name, mtime in after.items() if before.get(name) != mtime}
+            before = after
+            if changed:
+                yield changed
+
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    loop.add_reader(inotify.fd, ready.set)
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            names = inotify.read_names()
+            if names:
+                yield names
+    finally:
+        loop.remove_reader(inotify.fd)
+        inotify.close()
+
+
+async def _reap(proc: asyncio.subprocess.Process):
+    """Kill ``proc`` if it still runs and wait for it, even while being cancelled"""
+    if proc.returncode is None:
+        proc.kill()
+        await asyncio.shield(proc.wait())
+
+
+class BackupSource(abc.ABC):
+    """A place backup strings can come from; ``watch`` offers them to ``submit``"""
+
+    name = "source"
+
+    def available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    async def watch(self, submit: Callable[[str, str], Dict]):
+        """Offer backup strings to ``submit(backup_string, source)`` until cancelled"""
+
+
+class DropDirectorySource(BackupSource):
+    """Files containing a backup string, dropped into a directory"""
+
+    name = "drop-directory"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _offer(self, path: Path, submit):
+        try:
+            backup_string = extract_backup_string(path.read_text(errors='replace')[:1024 * 1024])
+        except OSError:
+            return
+        if backup_string:
+            submit(backup_string, f"{self.name}:{path.name}")
+
+    async def watch(self, submit):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.directory.iterdir()):
+            if path.is_file():
+                self._offer(path, submit)
+        async for names in watch_directory(self.directory):
+            for name in sorted(names):
+                self._offer(self.directory / name, submit)
+
+
+class EnvFileSource(BackupSource):
+    """BACKUP_STRING set in the .env file after startup"""
+
+    name = "env"
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or find_dotenv(usecwd=True) or Path.cwd() / '.env').resolve()
+
+    def _offer(self, submit):
+        try:
+            backup_string = extract_backup_string(dotenv_values(self.path).get('BACKUP_STRING'))
+        except OSError:
+            return
+        if backup_string:
+            submit(backup_string, self.name)
+
+    async def watch(self, submit):
+        self._offer(submit)
+        async for names in watch_directory(self.path.parent):
+            if self.path.name in names:
+                self._offer(submit)
+
+
+class ClipboardSource(BackupSource):
+    """Backup strings copied to the clipboard of a desktop session
+
+    Wayland is watched with ``wl-paste --watch``; on X11 ``clipnotify``
+    blocks until the selection changes. Without a way to be notified the
+    clipboard is not watched at all rather than polled. Unchanged contents
+    are skipped by hash.
+    """
+
+    name = "clipboard"
+    SEPARATOR = b'\x1e'
+
+    def __init__(self):
+        self._last_digest = None
+
+    def available(self) -> bool:
+        if not Config.BACKUP_CLIPBOARD_ENABLED or os.name != 'posix':
+            return False
+        if os.environ.get('WAYLAND_DISPLAY'):
+            return bool(shutil.which('wl-paste'))
+        if not os.environ.get('DISPLAY') or not self._x11_reader():
+            return False
+        if not shutil.which('clipnotify'):
+            print("Warning: not watching the clipboard for backup strings; install clipnotify to enable it on X11", file=sys.stderr)
+            return False
+        return True
+
+    def _x11_reader(self) -> Optional[List[str]]:
+        if shutil.which('xclip'):
+            return ['xclip', '-o', '-selection', 'clipboard']
+        if shutil.which('xsel'):
+            return ['xsel', '-o', '--clipboard']
+        return None
+
+    def _offer(self, content: bytes, submit):
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == self._last_digest:
+            return
+        self._last_digest = digest
+        backup_string = extract_backup_string(content.decode(errors='replace'))
+        if backup_string:
+            submit(backup_string, self.name)
+
+    async def watch(self, submit):
+        if os.environ.get('WAYLAND_DISPLAY'):
+            await self._watch_wayland(submit)
+        else:
+            await self._watch_x11(submit)
+
+    async def _watch_wayland(self, submit):
+        proc = await asyncio.create_subprocess_exec(
+            'wl-paste', '--no-newline', '--watch', 'sh', '-c', 'cat; printf "\\036"',
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    content = await proc.stdout.readuntil(self.SEPARATOR)
+                except asyncio.IncompleteReadError:
+                    return
+                except asyncio.LimitOverrunError as e:
+                    await proc.stdout.readexactly(e.consumed)  # Far too large to be a backup string
+                    continue
+                self._offer(content[:-1], submit)
+        finally:
+            await _reap(proc)
+
+    async def _watch_x11(self, submit):
+        reader = self._x11_reader()
+        notifier = shutil.which('clipnotify')
+        if not reader or not notifier:
+            return
+        while True:
+            proc = await asyncio.create_subprocess_exec(
+                *reader, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+            try:
+                content, _ = await proc.communicate()
+            finally:
+                await _reap(proc)
+            if proc.returncode == 0:
+                self._offer(content.strip(), submit)
+
+            proc = await asyncio.create_subprocess_exec(notifier, stderr=asyncio.subprocess.DEVNULL)
+            try:
+                await proc.wait()
+            finally:
+                await _reap(proc)
+
+
+class BackupStringPipeline:
+    """Collect backup strings from all sources, validated and de-duplicated"""
+
+    def __init__(self, sources: Optional[List[BackupSource]] = None):
+        self.sources = sources if sources is not None else [
+            DropDirectorySource(Config.BACKUP_DROP_DIR),
+            EnvFileSource(),
+            ClipboardSource(),
+        ]
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()  # Newest SEEN_LIMIT hashes
+        self._latest: Optional[Dict] = None
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Call ``listener(backup_string)`` for every new, valid backup string"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def submit(self, backup_string: str, source: str = "manual") -> Dict:
+        """Offer a backup string; returns whether it was accepted"""
+        backup_string = extract_backup_string(backup_string)
+        backup_info = Config.parse_backup_string(backup_string) if backup_string else None
+        if not backup_info:
+            return {'accepted': False, 'error': 'not a valid DCBACKUP3 backup string'}
+
+        digest = _digest(backup_string)
+        with self._lock:
+            duplicate = digest in self._seen
+            if duplicate:
+                self._seen.move_to_end(digest)
+            else:
+                self._seen[digest] = None
+                if len(self._seen) > SEEN_LIMIT:
+                    self._seen.popitem(last=False)
+                self._latest = {'backup_string': backup_string, 'source': source}
+
+        if not duplicate:
+            print(f"📋 New backup string from {source} for node {backup_info['node_id']}", file=sys.stderr)
+            for listener in list(self._listeners):
+                try:
+                    listener(backup_string)
+                except Exception as e:
+                    print(f"Warning: backup string listener failed: {e}", file=sys.stderr)
+        return {'accepted': True, 'duplicate': duplicate, 'node_id': backup_info['node_id'], 'source': source}
+
+    def latest(self) -> Optional[str]:
+        """The most recently accepted backup string"""
+        with self._lock:
+            return self._latest['backup_string'] if self._latest else None
+
+    async def run(self):
+        """Watch every available source until cancelled"""
+        tasks = [asyncio.create_task(self._watch(source)) for source in self.sources if source.available()]
+        if not tasks:
+            return
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _watch(self, source: BackupSource):
+        try:
+            await source.watch(self.submit)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: backup string source {source.name} stopped: {e}", file=sys.stderr)
+
+
+# Global instance
+backup_sources = BackupStringPipeline()
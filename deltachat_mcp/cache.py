@@ -0,0 +1,110 @@
+# deltachat_mcp/cache.py
+"""
+In-process caches for data read from the Delta Chat core
+Small LRU caches with per-entry expiry, so repeated tool calls do not pay
+for a full round trip to the core every time. While core events are being
+followed they invalidate entries as chats and messages change, and entries
+live for CACHE_EVENT_TTL instead of the short CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from .config import Config
+
+
+class TTLCache:
+    """LRU cache whose entries expire ``ttl`` seconds after being stored"""
+
+    def __init__(self, name: str, maxsize: int = 256, ttl: float = 10.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return an entry even if it has expired; expired entries stay until evicted"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        """Change size and expiry in place, keeping the entries that still fit"""
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if maxsize is not None:
+                self.maxsize = maxsize
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or everything when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Global instances
+chat_cache = TTLCache("chats", maxsize=8, ttl=Config.CACHE_TTL)  # The chatlist and a few projections of it
+message_cache = TTLCache("messages", maxsize=Config.CACHE_SIZE, ttl=Config.CACHE_TTL)
+
+
+_following_events = False
+
+
+def cache_stats() -> Dict[str, Dict]:
+    return {cache.name: cache.stats() for cache in (chat_cache, message_cache)}
+
+
+def follow_events(following: bool):
+    """Switch to the longer CACHE_EVENT_TTL while core events invalidate entries"""
+    global _following_events
+    _following_events = following
+    ttl = Config.CACHE_EVENT_TTL if following else Config.CACHE_TTL
+    chat_cache.configure(ttl=ttl)
+    message_cache.configure(ttl=ttl)
+
+
+def _on_config_reload(changes: Dict):
+    if "CACHE_TTL" in changes or "CACHE_EVENT_TTL" in changes or "CACHE_SIZE" in changes:
+        message_cache.configure(maxsize=Config.CACHE_SIZE)
+        follow_events(_following_events)
+
+
+Config.on_reload(_on_config_reload)
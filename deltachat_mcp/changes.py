@@ -0,0 +1,220 @@
+# deltachat_mcp/changes.py
+"""
+Change log behind the get_changes tool
+Core events and outbox sends are recorded as numbered changes to chats and
+messages, so a client that holds a sync token only fetches what happened
+since. Tokens are "<epoch>:<seq>"; the epoch changes with every process, so
+a token from before a restart, or one older than the CHANGELOG_SIZE changes
+kept, asks the client for a full resync instead of silently missing changes.
+
+The same events keep the chat and message caches honest: whatever they
+touch is invalidated as it is recorded.
+"""
+import asyncio
+import sys
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from typing import Any, Dict, Optional, Tuple
+
+from .cache import chat_cache, follow_events, message_cache
+from .config import Config
+
+Change = namedtuple('Change', 'seq at kind op chat_id msg_id')
+
+PUMP_RETRY_BASE = 1.0  # Seconds before retrying a failed event read
+PUMP_RETRY_MAX = 60.0
+PUMP_MAX_FAILURES = 10  # Failed reads in a row before the pump gives up
+
+# Core event kinds and the change each one stands for
+MESSAGE_EVENTS = {
+    'IncomingMsg': 'created',
+    'MsgsChanged': 'modified',
+    'MsgDelivered': 'modified',
+    'MsgFailed': 'modified',
+    'MsgRead': 'modified',
+    'MsgsNoticed': 'modified',
+    'ReactionsChanged': 'modified',
+    'MsgDeleted': 'deleted',
+}
+CHAT_EVENTS = {
+    'ChatModified': 'modified',
+    'ChatEphemeralTimerModified': 'modified',
+    'ChatlistItemChanged': 'modified',
+    'ChatDeleted': 'deleted',
+}
+
+
+class ChangeLog:
+    """Bounded, monotonically numbered log of chat and message changes"""
+
+    def __init__(self, size: int = 10000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries = deque(maxlen=size)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def configure(self, size: int):
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=size)
+
+    def token(self, seq: Optional[int] = None) -> str:
+        return f"{self.epoch}:{self._seq if seq is None else seq}"
+
+    def record(self, kind: str, op: str, chat_id: int, msg_id: Optional[int] = None) -> int:
+        """Add a change to a chat or message and invalidate what it touches"""
+        with self._lock:
+            self._seq += 1
+            self._entries.append(Change(self._seq, time.time(), kind, op, chat_id, msg_id))
+            seq = self._seq
+
+        if kind == 'message' or op == 'deleted':
+            message_cache.invalidate(chat_id)
+        chat_cache.invalidate()  # The full chatlist and every projection of it
+        return seq
+
+    def _parse(self, token: Optional[str]) -> Optional[int]:
+        """Sequence number a token continues from, or None if it needs a resync"""
+        if not token:
+            return None
+        epoch, _, seq = str(token).partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._entries[0].seq if self._entries else self._seq + 1
+        if seq > self._seq or seq < oldest - 1:
+            return None
+        return seq
+
+    def changes_since(self, token: Optional[str], limit: int = 500) -> Dict:
+        """Chats and messages changed after ``token``, at most ``limit`` changes at a time
+
+        Several changes to the same chat or message are folded into one: a
+        message created and then modified is reported as created, and anything
+        deleted as deleted. With ``reset`` set the token was unknown or too old
+        and the client has to resync with list_chats and get_messages first.
+        """
+        with self._lock:
+            since = self._parse(token)
+            if since is None:
+                return {'token': self.token(), 'reset': True, 'more': False,
+                        'chats': _empty(), 'messages': _empty()}
+            pending = [c for c in self._entries if c.seq > since]
+            page = pending[:limit]
+            last = page[-1].seq if page else since
+
+        chats: Dict[int, str] = {}
+        messages: Dict[Tuple[int, int], str] = {}
+        for change in page:
+            target, key = (messages, (change.chat_id, change.msg_id)) if change.kind == 'message' \
+                else (chats, change.chat_id)
+            target[key] = _fold(target.get(key), change.op)
+
+        return {
+            'token': self.token(last),
+            'reset': False,
+            'more': len(pending) > len(page),
+            'chats': _grouped(chats, lambda chat_id: chat_id),
+            'messages': _grouped(messages, lambda key: {'chat_id': key[0], 'id': key[1]}),
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _fold(previous: Optional[str], op: str) -> str:
+    if previous is None or op == 'deleted':
+        return op
+    return previous  # created or modified, and modified again
+
+
+def _empty() -> Dict:
+    return {'created': [], 'modified': [], 'deleted': []}
+
+
+def _grouped(ops: Dict, describe) -> Dict:
+    grouped = _empty()
+    for key, op in ops.items():
+        grouped[op].append(describe(key))
+    return grouped
+
+
+def _field(event: Any, name: str) -> Any:
+    if isinstance(event, dict):
+        return event.get(name)
+    return getattr(event, name, None)
+
+
+def record_event(log: ChangeLog, event: Any) -> bool:
+    """Record one core event; False if it does not change chats or messages"""
+    kind = _field(event, 'kind')
+    kind = str(getattr(kind, 'value', kind) or '')
+    chat_id = _field(event, 'chat_id')
+    msg_id = _field(event, 'msg_id')
+
+    if kind in MESSAGE_EVENTS and not chat_id:
+        # chat_id 0 means "reload everything"; there is nothing specific to record
+        message_cache.invalidate()
+        chat_cache.invalidate()
+        return False
+    if kind in MESSAGE_EVENTS:
+        message_cache.invalidate(chat_id)
+        if msg_id:
+            log.record('message', MESSAGE_EVENTS[kind], chat_id, msg_id)
+        # New messages move the chat and change its unread count
+        log.record('chat', 'modified', chat_id)
+        return True
+    if kind in CHAT_EVENTS and chat_id:
+        log.record('chat', CHAT_EVENTS[kind], chat_id)
+        return True
+    if kind == 'ChatlistChanged':
+        chat_cache.invalidate()  # The full chatlist and every projection of it
+    return False
+
+
+async def pump_events(account, log: Optional[ChangeLog] = None):
+    """Feed core events into the change log until cancelled
+
+    While the pump runs the caches rely on its invalidations and keep
+    entries longer. Read failures are retried with exponential backoff;
+    after PUMP_MAX_FAILURES in a row the pump gives up, and
+    DeltaChatRPC._start starts a new one the next time it runs.
+    """
+    if log is None:
+        log = change_log
+    print("📡 Following core events for get_changes", file=sys.stderr)
+    follow_events(True)
+    failures = 0
+    try:
+        while True:
+            try:
+                event = await account.wait_for_event()
+            except Exception as e:
+                failures += 1
+                if failures >= PUMP_MAX_FAILURES:
+                    print(f"❌ Stopped following core events after {failures} failures: {e}", file=sys.stderr)
+                    return
+                delay = min(PUMP_RETRY_MAX, PUMP_RETRY_BASE * 2 ** (failures - 1))
+                print(f"Warning: reading core events failed, retrying in {delay:.0f}s: {e}", file=sys.stderr)
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            record_event(log, event)
+    finally:
+        # Nothing invalidates entries any more; anything cached may be stale
+        follow_events(False)
+        message_cache.invalidate()
+        chat_cache.invalidate()
+
+
+# Global instance
+change_log = ChangeLog(Config.CHANGELOG_SIZE)
+
+
+def _on_config_reload(changes: Dict):
+    if "CHANGELOG_SIZE" in changes:
+        change_log.configure(Config.CHANGELOG_SIZE)
+
+
+Config.on_reload(_on_config_reload)
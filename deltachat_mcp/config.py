@@ -1,11 +1,63 @@
 # deltachat_mcp/config.py
+import ipaddress
 import os
-import sqlite3
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Optional
+from dotenv import dotenv_values, find_dotenv, load_dotenv
 
+from .db_discovery import DatabaseDiscovery, DiscoveryCache, probe_database
+
+# The process environment wins over .env, at startup and on every reload
+_PROCESS_ENV = frozenset(os.environ)
 load_dotenv()
 
+# Settings that can change while the server runs (see Config.reload)
+RELOADABLE_SETTINGS = (
+    "MCP_PORT",
+    "AUTO_PAIRING_ENABLED", "AUTO_PAIRING_SCAN_INTERVAL", "AUTO_PAIRING_SCAN_MAX_INTERVAL",
+    "AUTO_PAIRING_TIMEOUT", "AUTO_PAIRING_NETWORKS",
+    "AUTO_PAIRING_REFUSED_TTL", "AUTO_PAIRING_CLIENT_TTL", "AUTO_PAIRING_PORTS", "AUTO_PAIRING_SCAN_CONCURRENCY",
+    "AUTO_PAIRING_HOST_DEADLINE", "AUTO_PAIRING_MAX_HOSTS", "AUTO_PAIRING_ALLOW_LOOPBACK",
+    "AUTO_PAIRING_CONTAINER_NETWORKS",
+    "DISCOVERY_DEEP_SCAN", "DISCOVERY_MAX_DEPTH", "DISCOVERY_TIMEOUT", "DISCOVERY_WORKERS",
+    "OUTBOX_BATCH_SIZE", "OUTBOX_MAX_ATTEMPTS", "OUTBOX_RETRY_BASE", "OUTBOX_RETRY_MAX",
+    "OUTBOX_COMPACT_RECORDS", "OUTBOX_KEEP_FINISHED",
+    "CACHE_TTL", "CACHE_EVENT_TTL", "CACHE_SIZE",
+    "WARMUP_TOP_CHATS", "WARMUP_MESSAGES", "WARMUP_CONCURRENCY",
+    "PROFILE_SECONDS",
+    "REQUEST_HISTORY_SIZE", "REQUEST_HISTORY_RETENTION",
+    "CHANGELOG_SIZE",
+)
+
+# Settings bound to the core connection or to open files; changing them needs a restart
+RESTART_SETTINGS = (
+    "DC_ADDR", "DC_MAIL_PW", "MCP_MODE", "BASEDIR", "BACKUP_STRING",
+    "OUTBOX_ENABLED", "BACKUP_IMPORT_DIR", "BACKUP_DROP_DIR", "BACKUP_CLIPBOARD_ENABLED",
+    "RPC_RECORD_PATH", "RPC_REPLAY_PATH", "REQUEST_HISTORY_DB",
+)
+_STARTUP_ENV = {name: os.getenv(name) for name in RESTART_SETTINGS}
+
+
+def _coerce(raw, current):
+    """Parse an environment value into the type of the current setting"""
+    if isinstance(current, bool):
+        return raw.lower() == "true"
+    if isinstance(current, int):
+        return int(raw)
+    if isinstance(current, float):
+        return float(raw)
+    if isinstance(current, Path):
+        return Path(raw).expanduser()
+    return raw
+
+
+def _load_env_file(path: Optional[str] = None):
+    """Apply .env values for the keys the process environment did not set itself"""
+    for name, value in dotenv_values(path or find_dotenv()).items():
+        if name in _PROCESS_ENV or value is None:
+            continue
+        os.environ[name] = value
+
 
 class Config:
     # First try to load from environment
@@ -19,108 +71,190 @@ class Config:
     # Automatic pairing configuration
     AUTO_PAIRING_ENABLED = os.getenv("AUTO_PAIRING_ENABLED", "true").lower() == "true"
     AUTO_PAIRING_SCAN_INTERVAL = int(os.getenv("AUTO_PAIRING_SCAN_INTERVAL", "30"))
+    AUTO_PAIRING_SCAN_MAX_INTERVAL = int(os.getenv("AUTO_PAIRING_SCAN_MAX_INTERVAL", "600"))  # Backoff ceiling
     AUTO_PAIRING_TIMEOUT = int(os.getenv("AUTO_PAIRING_TIMEOUT", "15"))
+    AUTO_PAIRING_REFUSED_TTL = int(os.getenv("AUTO_PAIRING_REFUSED_TTL", "300"))  # Skip refusing hosts this long
+    AUTO_PAIRING_CLIENT_TTL = int(os.getenv("AUTO_PAIRING_CLIENT_TTL", "120"))  # Forget unseen clients after this long
     AUTO_PAIRING_NETWORKS = os.getenv("AUTO_PAIRING_NETWORKS", "")  # Comma-separated list of networks to scan
+    AUTO_PAIRING_PORTS = os.getenv("AUTO_PAIRING_PORTS", "9933,9934,42654,42655")  # Delta Chat WebSocket ports
+    AUTO_PAIRING_SCAN_CONCURRENCY = int(os.getenv("AUTO_PAIRING_SCAN_CONCURRENCY", "1024"))  # Sockets open at once
+    AUTO_PAIRING_HOST_DEADLINE = float(os.getenv("AUTO_PAIRING_HOST_DEADLINE", "0.5"))  # Seconds per host
+    AUTO_PAIRING_MAX_HOSTS = int(os.getenv("AUTO_PAIRING_MAX_HOSTS", "65536"))  # Per network
+    AUTO_PAIRING_ALLOW_LOOPBACK = os.getenv("AUTO_PAIRING_ALLOW_LOOPBACK", "false").lower() == "true"  # Tests only
+    # Docker (bridge and user-defined networks) and Podman defaults; never raced as direct addresses
+    AUTO_PAIRING_CONTAINER_NETWORKS = os.getenv("AUTO_PAIRING_CONTAINER_NETWORKS", "172.16.0.0/12,10.88.0.0/16")
+
+    # Backup-string sources for automatic pairing
+    BACKUP_DROP_DIR = Path(os.getenv("BACKUP_DROP_DIR", str(BASEDIR / "backup-drop"))).expanduser()  # Drop files with a backup string here
+    BACKUP_CLIPBOARD_ENABLED = os.getenv("BACKUP_CLIPBOARD_ENABLED", "true").lower() == "true"  # Desktop sessions only
+
+    # Credential auto-detection
+    DISCOVERY_DEEP_SCAN = os.getenv("DISCOVERY_DEEP_SCAN", "true").lower() == "true"  # Walk the home directory if known locations fail
+    DISCOVERY_MAX_DEPTH = int(os.getenv("DISCOVERY_MAX_DEPTH", "6"))
+    DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", "10"))  # Seconds before the walk gives up
+    DISCOVERY_WORKERS = int(os.getenv("DISCOVERY_WORKERS", "8"))
+    DISCOVERY_CACHE = os.getenv("DISCOVERY_CACHE", str(Path.home() / ".cache" / "deltachat-mcp" / "discovery.json"))  # Empty to disable
+
+    # Second device backup import
+    BACKUP_IMPORT_DIR = Path(os.getenv("BACKUP_IMPORT_DIR", str(BASEDIR / "backup-import"))).expanduser()
+
+    # Outbox for send_message
+    OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+    OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "2"))  # Seconds before the first retry
+    OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "300"))
+    OUTBOX_COMPACT_RECORDS = int(os.getenv("OUTBOX_COMPACT_RECORDS", "1000"))
+    OUTBOX_KEEP_FINISHED = int(os.getenv("OUTBOX_KEEP_FINISHED", "1000"))  # Finished sends kept for get_send_status
+
+    # Cache configuration
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "10"))  # Seconds before cached chats/messages are re-read
+    CACHE_EVENT_TTL = float(os.getenv("CACHE_EVENT_TTL", "600"))  # The same while core events invalidate them
+    CACHE_SIZE = int(os.getenv("CACHE_SIZE", "256"))  # Number of chats whose messages are kept
+
+    # Startup warm-up of the caches
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_TOP_CHATS = int(os.getenv("WARMUP_TOP_CHATS", "5"))  # Most recently active chats to prefetch
+    WARMUP_MESSAGES = int(os.getenv("WARMUP_MESSAGES", "20"))  # Messages to prefetch per chat
+    WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+
+    # Change log behind get_changes
+    CHANGELOG_SIZE = int(os.getenv("CHANGELOG_SIZE", "10000"))  # Changes kept; older sync tokens need a resync
+
+    # MCP request history
+    REQUEST_HISTORY_SIZE = int(os.getenv("REQUEST_HISTORY_SIZE", "5000"))  # Calls kept in memory
+    REQUEST_HISTORY_DB = os.getenv("REQUEST_HISTORY_DB", "")  # SQLite file for older calls, empty to disable
+    REQUEST_HISTORY_RETENTION = float(os.getenv("REQUEST_HISTORY_RETENTION", "86400"))  # Seconds kept in the file
+
+    # Profiling configuration
+    PROFILE_MODE = os.getenv("PROFILE_MODE", "").lower()  # sample or cprofile, empty to disable
+    PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", "30"))
+    PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASEDIR / "profiles"))).expanduser()
+
+    # Core RPC record/replay (for offline load tests)
+    RPC_RECORD_PATH = os.getenv("RPC_RECORD_PATH")  # Write every core call to this log (.gz to compress)
+    RPC_REPLAY_PATH = os.getenv("RPC_REPLAY_PATH")  # Replay this log instead of talking to the core
+    RPC_REPLAY_SPEED = os.getenv("RPC_REPLAY_SPEED", "1.0")  # Duration scale, or "fast" for no delays
+
+    _reload_hooks = []
 
-    @staticmethod
-    def _find_delta_chat_databases():
-        """Find Delta Chat database files in common locations"""
-        search_paths = [
-            Path.home() / '.config' / 'deltachat',
-            Path.home() / '.deltachat',
-            Path.home() / 'dc-data',
-            Path.home() / '.local' / 'share' / 'deltachat',
-            Path.home() / 'Documents' / 'deltachat',
-            Path.home() / 'Documents' / 'DeltaChat'
-        ]
-
-        db_files = []
-        for search_path in search_paths:
-            if search_path.exists():
-                for file in search_path.glob('*.db'):
-                    db_files.append(file)
-                for file in search_path.glob('*.sqlite'):
-                    db_files.append(file)
-
-        # Also search recursively in home directory
-        for root, dirs, files in os.walk(str(Path.home())):
-            # Skip hidden directories and common exclusions
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['.cache', '.local', 'node_modules']]
-            for file in files:
-                if file.endswith('.db') or file.endswith('.sqlite'):
-                    file_path = Path(root) / file
-                    # Check if this looks like a Delta Chat database
-                    if Config._is_delta_chat_db(file_path):
-                        db_files.append(file_path)
-
-        return db_files
-
-    @staticmethod
-    def _is_delta_chat_db(db_path):
-        """Check if a database file looks like Delta Chat configuration"""
-        try:
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-
-            # Check for Delta Chat-specific tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
+    @classmethod
+    def on_reload(cls, hook):
+        """Register ``hook(changes)``, called with ``{name: (old, new)}`` after a reload"""
+        cls._reload_hooks.append(hook)
 
-            # Delta Chat typically has these tables
-            delta_indicators = ['accounts', 'account', 'config', 'chats', 'msgs', 'contacts']
-            table_matches = sum(1 for table in tables if any(indicator in table.lower() for indicator in delta_indicators))
+    @classmethod
+    def reload(cls):
+        """Re-read .env and apply the settings that are safe to change live
+
+        The Delta Chat core connection and the warm caches are left alone;
+        changed settings that need a restart are only reported.
+        """
+        _load_env_file()
+
+        changes = {}
+        errors = {}
+        for name in RELOADABLE_SETTINGS:
+            raw = os.getenv(name)
+            if raw is None:
+                continue
+            current = getattr(cls, name)
+            try:
+                value = _coerce(raw, current)
+            except ValueError as e:
+                errors[name] = str(e)
+                continue
+            if value != current:
+                setattr(cls, name, value)
+                changes[name] = (current, value)
+
+        restart_required = [name for name in RESTART_SETTINGS if os.getenv(name) != _STARTUP_ENV[name]]
+
+        if "AUTO_PAIRING_ENABLED" in changes:
+            if cls.AUTO_PAIRING_ENABLED:
+                cls.initialize_auto_pairing()
+            else:
+                cls.stop_auto_pairing()
 
-            conn.close()
-            return table_matches >= 2  # At least 2 matching tables
+        for hook in cls._reload_hooks:
+            try:
+                hook(changes)
+            except Exception as e:
+                print(f"❌ Error applying reloaded configuration: {e}")
 
-        except (sqlite3.Error, OSError):
-            return False
+        if changes:
+            print("🔄 Configuration reloaded: " + ", ".join(
+                f"{name}={new}" for name, (_old, new) in changes.items()))
+        else:
+            print("🔄 Configuration reloaded: no changes")
+        for name, error in errors.items():
+            print(f"❌ Ignoring invalid {name}: {error}")
+        if restart_required:
+            print(f"⚠️ Restart required to apply: {', '.join(restart_required)}")
+
+        return {
+            "applied": {name: str(new) for name, (_old, new) in changes.items()},
+            "invalid": errors,
+            "restart_required": restart_required,
+        }
 
-    @staticmethod
-    def _read_delta_chat_config(db_path):
-        """Read configuration from a Delta Chat database"""
-        try:
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
+    @classmethod
+    def get_pairing_ports(cls):
+        """Ports probed for Delta Chat clients during network discovery"""
+        return [int(port) for port in cls.AUTO_PAIRING_PORTS.split(',') if port.strip()]
 
-            # Try to read account configuration
-            # Delta Chat stores config in the 'config' table with key-value pairs
-            cursor.execute("SELECT key, value FROM config WHERE key IN ('addr', 'mail_pw', 'configured_addr')")
-            config_rows = cursor.fetchall()
+    @classmethod
+    def get_container_networks(cls):
+        """Networks whose advertised addresses are container bridges, not a way to the primary device"""
+        networks = []
+        for network in cls.AUTO_PAIRING_CONTAINER_NETWORKS.split(','):
+            if not network.strip():
+                continue
+            try:
+                networks.append(ipaddress.ip_network(network.strip(), strict=False))
+            except ValueError:
+                print(f"Warning: ignoring invalid AUTO_PAIRING_CONTAINER_NETWORKS entry: {network.strip()}")
+        return tuple(networks)
 
-            conn.close()
+    @classmethod
+    def _iter_delta_chat_databases(cls):
+        """Yield Delta Chat database files, known locations first"""
+        discovery = DatabaseDiscovery(
+            cls._is_delta_chat_db,
+            max_depth=cls.DISCOVERY_MAX_DEPTH,
+            timeout=cls.DISCOVERY_TIMEOUT,
+            workers=cls.DISCOVERY_WORKERS,
+            deep_scan=cls.DISCOVERY_DEEP_SCAN,
+            cache=DiscoveryCache(cls.DISCOVERY_CACHE) if cls.DISCOVERY_CACHE else None
+        )
+        return discovery.iter_databases()
 
-            config = {}
-            for key, value in config_rows:
-                if key == 'configured_addr' and not config.get('addr'):
-                    config['addr'] = value
-                elif key == 'addr':
-                    config['addr'] = value
-                elif key == 'mail_pw':
-                    config['mail_pw'] = value
+    @classmethod
+    def _find_delta_chat_databases(cls):
+        """Find Delta Chat database files in common locations"""
+        return list(cls._iter_delta_chat_databases())
 
-            return config
+    @staticmethod
+    def _is_delta_chat_db(db_path):
+        """Check if a database file looks like Delta Chat configuration"""
+        return probe_database(db_path)['is_delta_chat']
 
-        except (sqlite3.Error, OSError):
-            return {}
+    @staticmethod
+    def _read_delta_chat_config(db_path):
+        """Read configuration from a Delta Chat database"""
+        return dict(probe_database(db_path)['config'])
 
     @classmethod
     def auto_detect_credentials(cls):
         """Auto-detect Delta Chat credentials from existing installation"""
         print("🔍 Searching for existing Delta Chat configuration...")
 
-        # Find Delta Chat databases
-        db_files = cls._find_delta_chat_databases()
-
-        if not db_files:
-            print("❌ No Delta Chat databases found")
-            return False
-
-        print(f"📊 Found {len(db_files)} potential Delta Chat databases")
-
-        # Try to read configuration from each database
-        for db_file in db_files:
-            print(f"   Checking: {db_file.name}")
+        # Try to read configuration from each database as it is found;
+        # the search stops at the first one with credentials
+        checked = 0
+        for db_file in cls._iter_delta_chat_databases():
+            checked += 1
+            print(f"   Checking: {db_file}")
             config = cls._read_delta_chat_config(db_file)
 
             if config.get('addr') and config.get('mail_pw'):
@@ -132,7 +266,10 @@ class Config:
                 cls.BASEDIR = db_file.parent
                 return True
 
-        print("❌ No valid Delta Chat credentials found in existing databases")
+        if not checked:
+            print("❌ No Delta Chat databases found")
+        else:
+            print(f"❌ No valid Delta Chat credentials found in {checked} existing database(s)")
         return False
 
     @classmethod
@@ -0,0 +1,329 @@
+# deltachat_mcp/db_discovery.py
+"""
+Discovery of Delta Chat databases for credential auto-detection
+Known Delta Chat locations are searched first, and callers stop consuming
+results on the first usable hit. Only if that fails does a deeper walk of
+the home directory run, time-boxed, depth-limited and spread over a thread
+pool. Every candidate is pre-filtered by its 16-byte SQLite header before
+any database connection is opened.
+
+Results are remembered in a small cache file keyed by path, mtime and size,
+so later starts only stat the files found before and re-validate the ones
+that changed; the walk itself only runs while the cache is empty.
+
+Candidate databases may belong to a running Delta Chat desktop, so they are
+opened read-only and immutable (no locks taken, no journal files created),
+once per file, with the schema check and the config read sharing the same
+connection. Probe results are memoised per path, mtime and size.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+DB_SUFFIXES = ('.db', '.sqlite')
+SKIP_DIRS = {'node_modules', '__pycache__', 'venv', 'site-packages', 'target', 'build', 'dist'}
+
+# Delta Chat typically has these tables
+DELTA_CHAT_TABLE_HINTS = ('accounts', 'account', 'config', 'chats', 'msgs', 'contacts')
+CONFIG_KEYS = ('addr', 'mail_pw', 'configured_addr')
+PROBE_BUSY_TIMEOUT = 0.05
+
+_DONE = object()
+_probe_cache: Dict = {}
+_probe_lock = threading.Lock()
+
+
+def known_locations(home: Optional[Path] = None) -> List[Path]:
+    """Directories where Delta Chat keeps its data on common platforms"""
+    home = home or Path.home()
+    return [
+        home / '.config' / 'DeltaChat',
+        home / '.config' / 'deltachat',
+        home / '.deltachat',
+        home / 'dc-data',
+        home / '.local' / 'share' / 'deltachat',
+        home / 'Documents' / 'deltachat',
+        home / 'Documents' / 'DeltaChat',
+    ]
+
+
+def has_sqlite_header(path: Path) -> bool:
+    """Check the SQLite magic without opening a database connection"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def _connect_read_only(path: Path) -> sqlite3.Connection:
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True, timeout=PROBE_BUSY_TIMEOUT, check_same_thread=False)
+
+
+def probe_database(path: Path) -> Dict:
+    """Fingerprint a database and read its account config in one read-only pass
+
+    Returns ``{'is_delta_chat': bool, 'config': {...}}``; the config holds
+    ``addr`` and ``mail_pw`` when present. Results are cached until the
+    file's mtime or size changes.
+    """
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return {'is_delta_chat': False, 'config': {}}
+
+    fingerprint = (st.st_mtime_ns, st.st_size)
+    with _probe_lock:
+        cached = _probe_cache.get(str(path))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    result = {'is_delta_chat': False, 'config': {}}
+    try:
+        conn = _connect_read_only(path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            tables = [row[0] for row in cursor.fetchall()]
+            table_matches = sum(1 for table in tables
+                                if any(hint in table.lower() for hint in DELTA_CHAT_TABLE_HINTS))
+            result['is_delta_chat'] = table_matches >= 2  # At least 2 matching tables
+
+            # Delta Chat stores config in the 'config' table with key-value pairs
+            if 'config' in tables:
+                cursor.execute("SELECT key, value FROM config WHERE key IN (?, ?, ?)", CONFIG_KEYS)
+                config = {}
+                for config_key, value in cursor.fetchall():
+                    if config_key == 'configured_addr' and not config.get('addr'):
+                        config['addr'] = value
+                    elif config_key == 'addr':
+                        config['addr'] = value
+                    elif config_key == 'mail_pw':
+                        config['mail_pw'] = value
+                result['config'] = config
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        pass
+
+    with _probe_lock:
+        _probe_cache[str(path)] = (fingerprint, result)
+    return result
+
+
+class DiscoveryCache:
+    """Remembered discovery results: path -> mtime, size and verdict"""
+
+    VERSION = 1
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self.entries: Dict[str, Dict] = {}
+        self.walk_complete = False
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get('version') == self.VERSION:
+                self.entries = data.get('entries', {})
+                self.walk_complete = data.get('walk_complete', False)
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, path: Path, st: os.stat_result) -> Optional[bool]:
+        """Cached verdict for ``path``, or None if unknown or changed since"""
+        with self._lock:
+            entry = self.entries.get(str(path))
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry['is_delta_chat']
+        return None
+
+    def store(self, path: Path, st: os.stat_result, is_delta_chat: bool):
+        with self._lock:
+            self.entries[str(path)] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                                       'is_delta_chat': is_delta_chat}
+            self._dirty = True
+
+    def forget(self, path: Path):
+        with self._lock:
+            if self.entries.pop(str(path), None) is not None:
+                self._dirty = True
+
+    def mark_walk_complete(self):
+        with self._lock:
+            self.walk_complete = True
+            self._dirty = True
+
+    def paths(self) -> List[Path]:
+        with self._lock:
+            return [Path(p) for p in self.entries]
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': self.VERSION, 'walk_complete': self.walk_complete, 'entries': self.entries}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not write discovery cache {self.path}: {e}")
+
+
+class DatabaseDiscovery:
+    """Find candidate Delta Chat databases, cheapest locations first"""
+
+    def __init__(self, is_delta_chat_db: Callable[[Path], bool], home: Optional[Path] = None,
+                 max_depth: int = 6, timeout: float = 10.0, workers: int = 8, deep_scan: bool = True,
+                 cache: Optional[DiscoveryCache] = None):
+        self.is_delta_chat_db = is_delta_chat_db
+        self.home = home or Path.home()
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self.deep_scan = deep_scan
+        self.cache = cache
+
+    def iter_databases(self) -> Iterator[Path]:
+        """Yield databases lazily; stop iterating to skip the remaining search"""
+        seen: Set[Path] = set()
+        try:
+            for path in self._cached_candidates():
+                seen.add(path)
+                yield path
+
+            for path in self._known_candidates():
+                if path not in seen:
+                    seen.add(path)
+                    yield path
+
+            # Only a walk that finished has seen every database under home
+            if self.deep_scan and not (self.cache and self.cache.walk_complete):
+                yield from self._walk(seen)
+        finally:
+            if self.cache:
+                self.cache.save()
+
+    def _cached_candidates(self) -> Iterator[Path]:
+        """Databases from earlier runs; only changed files are probed again"""
+        if not self.cache:
+            return
+        for path in self.cache.paths():
+            try:
+                st = path.stat()
+            except OSError:
+                self.cache.forget(path)
+                continue
+            verdict = self.cache.lookup(path, st)
+            if verdict is None:
+                verdict = has_sqlite_header(path) and self.is_delta_chat_db(path)
+                self.cache.store(path, st, verdict)
+            if verdict:
+                yield path
+
+    def _known_candidates(self) -> Iterator[Path]:
+        for location in known_locations(self.home):
+            if not location.is_dir():
+                continue
+            patterns = [f'*{suffix}' for suffix in DB_SUFFIXES]
+            patterns += [f'accounts/*/*{suffix}' for suffix in DB_SUFFIXES]
+            for pattern in patterns:
+                for path in sorted(location.glob(pattern)):
+                    if not path.is_file():
+                        continue
+                    is_delta_chat = has_sqlite_header(path) and self.is_delta_chat_db(path)
+                    if self.cache:
+                        try:
+                            self.cache.store(path, path.stat(), is_delta_chat)
+                        except OSError:
+                            pass
+                    if is_delta_chat:
+                        yield path
+
+    def _walk(self, seen: Set[Path]) -> Iterator[Path]:
+        deadline = time.monotonic() + self.timeout
+        stop = threading.Event()
+        results: "queue.Queue" = queue.Queue()
+
+        roots = []
+        try:
+            with os.scandir(self.home) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.name in SKIP_DIRS:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        roots.append(Path(entry.path))
+                    elif entry.name.endswith(DB_SUFFIXES):
+                        self._check_file(Path(entry.path), results)
+        except OSError as e:
+            print(f"Warning: Could not list {self.home}: {e}")
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dc-discovery")
+        pending = len(roots)
+        for root in roots:
+            pool.submit(self._walk_tree, root, deadline, stop, results)
+
+        try:
+            while pending or not results.empty():
+                try:
+                    item = results.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    print(f"⏱️ Database search stopped after {self.timeout:.0f}s")
+                    break
+                if item is _DONE:
+                    pending -= 1
+                elif item not in seen:
+                    seen.add(item)
+                    yield item
+            else:
+                if self.cache:
+                    self.cache.mark_walk_complete()
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _walk_tree(self, root: Path, deadline: float, stop: threading.Event, results: "queue.Queue"):
+        try:
+            stack = [(root, 1)]
+            while stack:
+                if stop.is_set() or time.monotonic() > deadline:
+                    return
+                directory, depth = stack.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.name.startswith('.') or entry.name in SKIP_DIRS:
+                                continue
+                            if entry.is_dir(follow_symlinks=False):
+                                if depth < self.max_depth:
+                                    stack.append((Path(entry.path), depth + 1))
+                            elif entry.name.endswith(DB_SUFFIXES):
+                                self._check_file(Path(entry.path), results)
+                except OSError:
+                    continue
+        finally:
+            results.put(_DONE)
+
+    def _check_file(self, path: Path, results: "queue.Queue"):
+        if not has_sqlite_header(path):
+            return
+        is_delta_chat = self.is_delta_chat_db(path)
+        if self.cache:
+            try:
+                self.cache.store(path, path.stat(), is_delta_chat)
+            except OSError:
+                pass
+        if is_delta_chat:
+            results.put(path)
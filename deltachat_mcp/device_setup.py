@@ -0,0 +1,136 @@
+# deltachat_mcp/device_setup.py
+"""
+Second-device setup as a background pipeline
+Setting up as a second device can take minutes (waiting for a backup
+string, pairing, importing the backup), so it runs as a cancellable task
+with explicit states instead of inside ensure_configured. Tools keep
+serving while it runs, and get_setup_status reports where it is.
+"""
+import asyncio
+import sys
+import time
+from typing import Dict, List, Optional
+
+from .config import Config
+
+
+class SecondDeviceSetup:
+    """Drive second-device setup through its states on the event loop
+
+    idle -> waiting_for_backup -> pairing -> importing -> starting_io -> ready,
+    ending in failed or cancelled instead when something goes wrong.
+    """
+
+    def __init__(self):
+        self.state = 'idle'
+        self.node_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.history: List[Dict] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def _set(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        self.history.append({'state': state, 'at': time.time()})
+        print(f"🔧 Second-device setup: {state}", file=sys.stderr)
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> Dict:
+        status = {
+            'state': self.state,
+            'running': self.running(),
+            'node_id': self.node_id,
+            'error': self.error,
+            'history': list(self.history),
+        }
+        if self.history:
+            status['state_seconds'] = round(time.time() - self.history[-1]['at'], 1)
+        if self.state == 'importing':
+            from .backup_import import backup_importer
+            status['import'] = backup_importer.status()
+        return status
+
+    def start(self, rpc) -> asyncio.Task:
+        """Start setup in the background; a running setup is returned as is"""
+        if not self.running():
+            self.error = None
+            self.history = []
+            self._task = asyncio.create_task(self._run(rpc))
+        return self._task
+
+    def cancel(self) -> bool:
+        if not self.running():
+            return False
+        self._task.cancel()
+        return True
+
+    async def wait(self, timeout: Optional[float] = None) -> Dict:
+        """Wait for setup to finish (or ``timeout`` to pass) and return the status"""
+        if self._task is not None:
+            await asyncio.wait([self._task], timeout=timeout)
+        return self.status()
+
+    async def _run(self, rpc):
+        try:
+            backup_info = await self._backup_info()
+            self.node_id = backup_info['node_id']
+
+            self._set('importing')
+            if not await rpc._import_backup_data(backup_info):
+                raise RuntimeError("Backup import failed")
+
+            self._set('starting_io')
+            await rpc._start(rpc.get_account())
+            self._set('ready')
+        except asyncio.CancelledError:
+            self._set('cancelled')
+            raise
+        except Exception as e:
+            self.error = str(e)
+            self._set('failed')
+            print(f"❌ Second-device setup failed: {e}", file=sys.stderr)
+
+    async def _backup_info(self) -> Dict:
+        """Backup info from the config, or from automatic pairing once it succeeds"""
+        if getattr(Config, 'BACKUP_INFO', None):
+            return Config.BACKUP_INFO
+        if not Config.AUTO_PAIRING_ENABLED:
+            raise ValueError("No backup information available for second device setup")
+
+        from .backup_sources import backup_sources
+        from .pairing import auto_pairing
+
+        loop = asyncio.get_running_loop()
+        backup_arrived = asyncio.Event()
+
+        def on_backup_string(_backup_string):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(backup_arrived.set)
+
+        backup_sources.add_listener(on_backup_string)
+        paired = asyncio.create_task(auto_pairing.wait_paired())
+        try:
+            auto_pairing.start_auto_pairing_service()
+            if not auto_pairing.backup_string():
+                self._set('waiting_for_backup')
+                arrived = asyncio.create_task(backup_arrived.wait())
+                try:
+                    await asyncio.wait([paired, arrived], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    arrived.cancel()
+            self._set('pairing')
+            backup_info = await paired
+        finally:
+            backup_sources.remove_listener(on_backup_string)
+            paired.cancel()
+
+        Config.BACKUP_INFO = backup_info
+        Config.IS_SECOND_DEVICE = True
+        return Config.BACKUP_INFO
+
+
+# Global instance
+device_setup = SecondDeviceSetup()
@@ -0,0 +1,215 @@
+# deltachat_mcp/history.py
+"""
+Bounded MCP request history
+Every tool call lands in a fixed-size ring in memory. With
+REQUEST_HISTORY_DB set, calls are also spilled in batches to a SQLite file
+indexed on tool, status and duration, and kept for REQUEST_HISTORY_RETENTION
+seconds; queries then go to the file, so "the slowest calls of the last
+day" does not need the whole day in memory. The file is written by a
+background thread, so recording a call never waits for SQLite.
+"""
+import itertools
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import Config
+from .metrics import metrics
+
+SPILL_BATCH = 256  # Pending records that force a write
+SPILL_INTERVAL = 1.0  # Seconds pending records may wait for a write
+PRUNE_INTERVAL = 60.0  # Seconds between deletes of calls past retention
+ORDERS = {
+    'recent': 'seq DESC',
+    'slowest': 'duration_ms DESC',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    seq INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    tool TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration_ms REAL NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS requests_tool ON requests (tool, started);
+CREATE INDEX IF NOT EXISTS requests_status ON requests (status, started);
+CREATE INDEX IF NOT EXISTS requests_duration ON requests (duration_ms);
+CREATE INDEX IF NOT EXISTS requests_started ON requests (started);
+"""
+_COLUMNS = ('seq', 'started', 'tool', 'status', 'duration_ms', 'error')
+
+
+class RequestHistory:
+    """Ring of recent tool calls with an optional indexed SQLite spill"""
+
+    def __init__(self, size: int = 5000, db_path: Optional[Path] = None):
+        self._ring = deque(maxlen=size)
+        self._db_path = Path(db_path) if db_path else None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_failed = False
+        self._pending: List[tuple] = []
+        self._last_prune: Optional[float] = None
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # Serializes use of the connection
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def db_path(self) -> Optional[Path]:
+        if self._db_path:
+            return self._db_path
+        return Path(Config.REQUEST_HISTORY_DB).expanduser() if Config.REQUEST_HISTORY_DB else None
+
+    def configure(self, size: int):
+        with self._lock:
+            self._ring = deque(self._ring, maxlen=size)
+
+    def record(self, tool: str, duration: float, error: Optional[BaseException] = None):
+        """Add one finished call; matches the RpcStats observer signature"""
+        with self._lock:
+            spill = self.db_path is not None and self._database() is not None
+            row = (next(self._seq), time.time() - duration, tool, 'error' if error else 'ok',
+                   round(duration * 1000, 3), str(error) if error else None)
+            self._ring.append(row)
+            if not spill:
+                return
+            self._pending.append(row)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="dc-mcp-history", daemon=True)
+                self._writer.start()
+            if len(self._pending) >= SPILL_BATCH:
+                self._wake.set()
+
+    # -- SQLite spill ----------------------------------------------------
+
+    def _database(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and not self._db_failed and self.db_path is not None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.executescript(_SCHEMA)
+                # Continue numbering after the file's last call
+                last = db.execute("SELECT MAX(seq) FROM requests").fetchone()[0] or 0
+                self._seq = itertools.count(max(last + 1, next(self._seq)))
+                self._db = db
+            except (OSError, sqlite3.Error) as e:
+                self._db_failed = True
+                print(f"Warning: request history stays in memory, cannot open {self.db_path}: {e}", file=sys.stderr)
+        return self._db
+
+    def _write_loop(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(SPILL_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write pending records, and drop those past retention when a prune is due"""
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if self._db is None:
+                return
+            now = time.monotonic()
+            prune = self._last_prune is None or now - self._last_prune >= PRUNE_INTERVAL
+            if not pending and not prune:
+                return
+            try:
+                with self._db:
+                    self._db.executemany("INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?)", pending)
+                    if prune:
+                        self._db.execute("DELETE FROM requests WHERE started < ?",
+                                         (time.time() - Config.REQUEST_HISTORY_RETENTION,))
+                        self._last_prune = now
+            except sqlite3.Error as e:
+                print(f"Warning: could not write request history: {e}", file=sys.stderr)
+
+    def close(self):
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._stop_event.set()
+            self._wake.set()
+            writer.join(timeout=5.0)
+            self._stop_event.clear()
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # -- queries ---------------------------------------------------------
+
+    def _where(self, tool: Optional[str], status: Optional[str], since: Optional[float]):
+        clauses, args = [], []
+        for column, op, value in (('tool', '=', tool), ('status', '=', status), ('started', '>=', since)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                args.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _matching(self, tool, status, since) -> List[tuple]:
+        return [r for r in self._ring
+                if (tool is None or r[2] == tool) and (status is None or r[3] == status)
+                and (since is None or r[1] >= since)]
+
+    def query(self, tool: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None,
+              order: str = 'recent', limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Calls matching the filters, newest or slowest first"""
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                where, args = self._where(tool, status, since)
+                rows = self._db.execute(f"SELECT * FROM requests{where} ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?",
+                                        args + [limit, offset]).fetchall()
+                return [dict(zip(_COLUMNS, row)) for row in rows]
+        with self._lock:
+            rows = self._matching(tool, status, since)
+        rows.sort(key=lambda r: r[0] if order == 'recent' else r[4], reverse=True)
+        return [dict(zip(_COLUMNS, row)) for row in rows[offset:offset + limit]]
+
+    def count(self, tool: Optional[str] = None, status: Optional[str] = None, since: Optional[float] = None) -> int:
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                where, args = self._where(tool, status, since)
+                return self._db.execute(f"SELECT COUNT(*) FROM requests{where}", args).fetchone()[0]
+        with self._lock:
+            return len(self._matching(tool, status, since))
+
+    def tools(self) -> List[str]:
+        """Names of the tools that appear in the history"""
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                return [row[0] for row in self._db.execute("SELECT DISTINCT tool FROM requests ORDER BY tool")]
+        with self._lock:
+            return sorted({r[2] for r in self._ring})
+
+    def __len__(self):
+        return len(self._ring)
+
+
+# Global instance
+request_history = RequestHistory(Config.REQUEST_HISTORY_SIZE)
+metrics.tools.add_observer(request_history.record)
+
+
+def _on_config_reload(changes: Dict):
+    if "REQUEST_HISTORY_SIZE" in changes:
+        request_history.configure(Config.REQUEST_HISTORY_SIZE)
+
+
+Config.on_reload(_on_config_reload)
@@ -0,0 +1,193 @@
+# deltachat_mcp/instrumentation.py
+"""
+Timing instrumentation for Delta Chat core RPC calls
+Wraps the core account (and the chats, messages and contacts it hands out)
+in a proxy that records call counts and latencies per method
+"""
+import inspect
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class MethodStats:
+    """Call counters and a latency reservoir for a single core method"""
+
+    def __init__(self, sample_size: int = 1024):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=sample_size)
+
+    def add(self, duration: float, failed: bool = False):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.samples.append(duration)
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def as_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total * 1000, 3),
+            'avg_ms': round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class RpcStats:
+    """Thread-safe registry of per-method core call statistics"""
+
+    def __init__(self, sample_size: int = 1024):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._methods: Dict[str, MethodStats] = {}
+        self._observers: List[Callable] = []
+
+    def record(self, method: str, duration: float, error: Optional[BaseException] = None):
+        """Record one completed call and notify observers"""
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = MethodStats(self.sample_size)
+            stats.add(duration, failed=error is not None)
+            observers = list(self._observers)
+
+        for observer in observers:
+            try:
+                observer(method, duration, error)
+            except Exception as e:
+                print(f"Warning: RPC stats observer failed: {e}")
+
+    def add_observer(self, observer: Callable):
+        """Register ``observer(method, duration, error)`` for every recorded call"""
+        with self._lock:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer: Callable):
+        with self._lock:
+            if observer in self._observers:
+                self._observers.remove(observer)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Get a copy of the statistics, keyed by method name"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._methods.items())}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+
+# Global instance
+rpc_stats = RpcStats()
+
+
+class InstrumentedProxy:
+    """Transparent proxy that times every method call on a core object
+
+    Core objects returned from calls (chats, messages, contacts) are wrapped
+    as well, so ``account.get_chats()`` and ``chat.send_text()`` both show up
+    in the statistics as ``Account.get_chats`` and ``Chat.send_text``.
+    """
+
+    def __init__(self, target: Any, stats: RpcStats = rpc_stats, name: Optional[str] = None,
+                 recorder: Any = None):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_stats', stats)
+        object.__setattr__(self, '_recorder', recorder)
+        object.__setattr__(self, '_name', name or type_name(target))
+        object.__setattr__(self, '_package', type(target).__module__.split('.')[0])
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._target, attr)
+        if attr.startswith('_'):
+            return value
+        if callable(value):
+            return self._wrap_method(attr, value)
+        return self._wrap_result(value)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._target, attr, value)
+
+    def __repr__(self) -> str:
+        return f"<InstrumentedProxy {self._target!r}>"
+
+    def _wrap_method(self, attr: str, method: Callable) -> Callable:
+        qualname = f"{self._name}.{attr}"
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                self._finish(qualname, attr, args, kwargs, False, start, error=e)
+                raise
+
+            if inspect.isawaitable(result):
+                return self._await_timed(qualname, attr, args, kwargs, result, start)
+
+            self._finish(qualname, attr, args, kwargs, False, start, result=result)
+            return self._wrap_result(result)
+
+        timed.__name__ = attr
+        return timed
+
+    async def _await_timed(self, qualname: str, attr: str, args, kwargs, awaitable, start: float) -> Any:
+        try:
+            result = await awaitable
+        except BaseException as e:
+            self._finish(qualname, attr, args, kwargs, True, start, error=e)
+            raise
+        self._finish(qualname, attr, args, kwargs, True, start, result=result)
+        return self._wrap_result(result)
+
+    def _finish(self, qualname: str, attr: str, args, kwargs, is_async: bool, start: float,
+                result: Any = None, error: Optional[BaseException] = None):
+        duration = time.perf_counter() - start
+        self._stats.record(qualname, duration, error)
+        if self._recorder is not None:
+            self._recorder.record(self._target, attr, [unwrap(a) for a in args],
+                                  {k: unwrap(v) for k, v in kwargs.items()},
+                                  is_async, duration, result, error)
+
+    def _wrap_result(self, value: Any) -> Any:
+        """Wrap core objects so their methods are timed too"""
+        if isinstance(value, list):
+            return [self._wrap_result(item) for item in value]
+        if isinstance(value, tuple):
+            return tuple(self._wrap_result(item) for item in value)
+        if self._is_core_object(value):
+            return InstrumentedProxy(value, self._stats, recorder=self._recorder)
+        return value
+
+    def _is_core_object(self, value: Any) -> bool:
+        if value is None or isinstance(value, (str, bytes, int, float, bool, dict, InstrumentedProxy)):
+            return False
+        return type(value).__module__.split('.')[0] == self._package
+
+
+def type_name(obj: Any) -> str:
+    """Name of a core object's type, seeing through replayed stand-ins"""
+    return getattr(obj, '__dict__', {}).get('_replay_type') or type(obj).__name__
+
+
+def unwrap(obj: Any) -> Any:
+    """Get the underlying core object from a proxy"""
+    while isinstance(obj, InstrumentedProxy):
+        obj = object.__getattribute__(obj, '_target')
+    return obj
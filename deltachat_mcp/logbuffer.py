@@ -0,0 +1,90 @@
+# deltachat_mcp/logbuffer.py
+"""
+Bounded log buffer for the desktop GUI
+Records may be added from any thread; they wait in a queue until the GUI
+drains them in one batch per frame. Only the newest records are kept, and
+level filtering works on the buffer instead of on the text widget.
+"""
+import io
+import itertools
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Iterable, List, Optional
+
+LOG_LEVELS = ('info', 'success', 'warning', 'error')
+
+LogRecord = namedtuple('LogRecord', 'seq timestamp level message')
+
+# Leading markers the server's print() output uses, mapped to a log level
+_LEVEL_MARKERS = (('❌', 'error'), ('Error', 'error'), ('⚠', 'warning'), ('Warning', 'warning'), ('✅', 'success'))
+
+
+def guess_level(line: str) -> str:
+    """Log level of a printed line, judged by its leading marker"""
+    line = line.lstrip()
+    for marker, level in _LEVEL_MARKERS:
+        if line.startswith(marker):
+            return level
+    return 'info'
+
+
+class LogBuffer:
+    """Ring buffer of log records fed through a thread-safe queue"""
+
+    def __init__(self, maxlen: int = 10000):
+        self._records = deque(maxlen=maxlen)
+        self._incoming: "queue.SimpleQueue[LogRecord]" = queue.SimpleQueue()
+        self._seq = itertools.count(1)
+
+    def append(self, message: str, level: str = 'info'):
+        """Queue a record; safe to call from any thread"""
+        self._incoming.put(LogRecord(next(self._seq), time.time(), level, message))
+
+    def drain(self) -> List[LogRecord]:
+        """Move queued records into the buffer and return them (GUI thread only)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._incoming.get_nowait())
+            except queue.Empty:
+                break
+        self._records.extend(batch)
+        return batch[-self._records.maxlen:]
+
+    def records(self, levels: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> List[LogRecord]:
+        """Buffered records, optionally only those of the given levels and the newest ``limit``"""
+        levels = set(levels) if levels is not None else None
+        records = [r for r in self._records if levels is None or r.level in levels]
+        return records[-limit:] if limit else records
+
+    def clear(self):
+        self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+class LogStream(io.TextIOBase):
+    """File-like object that turns written lines into buffer records
+
+    Used to show the output of an in-process server in the GUI log view.
+    Partial lines are kept per thread until their newline arrives.
+    """
+
+    def __init__(self, buffer: LogBuffer, level: Optional[str] = None):
+        self._buffer = buffer
+        self._level = level
+        self._partial = threading.local()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        pending = getattr(self._partial, 'text', '') + text
+        *lines, self._partial.text = pending.split('\n')
+        for line in lines:
+            if line.strip():
+                self._buffer.append(line, self._level or guess_level(line))
+        return len(text)
@@ -0,0 +1,119 @@
+# deltachat_mcp/metrics.py
+"""
+Live server metrics for the dashboard
+Tool calls are timed per tool with the same reservoirs the core RPC
+statistics use, request rate comes from per-second buckets, and a small
+task measures how late the event loop wakes up. snapshot() is cheap enough
+to call once a second from another thread.
+"""
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from .cache import cache_stats
+from .instrumentation import MethodStats, RpcStats, rpc_stats
+
+RATE_WINDOW = 10  # Seconds the request rate is averaged over
+LOOP_LAG_INTERVAL = 0.25  # Seconds between event-loop lag probes
+
+
+class ServerMetrics:
+    """Request rate, in-flight requests, tool and core latency, loop lag"""
+
+    def __init__(self, core_stats: RpcStats = rpc_stats):
+        self.tools = RpcStats()
+        self._lock = threading.Lock()
+        self._buckets = deque(maxlen=RATE_WINDOW + 1)  # [second, count]
+        self.requests = 0
+        self.in_flight = 0
+        self._core = MethodStats()
+        self._loop_lag = MethodStats(sample_size=240)
+        self._last_lag = 0.0
+        core_stats.add_observer(self._on_core_call)
+
+    def _on_core_call(self, _method: str, duration: float, _error):
+        with self._lock:
+            self._core.add(duration)
+
+    def _begin(self):
+        second = int(time.monotonic())
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += 1
+            else:
+                self._buckets.append([second, 1])
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def timed(self, tool: Callable[[dict], Awaitable[dict]], name: Optional[str] = None):
+        """Wrap a tool so every call is counted and timed under ``name``"""
+        name = name or tool.__name__
+
+        @functools.wraps(tool)
+        async def timed_tool(params: dict) -> dict:
+            self._begin()
+            start = time.perf_counter()
+            error = None
+            try:
+                return await tool(params)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._end()
+                self.tools.record(name, time.perf_counter() - start, error)
+
+        return timed_tool
+
+    def request_rate(self) -> float:
+        """Requests per second over the last RATE_WINDOW complete seconds"""
+        now = int(time.monotonic())
+        with self._lock:
+            count = sum(n for second, n in self._buckets if now - RATE_WINDOW <= second < now)
+        return count / RATE_WINDOW
+
+    async def monitor_loop(self, interval: float = LOOP_LAG_INTERVAL):
+        """Record how much later than asked the loop wakes up, until cancelled"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            with self._lock:
+                self._last_lag = lag
+                self._loop_lag.add(lag)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            core = self._core.as_dict()
+            loop_lag = self._loop_lag.as_dict()
+            loop_lag['last_ms'] = round(self._last_lag * 1000, 3)
+            requests, in_flight = self.requests, self.in_flight
+        return {
+            'requests': requests,
+            'requests_per_sec': round(self.request_rate(), 2),
+            'in_flight': in_flight,
+            'tools': self.tools.snapshot(),
+            'caches': cache_stats(),
+            'core_rpc': core,
+            'loop_lag': loop_lag,
+        }
+
+    def reset(self):
+        self.tools.reset()
+        with self._lock:
+            self._buckets.clear()
+            self.requests = 0
+            self._core = MethodStats()
+            self._loop_lag = MethodStats(sample_size=240)
+            self._last_lag = 0.0
+
+
+# Global instance
+metrics = ServerMetrics()
@@ -0,0 +1,206 @@
+# deltachat_mcp/netmap.py
+"""
+Local network map for auto-pairing discovery
+IPv4 on-link routes come straight from /proc/net/route and interface flags
+from an ioctl, so no `ip route` process is spawned per scan pass. A netlink
+socket subscribed to link, address and route changes marks the map stale;
+it is only re-read after something actually changed.
+
+Container bridges, veth pairs, loopback, link-local and point-to-point links
+are left out, since no Delta Chat desktop pairs with us through them. The
+interface carrying the default route is always kept, even if it is a bridge.
+The same filter applies to the direct addresses a backup string advertises:
+the primary device's container bridges are no way to reach it.
+"""
+import ipaddress
+import socket
+import struct
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+ROUTE_PATH = Path('/proc/net/route')
+SYS_NET_PATH = Path('/sys/class/net')
+SKIP_INTERFACE_PREFIXES = ('lo', 'docker', 'br-', 'veth', 'virbr', 'cni', 'flannel', 'vxlan',
+                           'kube', 'podman', 'lxc', 'lxd')
+
+# Container networks (Docker's bridge and user-defined networks, Podman); a
+# primary device's own bridges do not show up in our routes, but their
+# addresses are still useless. AUTO_PAIRING_CONTAINER_NETWORKS overrides this.
+CONTAINER_NETWORKS = tuple(ipaddress.ip_network(n) for n in ('172.16.0.0/12', '10.88.0.0/16'))
+
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+IFF_UP = 0x1
+IFF_LOOPBACK = 0x8
+IFF_POINTOPOINT = 0x10
+SIOCGIFFLAGS = 0x8913
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+
+def _hex_to_ip(value: str) -> str:
+    return socket.inet_ntoa(struct.pack('<I', int(value, 16)))
+
+
+def read_routes(path: Path = ROUTE_PATH) -> List[Tuple[str, ipaddress.IPv4Network, int]]:
+    """(interface, network, route flags) for every IPv4 route"""
+    routes = []
+    with open(path) as f:
+        next(f, None)  # header
+        for line in f:
+            fields = line.split()
+            if len(fields) < 8:
+                continue
+            iface, destination, _gateway, flags, mask = fields[0], fields[1], fields[2], fields[3], fields[7]
+            try:
+                network = ipaddress.ip_network(f"{_hex_to_ip(destination)}/{_hex_to_ip(mask)}", strict=False)
+                routes.append((iface, network, int(flags, 16)))
+            except ValueError:
+                continue
+    return routes
+
+
+def interface_flags(name: str) -> Optional[int]:
+    """IFF_* flags of an interface, or None if they cannot be read"""
+    try:
+        import fcntl
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            ifreq = struct.pack('16sH22x', name.encode()[:15], 0)
+            return struct.unpack('16sH', fcntl.ioctl(s.fileno(), SIOCGIFFLAGS, ifreq)[:18])[1]
+    except (ImportError, OSError):
+        return None
+
+
+def is_virtual_interface(name: str) -> bool:
+    """Container and VM bridges, veth pairs and similar host-internal links"""
+    return name.startswith(SKIP_INTERFACE_PREFIXES) or (SYS_NET_PATH / name / 'bridge').exists()
+
+
+def local_networks(path: Path = ROUTE_PATH) -> List[str]:
+    """On-link IPv4 networks worth scanning for Delta Chat clients"""
+    routes = read_routes(path)
+    default_ifaces = {iface for iface, network, _flags in routes if network.prefixlen == 0}
+
+    networks = set()
+    for iface, network, flags in routes:
+        if not flags & RTF_UP or flags & RTF_GATEWAY or network.prefixlen == 0:
+            continue
+        if network.is_link_local or network.is_loopback:
+            continue
+        if iface not in default_ifaces and is_virtual_interface(iface):
+            continue
+        if_flags = interface_flags(iface)
+        if if_flags is not None and (not if_flags & IFF_UP or if_flags & (IFF_LOOPBACK | IFF_POINTOPOINT)):
+            continue
+        networks.add(str(network))
+    return sorted(networks)
+
+
+def virtual_networks(path: Path = ROUTE_PATH) -> List[ipaddress.IPv4Network]:
+    """On-link IPv4 networks of container and VM bridges on this host"""
+    routes = read_routes(path)
+    default_ifaces = {iface for iface, network, _flags in routes if network.prefixlen == 0}
+    return sorted({network for iface, network, flags in routes
+                   if flags & RTF_UP and not flags & RTF_GATEWAY and network.prefixlen
+                   and iface not in default_ifaces and is_virtual_interface(iface)},
+                  key=str)
+
+
+def is_usable_address(ip: str, skip_networks=CONTAINER_NETWORKS, allow_loopback: bool = False) -> bool:
+    """Whether a peer's advertised address can be a way to reach it
+
+    ``allow_loopback`` accepts loopback addresses, for peers on this host.
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    if address.is_unspecified or address.is_multicast or (address.is_loopback and not allow_loopback):
+        return False
+    return not any(address in network for network in skip_networks if network.version == address.version)
+
+
+def _open_netlink() -> Optional[socket.socket]:
+    if not hasattr(socket, 'AF_NETLINK'):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        sock.setblocking(False)
+        return sock
+    except OSError:
+        return None
+
+
+class NetworkMap:
+    """Cached local networks, re-read only after netlink reports a change
+
+    Without netlink the route table is simply re-read on every call, which
+    is still only a small procfs read.
+    """
+
+    def __init__(self, route_path: Path = ROUTE_PATH):
+        self.route_path = Path(route_path)
+        self.available = self.route_path.exists()
+        self._networks: Optional[List[str]] = None
+        self._stale = True
+        self._sock = _open_netlink() if self.available else None
+
+    def fileno(self) -> Optional[int]:
+        """Netlink descriptor that becomes readable when the networks may have changed"""
+        return self._sock.fileno() if self._sock is not None else None
+
+    def poll(self) -> bool:
+        """Drain pending change notifications; True if the map went stale"""
+        if self._sock is None:
+            return True
+        changed = False
+        while True:
+            try:
+                if not self._sock.recv(65536, socket.MSG_DONTWAIT):
+                    break
+                changed = True
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self.close()
+                changed = True
+                break
+        self._stale = self._stale or changed
+        return changed
+
+    def networks(self) -> Optional[List[str]]:
+        """Current networks, or None where /proc/net/route does not exist"""
+        if not self.available:
+            return None
+        self.poll()
+        if self._stale or self._networks is None:
+            self._networks = local_networks(self.route_path)
+            self._stale = self._sock is None
+        return list(self._networks)
+
+    def is_usable(self, ip: str, allow_loopback: bool = False,
+                  container_networks: Tuple = CONTAINER_NETWORKS) -> bool:
+        """is_usable_address() that also skips this host's container and VM bridges
+
+        Bridges are recognised by interface name in the route table.
+        Addresses on one of our own scanned networks are always usable, even
+        where a LAN happens to use a container range.
+        """
+        skip = tuple(container_networks)
+        if self.available:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return False
+            if any(address in ipaddress.ip_network(n) for n in self.networks()
+                   if ipaddress.ip_network(n).version == address.version):
+                return True
+            skip += tuple(virtual_networks(self.route_path))
+        return is_usable_address(ip, skip, allow_loopback)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
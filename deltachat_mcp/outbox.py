@@ -0,0 +1,363 @@
+# deltachat_mcp/outbox.py
+"""
+Persistent outbox for send_message
+Outgoing messages are appended to a write-ahead log under BASEDIR before
+send_message returns, and a background drainer submits them to the core in
+batches, retrying failures with exponential backoff. Messages to the same
+chat or address are sent one at a time and in order. On restart the log is
+replayed, so queued messages survive crashes and restarts.
+
+Delivery is at-least-once: a message that was handed to the core right
+before a crash, but not yet marked as sent, is sent again after restart.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .config import Config
+
+TERMINAL_STATES = ('sent', 'failed')
+
+
+class Outbox:
+    """Durable queue of outgoing messages with a background drainer"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = {}
+        self._file = None
+        self._records = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._drainer: Optional[asyncio.Task] = None
+        self._deliver: Optional[Callable[[Dict], Awaitable[Dict]]] = None
+        self._dirty = False
+        self._syncing: Optional[asyncio.Future] = None
+        self._compact_due = False
+        self._tail: Optional[List[str]] = None
+
+    @property
+    def path(self) -> Path:
+        # Resolved lazily: BASEDIR may change during credential auto-detection
+        return self._path or Config.BASEDIR / "outbox.wal"
+
+    # -- write-ahead log -------------------------------------------------
+
+    def open(self):
+        """Replay the WAL and open it for appending"""
+        if self._file is not None:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        # A torn last line from a crash mid-append
+                        continue
+
+        pending = 0
+        for entry in self.entries.values():
+            if entry['state'] not in TERMINAL_STATES:
+                entry['state'] = 'queued'
+                pending += 1
+        if pending:
+            print(f"📤 Outbox: {pending} queued message(s) recovered from {self.path}", file=sys.stderr)
+
+        self._compact()
+
+    def _apply(self, record: Dict):
+        op = record['op']
+        if op == 'enqueue':
+            self.entries[record['id']] = {
+                'id': record['id'],
+                'addr': record.get('addr'),
+                'chat_id': record.get('chat_id'),
+                'text': record['text'],
+                'state': 'queued',
+                'attempts': 0,
+                'next_attempt': 0.0,
+                'created': record['ts'],
+                'updated': record['ts'],
+                'message_id': None,
+                'error': None,
+            }
+            return
+
+        entry = self.entries.get(record['id'])
+        if entry is None:
+            return
+        entry['updated'] = record['ts']
+        if op == 'sent':
+            entry.update(state='sent', message_id=record['message_id'], chat_id=record['chat_id'], error=None)
+        elif op == 'retry':
+            entry.update(state='queued', attempts=record['attempts'], next_attempt=record['next_attempt'],
+                         error=record['error'])
+        elif op == 'failed':
+            entry.update(state='failed', attempts=record['attempts'], error=record['error'])
+
+    def _append(self, record: Dict):
+        record['ts'] = time.time()
+        self._apply(record)
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        self._file.write(line)
+        self._file.flush()
+        if self._tail is not None:
+            # Compaction is writing a snapshot; carry this record over to the new file
+            self._tail.append(line)
+        self._dirty = True  # Made durable by sync()
+        self._records += 1
+        if self._records >= max(Config.OUTBOX_COMPACT_RECORDS, 2 * len(self.entries)):
+            self._compact_due = True  # Done by the next sync(), off the event loop
+
+    def _snapshot(self) -> List[Dict]:
+        """Drop old finished entries and return the records that rebuild the rest"""
+        finished = sorted((e for e in self.entries.values() if e['state'] in TERMINAL_STATES),
+                          key=lambda e: e['updated'])
+        for entry in finished[:max(0, len(finished) - Config.OUTBOX_KEEP_FINISHED)]:
+            del self.entries[entry['id']]
+
+        records = []
+        for entry in self.entries.values():
+            records.append({'op': 'enqueue', 'id': entry['id'], 'addr': entry['addr'],
+                            'chat_id': entry['chat_id'], 'text': entry['text'], 'ts': entry['created']})
+            if entry['state'] == 'sent':
+                records.append({'op': 'sent', 'id': entry['id'], 'message_id': entry['message_id'],
+                                'chat_id': entry['chat_id'], 'ts': entry['updated']})
+            elif entry['state'] == 'failed':
+                records.append({'op': 'failed', 'id': entry['id'], 'attempts': entry['attempts'],
+                                'error': entry['error'], 'ts': entry['updated']})
+            elif entry['attempts']:
+                records.append({'op': 'retry', 'id': entry['id'], 'attempts': entry['attempts'],
+                                'next_attempt': entry['next_attempt'], 'error': entry['error'],
+                                'ts': entry['updated']})
+        return records
+
+    def _write_snapshot(self, records: List[Dict]):
+        """Write records to a temporary file, fsync it and swap it in; runs in a thread"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _reopen(self, records: List[Dict], tail: List[str]):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if tail:
+            self._file.write(''.join(tail))
+            self._file.flush()
+        self._records = len(records) + len(tail)
+
+    def _compact(self):
+        """Rewrite the WAL with pending entries and the most recent finished ones"""
+        records = self._snapshot()
+        self._write_snapshot(records)
+        self._reopen(records, [])
+        self._compact_due = False
+        self._dirty = False
+
+    async def _compact_async(self):
+        """Like _compact(), but writes and fsyncs the snapshot in a thread
+
+        Runs as the shared ``_syncing`` future, so it never overlaps an
+        fsync. Records appended meanwhile go to the old file as usual and
+        are copied into the new one once it is swapped in.
+        """
+        try:
+            self._compact_due = False
+            self._dirty = False  # Everything appended so far is in the snapshot
+            records = self._snapshot()
+            self._tail = []
+            try:
+                await asyncio.to_thread(self._write_snapshot, records)
+            except BaseException:
+                self._dirty = True  # The old file is still current and not yet fsynced
+                raise
+            self._reopen(records, self._tail)
+        finally:
+            self._tail = None
+            self._syncing = None
+
+    async def sync(self):
+        """fsync the WAL in a thread; concurrent callers share one fsync or compaction"""
+        while self._dirty or self._compact_due:
+            if self._syncing is None:
+                work = self._compact_async() if self._compact_due else self._fsync()
+                self._syncing = asyncio.ensure_future(work)
+            await asyncio.shield(self._syncing)
+
+    async def _fsync(self):
+        try:
+            self._dirty = False
+            if self._file is None:
+                return
+            # A duplicate descriptor stays valid even if the file is closed meanwhile
+            fd = os.dup(self._file.fileno())
+            try:
+                await asyncio.to_thread(os.fsync, fd)
+            finally:
+                os.close(fd)
+        finally:
+            self._syncing = None
+
+    # -- public API ------------------------------------------------------
+
+    def enqueue(self, text: str, addr: Optional[str] = None, chat_id: Optional[int] = None) -> Dict:
+        """Queue a message and wake the drainer; await sync() before reporting it as durable"""
+        self.open()
+        outbox_id = uuid.uuid4().hex
+        self._append({'op': 'enqueue', 'id': outbox_id, 'addr': addr, 'chat_id': chat_id, 'text': text})
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.status(outbox_id)
+
+    def status(self, outbox_id: str) -> Optional[Dict]:
+        entry = self.entries.get(outbox_id)
+        if entry is None:
+            return None
+        return {
+            'outbox_id': entry['id'],
+            'status': entry['state'],
+            'attempts': entry['attempts'],
+            'chat_id': entry['chat_id'],
+            'message_id': entry['message_id'],
+            'error': entry['error'],
+            'created': entry['created'],
+            'updated': entry['updated'],
+        }
+
+    def pending_count(self) -> int:
+        return sum(1 for e in self.entries.values() if e['state'] not in TERMINAL_STATES)
+
+    async def wait(self, outbox_id: str, timeout: Optional[float] = None) -> Dict:
+        """Wait until a message is sent or has finally failed"""
+        entry = self.entries.get(outbox_id)
+        if entry is not None and entry['state'] not in TERMINAL_STATES:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(outbox_id, []).append(future)
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.status(outbox_id)
+
+    def ensure_started(self, deliver: Callable[[Dict], Awaitable[Dict]]):
+        """Start the drainer on the running loop if it is not running yet
+
+        ``deliver(entry)`` sends one message and returns its
+        ``{"message_id", "chat_id"}``.
+        """
+        self.open()
+        if self._drainer is not None and not self._drainer.done():
+            return
+        self._deliver = deliver
+        self._wakeup = asyncio.Event()
+        self._drainer = asyncio.create_task(self._drain_loop())
+
+    async def stop(self):
+        if self._drainer is not None:
+            self._drainer.cancel()
+            try:
+                await self._drainer
+            except asyncio.CancelledError:
+                pass
+            self._drainer = None
+        if self._syncing is not None:
+            # Let an in-flight fsync or compaction finish before closing the file
+            try:
+                await asyncio.shield(self._syncing)
+            except Exception as e:
+                print(f"⚠️ Outbox: WAL sync failed during shutdown: {e}", file=sys.stderr)
+        if self._file is not None:
+            if self._dirty:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+            self._file.close()
+            self._file = None
+
+    # -- drainer ---------------------------------------------------------
+
+    def _heads(self) -> List[Dict]:
+        """Oldest unfinished entry per destination, oldest first
+
+        Messages to one chat or address go out strictly one after another,
+        and a later message never overtakes an earlier one that waits for
+        a retry; different destinations are sent concurrently.
+        """
+        heads = {}
+        for entry in sorted(self.entries.values(), key=lambda e: e['created']):
+            if entry['state'] not in TERMINAL_STATES:
+                heads.setdefault(_destination(entry), entry)
+        return list(heads.values())
+
+    async def _drain_loop(self):
+        while True:
+            now = time.time()
+            heads = self._heads()
+            due = [e for e in heads if e['state'] == 'queued' and e['next_attempt'] <= now]
+            batch = due[:Config.OUTBOX_BATCH_SIZE]
+
+            if batch:
+                for entry in batch:
+                    entry['state'] = 'sending'
+                await asyncio.gather(*(self._submit(entry) for entry in batch))
+                await self.sync()
+                continue
+
+            self._wakeup.clear()
+            retry_times = [e['next_attempt'] for e in heads if e['state'] == 'queued']
+            timeout = max(0.0, min(retry_times) - now) if retry_times else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _submit(self, entry: Dict):
+        try:
+            result = await self._deliver(entry)
+        except asyncio.CancelledError:
+            entry['state'] = 'queued'
+            raise
+        except Exception as e:
+            attempts = entry['attempts'] + 1
+            if attempts >= Config.OUTBOX_MAX_ATTEMPTS:
+                print(f"❌ Outbox: giving up on {entry['id']} after {attempts} attempts: {e}", file=sys.stderr)
+                self._append({'op': 'failed', 'id': entry['id'], 'attempts': attempts, 'error': str(e)})
+                self._notify(entry['id'])
+            else:
+                delay = min(Config.OUTBOX_RETRY_MAX, Config.OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+                delay *= random.uniform(0.8, 1.2)
+                self._append({'op': 'retry', 'id': entry['id'], 'attempts': attempts,
+                              'next_attempt': time.time() + delay, 'error': str(e)})
+            return
+
+        self._append({'op': 'sent', 'id': entry['id'], 'message_id': result['message_id'],
+                      'chat_id': result['chat_id']})
+        self._notify(entry['id'])
+
+    def _notify(self, outbox_id: str):
+        for future in self._waiters.pop(outbox_id, []):
+            if not future.done():
+                future.set_result(None)
+
+
+def _destination(entry: Dict):
+    if entry['chat_id']:
+        return 'chat', entry['chat_id']
+    return 'addr', (entry['addr'] or '').lower()
+
+
+# Global instance
+outbox = Outbox()
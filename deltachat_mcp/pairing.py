@@ -4,32 +4,183 @@ Automatic pairing functionality for Delta Chat MCP server
 Handles network discovery and automatic second device pairing
 """
 import asyncio
+import ipaddress
+import itertools
 import json
 import socket
 import threading
 import time
-from typing import Optional, Dict, List, Tuple
+from typing import AsyncIterator, Optional, Dict, List, Set, Tuple
 import websockets
 import subprocess
 import os
-from pathlib import Path
-import sqlite3
+
+from .backup_sources import backup_sources
+from .config import Config
+from .netmap import NetworkMap
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _clamp_to_fd_limit(concurrency: int) -> int:
+    """Keep the number of scan sockets well below the open file limit"""
+    try:
+        import resource
+        soft, _hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            return max(1, min(concurrency, soft - 128))
+    except (ImportError, ValueError, OSError):
+        pass
+    return max(1, concurrency)
+
+
+async def _probe_port(ip: str, port: int) -> int:
+    _reader, writer = await asyncio.open_connection(ip, port)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return port
+
+
+async def _probe_host(ip: str, ports: List[int], deadline: float) -> Optional[int]:
+    """Probe all ports of a host at once; return the first one that accepts"""
+    tasks = [asyncio.create_task(_probe_port(ip, port)) for port in ports]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            try:
+                return await next_done
+            except OSError:
+                continue
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return None
+
+
+def parse_direct_address(address: str, default_ports: Optional[List[int]] = None) -> List[Tuple[str, int]]:
+    """Turn ``ip:port``, ``[v6]:port`` or a bare address into (host, port) pairs"""
+    address = address.strip()
+    if address.startswith('['):
+        host, _, port = address[1:].partition(']')
+        port = port.lstrip(':')
+    elif address.count(':') == 1:
+        host, port = address.split(':')
+    else:
+        host, port = address, ''
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return []
+    if port:
+        return [(host, int(port))] if port.isdigit() else []
+    return [(host, p) for p in default_ports or []]
+
+
+class ClientTable:
+    """Discovered clients keyed by (ip, port), forgotten ``ttl`` seconds after last seen"""
+
+    def __init__(self, ttl: float = 120.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, int], Dict] = {}
+
+    def seen(self, client: Dict, now: Optional[float] = None) -> bool:
+        """Record a sighting; True if the client was not in the table yet"""
+        now = now or time.time()
+        key = (client['ip'], client['port'])
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                self._clients[key] = dict(client, first_seen=now, last_seen=now)
+                return True
+            entry['last_seen'] = now
+            entry['network'] = client.get('network', entry.get('network'))
+            return False
+
+    def expire(self, now: Optional[float] = None) -> List[Dict]:
+        """Drop clients not seen within the TTL and return them"""
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            stale = [key for key, entry in self._clients.items() if entry['last_seen'] < cutoff]
+            return [self._clients.pop(key) for key in stale]
+
+    def update(self, clients: List[Dict], now: Optional[float] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Apply one scan pass; returns the (added, removed) clients"""
+        now = now or time.time()
+        added = [dict(client) for client in clients if self.seen(client, now)]
+        return added, self.expire(now)
+
+    def clients(self) -> List[Dict]:
+        with self._lock:
+            return [dict(entry) for entry in self._clients.values()]
+
+    def __len__(self):
+        return len(self._clients)
+
+
+class ScanScheduler:
+    """Decide when the next discovery pass runs
+
+    Passes start AUTO_PAIRING_SCAN_INTERVAL apart and back off exponentially,
+    up to AUTO_PAIRING_SCAN_MAX_INTERVAL, while nothing changes. A change in
+    the client table or in the local networks resets the interval.
+    """
+
+    def __init__(self):
+        self.idle_passes = 0
+        self._networks: Optional[Tuple[str, ...]] = None
+
+    def record_pass(self, changed: bool):
+        self.idle_passes = 0 if changed else self.idle_passes + 1
+
+    def interfaces_changed(self, networks: List[str]) -> bool:
+        """Remember the current networks; True if they differ from last time"""
+        signature = tuple(sorted(networks))
+        changed = self._networks is not None and signature != self._networks
+        self._networks = signature
+        if changed:
+            self.idle_passes = 0
+        return changed
+
+    def next_delay(self) -> float:
+        base = max(1, Config.AUTO_PAIRING_SCAN_INTERVAL)
+        return min(base * 2 ** min(self.idle_passes, 16), max(base, Config.AUTO_PAIRING_SCAN_MAX_INTERVAL))
+
 
 class NetworkDiscovery:
     """Discover running Delta Chat clients on the local network"""
 
     def __init__(self):
-        self.discovered_clients = []
-        self.scan_running = False
-        self._scan_thread = None
+        self.clients = ClientTable(ttl=Config.AUTO_PAIRING_CLIENT_TTL)
+        self.scheduler = ScanScheduler()
+        self.network_map = NetworkMap()
 
     def get_local_networks(self) -> List[str]:
-        """Get local network interfaces and their subnets"""
-        networks = []
+        """Get local network interfaces and their subnets
+
+        AUTO_PAIRING_NETWORKS, when set, replaces detection entirely.
+        """
+        if Config.AUTO_PAIRING_NETWORKS.strip():
+            return [n.strip() for n in Config.AUTO_PAIRING_NETWORKS.split(',') if n.strip()]
 
+        networks = self.network_map.networks()
+        if networks is not None:
+            return networks
+
+        # No /proc/net/route on this platform
+        networks = []
         try:
-            # Use system commands to get network interfaces
-            if os.name == 'posix':  # Linux/Mac
+            if os.name == 'posix':  # Mac/BSD
                 result = subprocess.run(['ip', 'route'], capture_output=True, text=True)
                 if result.returncode == 0:
                     for line in result.stdout.split('\n'):
@@ -44,114 +195,147 @@ class NetworkDiscovery:
                     if 'Subnet Mask' in line:
                         networks.append("192.168.1.0/24")  # Default fallback
         except Exception as e:
-            print(f"Warning: Could not detect networks: {e}")
-            # Fallback to common private networks
-            networks = ["192.168.1.0/24", "10.0.0.0/24", "172.16.0.0/24"]
+            print(f"Warning: Could not detect networks, set AUTO_PAIRING_NETWORKS: {e}")
 
         return list(set(networks))  # Remove duplicates
 
-    def scan_network_for_deltachat(self, network: str) -> List[Dict]:
-        """Scan a network for Delta Chat clients"""
-        clients = []
-
-        try:
-            # Parse network CIDR
-            if '/' in network:
-                network_base, prefix = network.split('/')
-                prefix = int(prefix)
-            else:
-                network_base = network
-                prefix = 24
-
-            # Generate IP range
-            ip_parts = network_base.split('.')
-            if len(ip_parts) != 4:
-                return clients
+    async def _current_networks(self) -> List[str]:
+        if self.network_map.available:
+            return self.get_local_networks()
+        return await asyncio.to_thread(self.get_local_networks)
 
-            # Calculate range
-            base_ip = int(ip_parts[3])
-            mask = (0xffffffff << (32 - prefix)) & 0xffffffff
-            network_int = sum(int(ip_parts[i]) << (24 - 8 * i) for i in range(4)) & mask
-            broadcast_int = network_int | (~mask & 0xffffffff)
+    async def scan_network_async(self, network: str, ports: Optional[List[int]] = None,
+                                 concurrency: Optional[int] = None,
+                                 host_deadline: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Scan a whole network concurrently, yielding clients as they are found
 
-            start_ip = network_int + 1
-            end_ip = broadcast_int - 1
+        Every host gets all ports probed at once and at most ``host_deadline``
+        seconds to answer; ``concurrency`` caps the number of sockets open at
+        the same time, so a /24 finishes in about one deadline.
+        """
+        ports = ports or Config.get_pairing_ports()
+        concurrency = _clamp_to_fd_limit(concurrency or Config.AUTO_PAIRING_SCAN_CONCURRENCY)
+        host_deadline = host_deadline or Config.AUTO_PAIRING_HOST_DEADLINE
 
-            # Common Delta Chat ports
-            ports_to_check = [9933, 9934, 42654, 42655]  # Delta Chat WebSocket ports
-
-            # Scan for open ports (simplified - in production, use proper async scanning)
-            for ip_int in range(start_ip, min(end_ip + 1, start_ip + 50)):  # Limit scan range
-                ip = '.'.join(str((ip_int >> (24 - 8 * i)) & 0xff) for i in range(4))
-
-                for port in ports_to_check:
-                    try:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(0.5)
-                        result = sock.connect_ex((ip, port))
-                        sock.close()
-
-                        if result == 0:  # Port is open
-                            client_info = {
-                                'ip': ip,
-                                'port': port,
-                                'timestamp': time.time(),
-                                'network': network
-                            }
-                            clients.append(client_info)
-                            break  # Found one port, move to next IP
-
-                    except Exception:
-                        continue
-
-        except Exception as e:
+        try:
+            net = ipaddress.ip_network(network.strip(), strict=False)
+        except ValueError as e:
             print(f"Error scanning network {network}: {e}")
+            return
+        if net.num_addresses > Config.AUTO_PAIRING_MAX_HOSTS + 2:
+            print(f"Warning: {network} has {net.num_addresses} addresses, "
+                  f"scanning only the first {Config.AUTO_PAIRING_MAX_HOSTS}")
+
+        hosts = itertools.islice(net.hosts(), Config.AUTO_PAIRING_MAX_HOSTS)
+        found: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for ip in hosts:
+                port = await _probe_host(str(ip), ports, host_deadline)
+                if port is not None:
+                    await found.put({
+                        'ip': str(ip),
+                        'port': port,
+                        'timestamp': time.time(),
+                        'network': network
+                    })
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency // len(ports)))]
+        done = asyncio.ensure_future(asyncio.gather(*workers))
+        try:
+            while not (done.done() and found.empty()):
+                getter = asyncio.ensure_future(found.get())
+                await asyncio.wait([getter, done], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            done.result()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
-        return clients
+    async def scan_networks_async(self, networks: List[str]) -> List[Dict]:
+        """Scan several networks concurrently and collect the clients found"""
+        async def collect(network):
+            return [client async for client in self.scan_network_async(network)]
 
-    def start_continuous_scan(self, callback=None):
-        """Start continuous network scanning in background thread"""
-        if self.scan_running:
-            return
+        results = await asyncio.gather(*(collect(n) for n in networks), return_exceptions=True)
+        clients = []
+        for network, result in zip(networks, results):
+            if isinstance(result, Exception):
+                print(f"Error scanning network {network}: {result}")
+            else:
+                clients.extend(result)
+        return clients
 
-        self.scan_running = True
-        self._scan_thread = threading.Thread(target=self._scan_loop, args=(callback,), daemon=True)
-        self._scan_thread.start()
+    def scan_network_for_deltachat(self, network: str) -> List[Dict]:
+        """Scan a network for Delta Chat clients (blocking wrapper, not for use on the loop)"""
+        return asyncio.run(self.scan_networks_async([network]))
 
-    def stop_continuous_scan(self):
-        """Stop continuous network scanning"""
-        self.scan_running = False
-        if self._scan_thread:
-            self._scan_thread.join(timeout=1.0)
+    async def run(self, callback=None):
+        """Scan continuously until cancelled
 
-    def _scan_loop(self, callback=None):
-        """Background scanning loop"""
-        while self.scan_running:
+        ``await callback(added, removed)`` runs after a pass that changed the client table.
+        """
+        while True:
             try:
-                networks = self.get_local_networks()
-                new_clients = []
+                networks = await self._current_networks()
+                self.scheduler.interfaces_changed(networks)
+                added, removed = self.clients.update(await self.scan_networks_async(networks))
+                self.scheduler.record_pass(bool(added or removed))
 
-                for network in networks:
-                    clients = self.scan_network_for_deltachat(network)
-                    new_clients.extend(clients)
+                # Notify callback only about what changed
+                if callback and (added or removed):
+                    await callback(added, removed)
 
-                # Update discovered clients
-                self.discovered_clients = new_clients
+            except Exception as e:
+                print(f"Error in network scan loop: {e}")
+                self.scheduler.record_pass(False)
 
-                # Notify callback if provided
-                if callback and new_clients:
-                    callback(new_clients)
+            await self._wait_for_next_scan()
 
-                # Wait before next scan
-                time.sleep(30)  # Scan every 30 seconds
+    async def _wait_for_next_scan(self):
+        """Sleep until the next pass is due, waking early if the networks change"""
+        delay = self.scheduler.next_delay()
+        if not self.network_map.available:
+            # Reading the networks forks a process here; the next pass reads them anyway
+            await asyncio.sleep(delay)
+            return
 
-            except Exception as e:
-                print(f"Error in network scan loop: {e}")
-                time.sleep(60)  # Wait longer on error
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        fd = self.network_map.fileno()
+        if fd is not None:
+            loop.add_reader(fd, lambda: self.network_map.poll() and changed.set())
+        try:
+            deadline = time.monotonic() + delay
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=min(remaining, Config.AUTO_PAIRING_SCAN_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+                changed.clear()
+                if self.scheduler.interfaces_changed(await self._current_networks()):
+                    print("🔀 Network interfaces changed, scanning now")
+                    return
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
 
     def get_discovered_clients(self) -> List[Dict]:
         """Get currently discovered Delta Chat clients"""
-        return self.discovered_clients.copy()
+        return self.clients.clients()
+
+# Delay between direct connection attempts, as in RFC 8305
+DIRECT_ATTEMPT_DELAY = 0.25
+# Share of AUTO_PAIRING_TIMEOUT the direct addresses get while discovered clients wait
+DIRECT_DEADLINE_SHARE = 0.5
+
 
 class AutoPairing:
     """Handle automatic pairing with Delta Chat clients"""
@@ -160,77 +344,19 @@ class AutoPairing:
         self.network_discovery = NetworkDiscovery()
         self.is_pairing = False
         self.paired_info = None
-        self._pairing_thread = None
-
-    def find_delta_chat_databases(self) -> List[Path]:
-        """Find Delta Chat database files for auto-detection"""
-        search_paths = [
-            Path.home() / '.config' / 'deltachat',
-            Path.home() / '.deltachat',
-            Path.home() / 'dc-data',
-            Path.home() / '.local' / 'share' / 'deltachat',
-        ]
-
-        db_files = []
-        for search_path in search_paths:
-            if search_path.exists():
-                for pattern in ['*.db', '*.sqlite']:
-                    db_files.extend(search_path.glob(pattern))
-
-        return db_files
-
-    def extract_backup_from_db(self, db_path: Path) -> Optional[str]:
-        """Extract backup string from Delta Chat database"""
-        try:
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-
-            # Look for backup information in the database
-            cursor.execute("SELECT key, value FROM config WHERE key LIKE '%backup%' OR key LIKE '%node%'")
-            config_rows = cursor.fetchall()
-
-            # Also check for device information
-            cursor.execute("SELECT key, value FROM config WHERE key IN ('selfaddr', 'addr', 'configured_addr')")
-            addr_rows = cursor.fetchall()
-
-            conn.close()
-
-            # If we found configuration, we might be able to reconstruct pairing info
-            # This is a simplified approach - real implementation would need to handle
-            # the actual backup string format properly
-
-            return None  # Placeholder - would need proper backup string extraction
-
-        except Exception as e:
-            print(f"Error extracting backup from {db_path}: {e}")
-            return None
-
-    def monitor_clipboard_for_backup(self) -> Optional[str]:
-        """Monitor clipboard for Delta Chat backup strings"""
-        try:
-            # Try to read from clipboard (Linux)
-            if os.name == 'posix':
-                result = subprocess.run(['xclip', '-o', '-selection', 'clipboard'],
-                                      capture_output=True, text=True, timeout=2)
-                if result.returncode == 0:
-                    clipboard_content = result.stdout.strip()
-                    if clipboard_content.startswith('DCBACKUP3:'):
-                        return clipboard_content
-
-                # Try alternative clipboard tools
-                result = subprocess.run(['xsel', '-o', '--clipboard'],
-                                      capture_output=True, text=True, timeout=2)
-                if result.returncode == 0:
-                    clipboard_content = result.stdout.strip()
-                    if clipboard_content.startswith('DCBACKUP3:'):
-                        return clipboard_content
-
-        except Exception as e:
-            print(f"Error monitoring clipboard: {e}")
-
-        return None
-
-    def attempt_automatic_pairing(self, backup_string: Optional[str] = None) -> bool:
+        self._refused: Dict[Tuple[str, int], float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._own_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._supervisor = None
+        self._paired: Optional[asyncio.Event] = None
+        self._backup_ready: Optional[asyncio.Event] = None
+        self._pairing_tasks: Set[asyncio.Task] = set()
+        self._paired_waiters: List[asyncio.Future] = []
+        self._waiters_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stopped.set()
+
+    async def pair(self, backup_string: Optional[str] = None) -> bool:
         """Attempt automatic pairing with discovered clients"""
         if self.is_pairing:
             return False
@@ -240,7 +366,7 @@ class AutoPairing:
         try:
             # If no backup string provided, try to get one
             if not backup_string:
-                backup_string = self._get_backup_string()
+                backup_string = self.backup_string()
 
             if not backup_string:
                 print("❌ No backup string available for pairing")
@@ -250,7 +376,6 @@ class AutoPairing:
             print(f"   Backup node: {backup_string.split('&')[1] if '&' in backup_string else 'unknown'}")
 
             # Parse backup string
-            from .config import Config
             backup_info = Config.parse_backup_string(backup_string)
 
             if not backup_info:
@@ -258,11 +383,13 @@ class AutoPairing:
                 return False
 
             # Try to pair with discovered clients
-            success = self._try_pairing_with_clients(backup_info)
+            success = await self._pair(backup_info)
 
             if success:
                 print("✅ Automatic pairing successful!")
-                self.paired_info = backup_info
+                with self._waiters_lock:
+                    self.paired_info = backup_info
+                self._on_paired()
                 return True
             else:
                 print("❌ Automatic pairing failed")
@@ -271,61 +398,167 @@ class AutoPairing:
         finally:
             self.is_pairing = False
 
-    def _get_backup_string(self) -> Optional[str]:
-        """Get backup string from various sources"""
-        # First try clipboard
-        clipboard_backup = self.monitor_clipboard_for_backup()
-        if clipboard_backup:
-            print("📋 Found backup string in clipboard")
-            return clipboard_backup
-
-        # Then try existing databases
-        db_files = self.find_delta_chat_databases()
-        for db_file in db_files:
-            backup = self.extract_backup_from_db(db_file)
-            if backup:
-                print(f"💾 Found backup string in database: {db_file}")
-                return backup
+    def attempt_automatic_pairing(self, backup_string: Optional[str] = None) -> bool:
+        """Blocking wrapper around pair() for callers outside the event loop"""
+        loop = self._loop
+        if loop is not None and loop.is_running() and _running_loop() is not loop:
+            return asyncio.run_coroutine_threadsafe(self.pair(backup_string), loop).result()
+        return asyncio.run(self.pair(backup_string))
+
+    def _on_paired(self):
+        """Nothing left to discover once paired: let the supervisor wind down"""
+        loop, paired = self._loop, self._paired
+        if loop is not None and paired is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(paired.set)
+
+        with self._waiters_lock:
+            waiters, self._paired_waiters = self._paired_waiters, []
+        for future in waiters:
+            if not future.get_loop().is_closed():
+                future.get_loop().call_soon_threadsafe(_resolve, future, self.paired_info)
+
+    async def wait_paired(self) -> Dict:
+        """Backup info of the primary device, once pairing has succeeded
+
+        Can be awaited from any event loop, not only the one pairing runs on.
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self._waiters_lock:
+            if self.paired_info:
+                return self.paired_info
+            self._paired_waiters.append(future)
+        try:
+            return await future
+        finally:
+            with self._waiters_lock:
+                if future in self._paired_waiters:
+                    self._paired_waiters.remove(future)
+
+    def backup_string(self) -> Optional[str]:
+        """Latest backup string offered by any of the backup-string sources"""
+        return backup_sources.latest()
 
-        return None
+    async def _pair(self, backup_info: Dict) -> bool:
+        """Pair via the backup's direct addresses, falling back to discovered clients
+
+        Every attempt runs concurrently, bounded by AUTO_PAIRING_TIMEOUT.
+        """
+        deadline = time.monotonic() + Config.AUTO_PAIRING_TIMEOUT
+        try:
+            return await asyncio.wait_for(self._pair_candidates(backup_info, deadline),
+                                          timeout=Config.AUTO_PAIRING_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"⏱️ Pairing gave up after {Config.AUTO_PAIRING_TIMEOUT}s")
+            return False
 
-    def _try_pairing_with_clients(self, backup_info: Dict) -> bool:
-        """Try to pair with discovered Delta Chat clients"""
-        import asyncio
+    async def _pair_candidates(self, backup_info: Dict, deadline: float) -> bool:
+        clients = [c for c in self.network_discovery.get_discovered_clients()
+                   if not self._recently_refused(c)]
 
-        # Get discovered clients
-        clients = self.network_discovery.get_discovered_clients()
+        # Blackholed direct addresses must not use up the whole round when
+        # there are discovered clients to try as well
+        direct_deadline = Config.AUTO_PAIRING_TIMEOUT * (DIRECT_DEADLINE_SHARE if clients else 1.0)
+        try:
+            direct = self._pair_direct(backup_info, min(deadline, time.monotonic() + direct_deadline))
+            if await asyncio.wait_for(direct, timeout=direct_deadline):
+                return True
+        except asyncio.TimeoutError:
+            print(f"⏱️ No direct address answered within {direct_deadline:.0f}s")
 
         if not clients:
             print("🔍 No Delta Chat clients discovered on network")
             print("💡 Make sure Delta Chat desktop is running and in pairing mode")
             return False
 
-        print(f"📍 Found {len(clients)} potential Delta Chat clients")
+        print(f"📍 Trying {len(clients)} potential Delta Chat clients at once")
+        client = await self._race_pairing(clients, backup_info, deadline=deadline)
+        if client:
+            print(f"✅ Successfully paired with {client['ip']}:{client['port']}")
+            return True
+        return False
 
-        # Try to connect to each client
-        for client in clients:
-            print(f"🔌 Trying to pair with {client['ip']}:{client['port']}")
+    def _recently_refused(self, client: Dict) -> bool:
+        """Negative cache: skip hosts that refused us within AUTO_PAIRING_REFUSED_TTL"""
+        key = (client['ip'], client['port'])
+        expires = self._refused.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._refused[key]
+            return False
+        return True
 
-            try:
-                # Attempt WebSocket connection and pairing handshake
-                success = asyncio.run(self._attempt_single_pairing(client, backup_info))
-                if success:
-                    print(f"✅ Successfully paired with {client['ip']}:{client['port']}")
-                    return True
+    def _mark_refused(self, client: Dict):
+        self._refused[(client['ip'], client['port'])] = time.monotonic() + Config.AUTO_PAIRING_REFUSED_TTL
 
-            except Exception as e:
-                print(f"❌ Failed to pair with {client['ip']}:{client['port']} - {e}")
-                continue
+    async def _pair_direct(self, backup_info: Dict, deadline: Optional[float] = None) -> bool:
+        """Race the primary device's advertised addresses, first handshake wins"""
+        clients = []
+        skipped = 0
+        network_map = self.network_discovery.network_map
+        container_networks = Config.get_container_networks()
+        for address in backup_info.get('direct_addresses') or []:
+            for host, port in parse_direct_address(str(address), Config.get_pairing_ports()):
+                if not network_map.is_usable(host, Config.AUTO_PAIRING_ALLOW_LOOPBACK, container_networks):
+                    skipped += 1
+                    continue
+                client = {'ip': host, 'port': port, 'source': 'direct'}
+                if not self._recently_refused(client):
+                    clients.append(client)
+        if skipped:
+            print(f"   Skipping {skipped} direct address(es) on container or loopback networks")
+        if not clients:
+            return False
 
+        print(f"🎯 Racing {len(clients)} direct address(es) from the backup string")
+        client = await self._race_pairing(clients, backup_info, stagger=DIRECT_ATTEMPT_DELAY, deadline=deadline)
+        if client:
+            print(f"✅ Successfully paired with {client['ip']}:{client['port']}")
+            return True
         return False
 
-    async def _attempt_single_pairing(self, client: Dict, backup_info: Dict) -> bool:
-        """Attempt pairing with a single client"""
+    async def _race_pairing(self, clients: List[Dict], backup_info: Dict, stagger: float = 0.0,
+                            deadline: Optional[float] = None) -> Optional[Dict]:
+        """Start a handshake per client, ``stagger`` seconds apart (happy eyeballs)
+
+        Returns the first client that accepts; the other attempts are cancelled.
+        Every handshake has to finish by ``deadline`` (a time.monotonic() value,
+        AUTO_PAIRING_TIMEOUT from now by default).
+        """
+        if deadline is None:
+            deadline = time.monotonic() + Config.AUTO_PAIRING_TIMEOUT
+
+        async def attempt(index, client):
+            await asyncio.sleep(index * stagger)
+            if await self._attempt_single_pairing(client, backup_info, deadline):
+                return client
+            return None
+
+        tasks = [asyncio.create_task(attempt(i, c)) for i, c in enumerate(clients)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    client = await next_done
+                except Exception:
+                    continue
+                if client:
+                    return client
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _attempt_single_pairing(self, client: Dict, backup_info: Dict, deadline: float) -> bool:
+        """Attempt pairing with a single client, giving up at ``deadline`` (time.monotonic())"""
         try:
-            uri = f"ws://{client['ip']}:{client['port']}/"
+            host = f"[{client['ip']}]" if ':' in client['ip'] else client['ip']
+            uri = f"ws://{host}:{client['port']}/"
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
 
-            async with websockets.connect(uri, timeout=10.0) as websocket:
+            async with websockets.connect(uri, open_timeout=remaining) as websocket:
                 print(f"   Connected to {client['ip']}:{client['port']}")
 
                 # Send pairing request
@@ -339,7 +572,7 @@ class AutoPairing:
                 print(f"   Sent pairing request for node: {backup_info['node_id']}")
 
                 # Wait for response
-                response = await asyncio.wait_for(websocket.recv(), timeout=15.0)
+                response = await asyncio.wait_for(websocket.recv(), timeout=max(0.0, deadline - time.monotonic()))
                 response_data = json.loads(response)
 
                 if response_data.get("type") == "pairing_accepted":
@@ -347,60 +580,160 @@ class AutoPairing:
                     return True
                 else:
                     print(f"   ❌ Pairing rejected: {response_data.get('error', 'Unknown error')}")
+                    self._mark_refused(client)
                     return False
 
         except asyncio.TimeoutError:
             print(f"   ⏱️ Connection timeout to {client['ip']}:{client['port']}")
             return False
+        except ConnectionRefusedError:
+            print(f"   ❌ Connection refused by {client['ip']}:{client['port']}")
+            self._mark_refused(client)
+            return False
         except Exception as e:
             print(f"   ❌ Connection error: {e}")
             return False
 
     def start_auto_pairing_service(self):
-        """Start the automatic pairing service"""
-        print("🚀 Starting automatic pairing service...")
+        """Start discovery and pairing as supervised tasks on the running event loop
 
-        # Start network discovery
-        self.network_discovery.start_continuous_scan(callback=self._on_clients_discovered)
+        Callers without a running loop (such as the GUI) get a single
+        background loop thread instead.
+        """
+        if self._supervisor is not None and not self._supervisor.done():
+            return
 
-        # Start pairing attempts in background thread
-        self._pairing_thread = threading.Thread(target=self._pairing_loop, daemon=True)
-        self._pairing_thread.start()
+        print("🚀 Starting automatic pairing service...")
+        self._stopped.clear()
+        loop = _running_loop()
+        if loop is not None:
+            self._loop = loop
+            self._supervisor = loop.create_task(self._supervise())
+        else:
+            self._loop = self._background_loop()
+            self._supervisor = asyncio.run_coroutine_threadsafe(self._supervise(), self._loop)
 
     def stop_auto_pairing_service(self):
         """Stop the automatic pairing service"""
-        print("🛑 Stopping automatic pairing service...")
-        self.network_discovery.stop_continuous_scan()
+        supervisor, loop = self._supervisor, self._loop
+        if supervisor is None or supervisor.done() or loop.is_closed():
+            return
 
-    def _on_clients_discovered(self, clients: List[Dict]):
-        """Callback when new clients are discovered"""
-        if clients and not self.is_pairing:
-            print(f"📱 Discovered {len(clients)} Delta Chat client(s)")
-            for client in clients:
+        print("🛑 Stopping automatic pairing service...")
+        loop.call_soon_threadsafe(supervisor.cancel)
+        if _running_loop() is not loop:
+            # Wait for the tasks to finish their cleanup
+            self._stopped.wait(timeout=5.0)
+
+    async def stop(self):
+        """Stop the service and wait until all of its tasks have finished"""
+        self.stop_auto_pairing_service()
+        supervisor = self._supervisor
+        if isinstance(supervisor, asyncio.Task) and supervisor.get_loop() is _running_loop():
+            await asyncio.gather(supervisor, return_exceptions=True)
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        if self._own_loop is None:
+            self._own_loop = asyncio.new_event_loop()
+            threading.Thread(target=self._own_loop.run_forever, name="dc-auto-pairing", daemon=True).start()
+        return self._own_loop
+
+    async def _supervise(self):
+        """Run discovery, backup-string sources and pairing as child tasks
+
+        Cancelling the supervisor stops all of them; so does a successful pairing.
+        """
+        loop = asyncio.get_running_loop()
+        self._paired = asyncio.Event()
+        self._backup_ready = asyncio.Event()
+
+        def on_backup_string(_backup_string):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._backup_ready.set)
+
+        backup_sources.add_listener(on_backup_string)
+        sources = asyncio.create_task(backup_sources.run())
+        tasks = [
+            asyncio.create_task(self.network_discovery.run(self._on_clients_discovered)),
+            asyncio.create_task(self._pairing_loop()),
+            asyncio.create_task(self._paired.wait()),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception():
+                    print(f"❌ Automatic pairing task failed: {task.exception()}")
+        finally:
+            backup_sources.remove_listener(on_backup_string)
+            pairing_tasks = list(self._pairing_tasks)
+            for task in tasks + [sources] + pairing_tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, sources, *pairing_tasks, return_exceptions=True)
+            self._paired = None
+            self._stopped.set()
+            print("🛑 Automatic pairing service stopped")
+
+    async def _on_clients_discovered(self, added: List[Dict], removed: List[Dict]):
+        """Callback when the set of discovered clients changes"""
+        for client in removed:
+            print(f"📴 Delta Chat client gone: {client['ip']}:{client['port']}")
+
+        if added and not self.is_pairing:
+            print(f"📱 Discovered {len(added)} new Delta Chat client(s)")
+            for client in added:
                 print(f"   - {client['ip']}:{client['port']}")
 
-            # Automatically attempt pairing if we have a backup string
-            backup_string = self._get_backup_string()
+            # Automatically attempt pairing if we have a backup string; as a
+            # task, so the scan that found these clients carries on meanwhile
+            backup_string = self.backup_string()
             if backup_string:
                 print("🔄 Auto-initiating pairing...")
-                self.attempt_automatic_pairing(backup_string)
+                task = asyncio.create_task(self.pair(backup_string))
+                self._pairing_tasks.add(task)
+                task.add_done_callback(self._pairing_done)
+
+    def _pairing_done(self, task: asyncio.Task):
+        self._pairing_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Error in pairing: {task.exception()}")
+
+    async def _pairing_loop(self):
+        """Pair with the latest backup string, waking whenever a new one arrives"""
+        failures = 0
+        while not self.paired_info:
+            delay = None  # Nothing to try until a backup string shows up
+            backup_string = self.backup_string()
+            if backup_string:
+                if not self.is_pairing:
+                    try:
+                        if await self.pair(backup_string):
+                            return
+                    except Exception as e:
+                        print(f"Error in pairing loop: {e}")
+                    failures += 1
+
+                # Retry later, backing off while attempts keep failing
+                delay = Config.AUTO_PAIRING_SCAN_INTERVAL * 2 ** min(failures, 4)
 
-    def _pairing_loop(self):
-        """Background loop for automatic pairing attempts"""
-        while True:
             try:
-                if not self.is_pairing and not self.paired_info:
-                    # Try to get backup string and pair
-                    backup_string = self._get_backup_string()
-                    if backup_string:
-                        self.attempt_automatic_pairing(backup_string)
+                await asyncio.wait_for(self._backup_ready.wait(), timeout=delay)
+                failures = 0
+            except asyncio.TimeoutError:
+                pass
+            self._backup_ready.clear()
 
-                # Wait before next attempt
-                time.sleep(60)  # Try every minute
+def _resolve(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
 
-            except Exception as e:
-                print(f"Error in pairing loop: {e}")
-                time.sleep(120)  # Wait longer on error
 
 # Global instance
 auto_pairing = AutoPairing()
+
+
+def _on_config_reload(changes: Dict):
+    if "AUTO_PAIRING_CLIENT_TTL" in changes:
+        auto_pairing.network_discovery.clients.ttl = Config.AUTO_PAIRING_CLIENT_TTL
+
+
+Config.on_reload(_on_config_reload)
@@ -0,0 +1,222 @@
+# deltachat_mcp/profiling.py
+"""
+On-demand profiler for the MCP server
+Captures either sampled stacks of all threads or a cProfile trace of the
+event loop thread for a time window, and writes them in collapsed-stack
+format (one "frame;frame;frame weight" line per stack) for flamegraph tools
+"""
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+PROFILE_MODES = ('sample', 'cprofile')
+MIN_PATH_FRACTION = 0.001  # Call paths below this share of the total time are not followed
+MAX_PATHS = 20000  # Call paths walked per collapse, whatever their weight
+
+
+def _frame_label(filename: str, lineno: int, funcname: str) -> str:
+    return f"{os.path.basename(filename)}:{funcname}:{lineno}"
+
+
+def collapse_pstats(stats: pstats.Stats, max_depth: int = 64,
+                    min_fraction: float = MIN_PATH_FRACTION, max_paths: int = MAX_PATHS) -> Counter:
+    """Turn a cProfile call graph into collapsed stacks weighted in microseconds
+
+    cProfile only keeps caller/callee edges, so time below a function is
+    split across its callers in proportion to the cumulative time of each edge.
+    The number of paths grows exponentially with the graph, so paths under
+    ``min_fraction`` of the total time are dropped and at most ``max_paths``
+    are walked, heaviest edges first.
+    """
+    raw = stats.stats
+    callees: Dict = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    for edges in callees.values():
+        ordered = sorted(edges.items(), key=lambda item: item[1], reverse=True)
+        edges.clear()
+        edges.update(ordered)
+
+    total = sum(entry[2] for entry in raw.values())
+    min_time = total * min_fraction
+    stacks = Counter()
+    walked = 0
+
+    def walk(func, path, labels, share):
+        nonlocal walked
+        walked += 1
+        _cc, _nc, tt, ct, _callers = raw[func]
+        weight = int(tt * share * 1_000_000)
+        if weight:
+            stacks[';'.join(labels)] += weight
+        if len(path) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, {}).items():
+            callee_ct = raw[callee][3]
+            if callee in path or not callee_ct:
+                continue
+            if walked >= max_paths or share * edge_ct < min_time:
+                break  # Edges are ordered heaviest first
+            walk(callee, path | {callee}, labels + [_frame_label(*callee)], share * edge_ct / callee_ct)
+
+    for func, (_cc, _nc, _tt, _ct, callers) in raw.items():
+        if not callers:
+            walk(func, {func}, [_frame_label(*func)], 1.0)
+
+    return stacks
+
+
+class Profiler:
+    """Run one profiling window at a time and dump the result to disk"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+        self.mode: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.last_output: Optional[Path] = None
+        self._output_dir: Optional[Path] = None
+        self._stop_event = threading.Event()
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._samples = Counter()
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._stop_handle = None
+        self._writing: Optional[asyncio.Future] = None
+
+    def start(self, mode: str = 'sample', seconds: float = 30.0,
+              interval: float = 0.005, output_dir: Optional[Path] = None) -> Dict:
+        """Start a profiling window that stops by itself after ``seconds``
+
+        ``cprofile`` mode traces the calling thread and has to be started from
+        the event loop; ``sample`` mode samples every thread from a helper thread.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+
+        with self._lock:
+            if self.running:
+                raise RuntimeError(f"Profiler already running in {self.mode} mode")
+
+            if output_dir is None:
+                from .config import Config
+                output_dir = Config.PROFILE_DIR
+            self._output_dir = Path(output_dir)
+            self.mode = mode
+            self.started_at = time.time()
+            self._stop_event.clear()
+
+            if mode == 'cprofile':
+                loop = asyncio.get_running_loop()
+                self._cprofile = cProfile.Profile()
+                self._cprofile.enable()
+                self._stop_handle = loop.call_later(seconds, self.stop)
+            else:
+                self._samples = Counter()
+                self._sampler_thread = threading.Thread(
+                    target=self._sample_loop, args=(seconds, interval), daemon=True)
+                self._sampler_thread.start()
+
+            self.running = True
+
+        print(f"🔬 Profiling started ({mode}, {seconds}s window)")
+        return self.status()
+
+    def stop(self) -> Optional[Path]:
+        """Stop the current window early (or on schedule) and write the output
+
+        A cProfile trace stopped on the event loop is collapsed and written in
+        the default executor, so the returned file may appear a little later.
+        """
+        with self._lock:
+            if not self.running:
+                return self.last_output
+            self.running = False
+
+            if self._stop_handle is not None:
+                self._stop_handle.cancel()
+                self._stop_handle = None
+
+            path = self._output_path()
+            self.last_output = path
+            if self._cprofile is not None:
+                self._cprofile.disable()
+                stats = pstats.Stats(self._cprofile)
+                self._cprofile = None
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    loop = None
+                if loop is not None:
+                    self._writing = loop.run_in_executor(None, self._collapse_and_write, stats, path)
+                    return path
+                stacks = collapse_pstats(stats)
+            else:
+                self._stop_event.set()
+                if self._sampler_thread and self._sampler_thread is not threading.current_thread():
+                    self._sampler_thread.join(timeout=5.0)
+                self._sampler_thread = None
+                stacks = self._samples
+
+            self._write(stacks, path)
+
+        print(f"🔬 Profile written to {path}")
+        return path
+
+    def status(self) -> Dict:
+        return {
+            'running': self.running,
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'last_output': str(self.last_output) if self.last_output else None,
+            'writing': self._writing is not None and not self._writing.done(),
+        }
+
+    def _sample_loop(self, seconds: float, interval: float):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    code = frame.f_code
+                    # Label by the function's first line, as cProfile does, so one
+                    # function is one frame however far it has got
+                    labels.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                self._samples[';'.join(reversed(labels))] += 1
+            self._stop_event.wait(interval)
+
+        if not self._stop_event.is_set():
+            self.stop()
+
+    def _output_path(self) -> Path:
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))
+        return self._output_dir / f"profile-{self.mode}-{stamp}.collapsed"
+
+    def _collapse_and_write(self, stats: pstats.Stats, path: Path):
+        try:
+            self._write(collapse_pstats(stats), path)
+        except Exception as e:
+            print(f"❌ Could not write profile to {path}: {e}")
+            return
+        print(f"🔬 Profile written to {path}")
+
+    def _write(self, stacks: Counter, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, weight in stacks.most_common():
+                f.write(f"{stack} {weight}\n")
+
+
+# Global instance
+profiler = Profiler()
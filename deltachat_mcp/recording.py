@@ -0,0 +1,236 @@
+# deltachat_mcp/recording.py
+"""
+Record/replay of Delta Chat core RPC traffic
+The recorder hooks into the instrumented account and logs every core call,
+its result and its timing as compact JSON lines. The replay backend stands in
+for the core ``Rpc`` and plays such a log back, so tools and benchmarks can
+run against real traffic shapes without a live mailbox.
+"""
+import asyncio
+import gzip
+import itertools
+import json
+import threading
+import weakref
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .instrumentation import type_name
+
+LOG_VERSION = 1
+_MAX_DEPTH = 3
+
+
+def _open_log(path: Path, mode: str):
+    if path.suffix == '.gz':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class RpcRecorder:
+    """Append every core call made through the instrumented account to a log"""
+
+    def __init__(self, path, account: Any = None):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Objects without an id get a name for as long as they live; objects
+        # that cannot be weakly referenced are kept alive so their id() is not reused
+        self._handles: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+        self._pinned: Dict[int, Tuple[Any, str]] = {}
+        self._counter = itertools.count(1)
+        self._file = _open_log(self.path, 'w')
+        header = {'version': LOG_VERSION}
+        if account is not None:
+            header['account'] = self._handle(account)
+        self._write(header)
+
+    def record(self, target: Any, method: str, args: List, kwargs: Dict, is_async: bool,
+               duration: float, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            entry = {
+                'target': self._handle(target),
+                'method': method,
+                'args': [self._encode(a) for a in args],
+                'async': is_async,
+                'duration': round(duration, 6),
+            }
+            if kwargs:
+                entry['kwargs'] = {k: self._encode(v) for k, v in kwargs.items()}
+            if error is not None:
+                entry['error'] = f"{type(error).__name__}: {error}"
+            else:
+                entry['result'] = self._encode(result)
+            self._write(entry)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _write(self, entry: Dict):
+        self._file.write(json.dumps(entry, separators=(',', ':'), default=str) + '\n')
+        self._file.flush()
+
+    def _handle(self, obj: Any) -> str:
+        """Stable name for a core object: ``Type:id`` when it has an id"""
+        obj_type = type_name(obj)
+        obj_id = getattr(obj, 'id', None)
+        if isinstance(obj_id, (int, str)):
+            return f"{obj_type}:{obj_id}"
+        try:
+            handle = self._handles.get(obj)
+        except TypeError:  # Not weakly referenceable or not hashable
+            pinned = self._pinned.get(id(obj))
+            if pinned is None:
+                pinned = self._pinned[id(obj)] = (obj, f"{obj_type}#{next(self._counter)}")
+            return pinned[1]
+        if handle is None:
+            handle = self._handles[obj] = f"{obj_type}#{next(self._counter)}"
+        return handle
+
+    def _encode(self, value: Any, depth: int = 0) -> Any:
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, bytes):
+            return value.decode('utf-8', 'replace')
+        if isinstance(value, Path):
+            return str(value)
+        if isinstance(value, (list, tuple, set)):
+            return [self._encode(v, depth) for v in value]
+        if isinstance(value, dict):
+            return {str(k): self._encode(v, depth) for k, v in value.items()}
+        if depth >= _MAX_DEPTH:
+            return {'$ref': self._handle(value)}
+
+        attrs = {}
+        for name, attr in getattr(value, '__dict__', {}).items():
+            if name.startswith('_') or callable(attr):
+                continue
+            attrs[name] = self._encode(attr, depth + 1)
+        return {'$obj': self._handle(value), 'attrs': attrs}
+
+
+class ReplayLog:
+    """Recorded calls grouped by target and method, in recorded order"""
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self.calls: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        self._cursors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+        with _open_log(self.path, 'r') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('version') != LOG_VERSION:
+                raise ValueError(f"Unsupported RPC log version in {self.path}: {header.get('version')}")
+            self.account_handle = header.get('account', 'Account:1')
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.calls[(entry['target'], entry['method'])].append(entry)
+
+    def next_call(self, target: str, method: str, args: List, kwargs: Dict) -> Dict:
+        """Get the next recorded call, preferring one with matching arguments
+
+        Calls are consumed in order and wrap around once exhausted, so a short
+        recording can drive an arbitrarily long benchmark.
+        """
+        key = (target, method)
+        entries = self.calls.get(key)
+        if not entries:
+            raise LookupError(f"No recorded call for {target}.{method}")
+
+        with self._lock:
+            start = self._cursors[key]
+            for offset in range(len(entries)):
+                index = (start + offset) % len(entries)
+                entry = entries[index]
+                if entry['args'] == args and entry.get('kwargs', {}) == kwargs:
+                    break
+            else:
+                index = start % len(entries)
+                entry = entries[index]
+            self._cursors[key] = index + 1
+        return entry
+
+
+class ReplayObject:
+    """Stand-in for a core object (account, chat, message, contact)"""
+
+    def __init__(self, handle: str, attrs: Dict, player: 'ReplayRpc'):
+        self._handle = handle
+        self._replay_type = handle.split(':')[0].split('#')[0]
+        self._attrs = attrs
+        self._player = player
+        for name, value in attrs.items():
+            setattr(self, name, player.decode(value))
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._player.call(self._handle, name, args, kwargs)
+
+    def __repr__(self) -> str:
+        return f"<ReplayObject {self._handle}>"
+
+
+class ReplayRpc:
+    """Replay backend standing in for the core ``Rpc``
+
+    ``speed`` scales the recorded call durations: 1.0 plays back at recorded
+    speed, 0 (or ``"fast"``) returns every call immediately. Sync calls
+    return at once so they never block the event loop; their time is added
+    to the next async call's delay instead.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.log = ReplayLog(path)
+        self.speed = 0.0 if speed == 'fast' else float(speed)
+        self._sync_delay = 0.0
+
+    def account(self) -> ReplayObject:
+        """Get the recorded account"""
+        handle = self.log.account_handle
+        _type_name, _, account_id = handle.partition(':')
+        return ReplayObject(handle, {'id': int(account_id)} if account_id.isdigit() else {}, self)
+
+    def call(self, handle: str, method: str, args, kwargs):
+        entry = self.log.next_call(handle, method, [self._encode_arg(a) for a in args],
+                                   {k: self._encode_arg(v) for k, v in kwargs.items()})
+        if entry['async']:
+            return self._call_async(entry)
+        self._sync_delay += entry['duration'] * self.speed
+        return self._result(entry)
+
+    async def _call_async(self, entry: Dict):
+        delay, self._sync_delay = entry['duration'] * self.speed + self._sync_delay, 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._result(entry)
+
+    def _result(self, entry: Dict):
+        if 'error' in entry:
+            raise RuntimeError(f"Replayed core error: {entry['error']}")
+        return self.decode(entry.get('result'))
+
+    def _encode_arg(self, value: Any) -> Any:
+        if isinstance(value, ReplayObject):
+            return {'$obj': value._handle, 'attrs': value._attrs}
+        if isinstance(value, (list, tuple)):
+            return [self._encode_arg(v) for v in value]
+        if isinstance(value, Path):
+            return str(value)
+        return value
+
+    def decode(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        if isinstance(value, dict):
+            if '$obj' in value:
+                return ReplayObject(value['$obj'], value.get('attrs', {}), self)
+            if '$ref' in value:
+                return ReplayObject(value['$ref'], {}, self)
+            return {k: self.decode(v) for k, v in value.items()}
+        return value
@@ -1,16 +1,25 @@
 # deltachat_mcp/rpc.py
 import asyncio
+import sys
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from deltatachat2 import Account
 
 from .config import Config
+from .instrumentation import InstrumentedProxy, rpc_stats, unwrap
 
 class DeltaChatRPC:
     _instance = None
 
     def __new__(cls):
+        if cls._instance is None and Config.RPC_REPLAY_PATH:
+            from .recording import ReplayRpc
+            cls._instance = super().__new__(cls)
+            cls._instance.rpc = ReplayRpc(Config.RPC_REPLAY_PATH, speed=Config.RPC_REPLAY_SPEED)
+            cls._instance.account = cls._instance.rpc.account()
+            print(f"⏯️ Replaying core RPC traffic from {Config.RPC_REPLAY_PATH}")
+            cls._instance._setup()
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             try:
@@ -53,48 +62,67 @@ class DeltaChatRPC:
                 cls._instance.account = MockAccount(None, 1)
                 print("✅ Using mock Delta Chat account (limited functionality)")
 
-            cls._instance.loop = asyncio.get_event_loop()
+            cls._instance._setup()
         return cls._instance
 
+    def _setup(self):
+        """Wrap the account for statistics (and recording) and reset the background tasks"""
+        recorder = None
+        if Config.RPC_RECORD_PATH:
+            from .recording import RpcRecorder
+            recorder = RpcRecorder(Config.RPC_RECORD_PATH, account=self.account)
+            print(f"⏺️ Recording core RPC traffic to {Config.RPC_RECORD_PATH}")
+        self.recorder = recorder
+
+        self.instrumented_account = InstrumentedProxy(self.account, rpc_stats, recorder=recorder)
+        self.loop = asyncio.get_event_loop()
+        self.warmup_task = None
+        self.event_task = None
+        self.warmup_stats = None
+
     async def ensure_configured(self):
-        if not self.account.is_configured():
+        account = self.get_account()
+        if not account.is_configured():
             # Check if this is a second device setup
             if hasattr(Config, 'IS_SECOND_DEVICE') and Config.IS_SECOND_DEVICE:
-                # For second device, we need to import backup data
-                await self._setup_second_device()
+                # Runs in the background; tools keep serving cached data meanwhile
+                from .device_setup import device_setup
+                device_setup.start(self)
+                return
             else:
                 # Regular account setup with email/password
-                await self.account.configure(
+                await account.configure(
                     addr=Config.DC_ADDR,
                     mail_pw=Config.DC_MAIL_PW,
                     basedir=Config.BASEDIR
                 )
 
-        if not self.account.is_io_running():
-            await self.account.start_io()
-
-    async def _setup_second_device(self):
-        """Set up account as a second device using backup string"""
-        if not hasattr(Config, 'BACKUP_INFO') or not Config.BACKUP_INFO:
-            # Try automatic pairing if no backup info available
-            from .pairing import auto_pairing
-            if Config.AUTO_PAIRING_ENABLED and not auto_pairing.paired_info:
-                print("🔄 Attempting automatic pairing for second device...")
-                success = auto_pairing.attempt_automatic_pairing()
-                if success:
-                    Config.BACKUP_INFO = auto_pairing.paired_info
-                    Config.IS_SECOND_DEVICE = True
-                else:
-                    print("❌ Automatic pairing failed, falling back to manual setup")
+        await self._start(account)
 
-            if not hasattr(Config, 'BACKUP_INFO') or not Config.BACKUP_INFO:
-                raise ValueError("No backup information available for second device setup")
+    async def _start(self, account):
+        """Start IO on a configured account and warm the caches"""
+        if not account.is_io_running():
+            await account.start_io()
 
-        backup_info = Config.BACKUP_INFO
-        print(f"🔧 Setting up second device: {backup_info['node_id']}")
+        # Follow core events for get_changes and cache invalidation before
+        # warming the caches; read from the bare account so the long waits
+        # stay out of the RPC latency statistics
+        core_account = unwrap(account)
+        if hasattr(core_account, 'wait_for_event') and (self.event_task is None or self.event_task.done()):
+            from .changes import pump_events
+            self.event_task = asyncio.create_task(pump_events(core_account))
 
-        # Import backup using Delta Chat core instead of manual WebSocket
-        await self._import_backup_data(backup_info)
+        if Config.WARMUP_ENABLED and self.warmup_task is None:
+            self.warmup_task = asyncio.create_task(self._warm_up(account))
+
+    async def _warm_up(self, account):
+        """Prefetch hot data into the caches without holding up startup"""
+        from .warmup import warm_up
+        try:
+            self.warmup_stats = await warm_up(account)
+        except Exception as e:
+            print(f"Warning: cache warm-up failed: {e}", file=sys.stderr)
+            self.warmup_stats = {'error': str(e)}
 
     async def _import_backup_data(self, backup_info):
         """Import backup data using Delta Chat core RPC methods"""
@@ -119,8 +147,12 @@ class DeltaChatRPC:
                 # According to Delta Chat docs, this should use the imex module
                 if hasattr(rpc, 'imex') and hasattr(rpc.imex, 'import_backup'):
                     print("🔄 Using Delta Chat core backup import...")
-                    # Call the proper backup import method
-                    result = await rpc.imex.import_backup(encrypted_data)
+                    # The core imports from a file: write the payload to one,
+                    # pass its path and follow the core's import progress
+                    from .backup_import import backup_importer
+                    result = await backup_importer.import_backup(
+                        encrypted_data, backup_info['node_id'], rpc.imex.import_backup,
+                        getattr(rpc, 'get_next_event', None))
                     print(f"✅ Backup import result: {result}")
 
                     # The Delta Chat core should handle the pairing automatically
@@ -180,5 +212,5 @@ class DeltaChatRPC:
             return False
 
     def get_account(self):
-        """Get the Delta Chat account instance"""
-        return self.account
+        """Get the Delta Chat account instance, instrumented for per-method timing"""
+        return self.instrumented_account
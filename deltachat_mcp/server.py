@@ -1,22 +1,36 @@
 # deltachat_mcp/server.py
 # Updated for latest MCP SDK (mcp v1.19.0)
 import asyncio
+import signal
 import sys
+from typing import Callable, Optional
 from mcp.server import Server
-from .tools import send_message, list_chats, get_messages, get_unread_count
+from .tools import (
+    send_message, get_send_status, list_chats, get_messages, get_unread_count,
+    get_rpc_stats, start_profiling, stop_profiling, get_import_status, reload_config,
+    submit_backup_string, get_setup_status, cancel_setup, deliver_message, get_server_metrics, get_changes,
+    CHAT_FIELDS, MESSAGE_FIELDS
+)
 from .rpc import DeltaChatRPC
 from .config import Config
+from .profiling import profiler
+from .metrics import metrics
+from .history import request_history
+from .outbox import outbox
+from .pairing import auto_pairing
 
 # Register tools using the class method API
 
 # Create server instance for HTTP and stdio handling
 server = Server()  # MCP SDK v1.19.0
-Server.tool(send_message, name="send_message", schema={
+Server.tool(metrics.timed(send_message), name="send_message", schema={
     "type": "object",
     "properties": {
         "addr": {"type": ["string", "null"], "description": "Email address of contact"},
         "chat_id": {"type": ["integer", "null"], "description": "Existing chat ID"},
-        "text": {"type": "string", "description": "Message text"}
+        "text": {"type": "string", "description": "Message text"},
+        "wait": {"type": "boolean", "description": "Wait until the message is handed to the core"},
+        "timeout": {"type": ["number", "null"], "description": "Seconds to wait when wait is set"}
     },
     "required": ["text"],
     "oneOf": [
@@ -25,24 +39,109 @@ Server.tool(send_message, name="send_message", schema={
     ]
 })
 
-Server.tool(list_chats, name="list_chats", schema={
+Server.tool(metrics.timed(get_send_status), name="get_send_status", schema={
     "type": "object",
-    "properties": {}
+    "properties": {
+        "outbox_id": {"type": "string", "description": "ID returned by send_message"}
+    },
+    "required": ["outbox_id"]
+})
+
+_BUDGET_PROPERTIES = {
+    "max_bytes": {"type": "integer", "minimum": 1, "description": "Cap on the response size in UTF-8 bytes of JSON"},
+    "max_chars": {"type": "integer", "minimum": 1, "description": "Cap on the response size in characters of JSON"}
+}
+
+Server.tool(metrics.timed(list_chats), name="list_chats", schema={
+    "type": "object",
+    "properties": {
+        "fields": {"type": "array", "items": {"type": "string", "enum": list(CHAT_FIELDS)},
+                   "description": "Only return these fields of each chat"},
+        **_BUDGET_PROPERTIES
+    }
 })
 
-Server.tool(get_messages, name="get_messages", schema={
+Server.tool(metrics.timed(get_messages), name="get_messages", schema={
     "type": "object",
     "properties": {
-        "chat_id": {"type": "integer"}
+        "chat_id": {"type": "integer"},
+        "fields": {"type": "array", "items": {"type": "string", "enum": list(MESSAGE_FIELDS)},
+                   "description": "Only return these fields of each message"},
+        **_BUDGET_PROPERTIES
     },
     "required": ["chat_id"]
 })
 
-Server.tool(get_unread_count, name="get_unread_count", schema={
+Server.tool(metrics.timed(get_changes), name="get_changes", schema={
+    "type": "object",
+    "properties": {
+        "since_token": {"type": ["string", "null"], "description": "Token from the last get_changes call; omit for a new one"},
+        "limit": {"type": "integer", "minimum": 1, "description": "Most changes to return at once (default 500)"}
+    }
+})
+
+Server.tool(metrics.timed(get_unread_count), name="get_unread_count", schema={
+    "type": "object",
+    "properties": {}
+})
+
+Server.tool(metrics.timed(get_rpc_stats), name="get_rpc_stats", schema={
+    "type": "object",
+    "properties": {
+        "reset": {"type": "boolean", "description": "Clear the statistics after reading them"}
+    }
+})
+
+Server.tool(metrics.timed(get_server_metrics), name="get_server_metrics", schema={
+    "type": "object",
+    "properties": {
+        "reset": {"type": "boolean", "description": "Clear the metrics after reading them"}
+    }
+})
+
+Server.tool(metrics.timed(start_profiling), name="start_profiling", schema={
+    "type": "object",
+    "properties": {
+        "mode": {"type": "string", "enum": ["sample", "cprofile"]},
+        "seconds": {"type": "number", "description": "Length of the profiling window"}
+    }
+})
+
+Server.tool(metrics.timed(stop_profiling), name="stop_profiling", schema={
+    "type": "object",
+    "properties": {}
+})
+
+Server.tool(metrics.timed(get_import_status), name="get_import_status", schema={
+    "type": "object",
+    "properties": {}
+})
+
+Server.tool(metrics.timed(reload_config), name="reload_config", schema={
     "type": "object",
     "properties": {}
 })
 
+Server.tool(metrics.timed(get_setup_status), name="get_setup_status", schema={
+    "type": "object",
+    "properties": {}
+})
+
+Server.tool(metrics.timed(cancel_setup), name="cancel_setup", schema={
+    "type": "object",
+    "properties": {}
+})
+
+Server.tool(metrics.timed(submit_backup_string), name="submit_backup_string", schema={
+    "type": "object",
+    "properties": {
+        "backup_string": {"type": "string", "description": "DCBACKUP3: string shown by the primary device"}
+    },
+    "required": ["backup_string"]
+})
+
+_http = {"runner": None, "site": None, "port": None}
+
 async def start_http():
     from aiohttp import web
     app = web.Application()
@@ -51,12 +150,44 @@ async def start_http():
     await runner.setup()
     site = web.TCPSite(runner, "127.0.0.1", Config.MCP_PORT)
     await site.start()
+    _http.update(runner=runner, site=site, port=Config.MCP_PORT)
     print(f"MCP server running at http://127.0.0.1:{Config.MCP_PORT}/tool", file=sys.stderr)
 
+async def rebind_http():
+    """Move the HTTP listener to the current MCP_PORT without touching the core connection"""
+    from aiohttp import web
+    if _http["runner"] is None or _http["port"] == Config.MCP_PORT:
+        return
+    try:
+        site = web.TCPSite(_http["runner"], "127.0.0.1", Config.MCP_PORT)
+        await site.start()
+    except OSError as e:
+        print(f"❌ Could not listen on port {Config.MCP_PORT}, staying on {_http['port']}: {e}", file=sys.stderr)
+        return
+    old_site = _http["site"]
+    _http.update(site=site, port=Config.MCP_PORT)
+    await old_site.stop()
+    print(f"MCP server moved to http://127.0.0.1:{Config.MCP_PORT}/tool", file=sys.stderr)
+
+async def stop_http():
+    """Close the HTTP listener so the port can be bound again"""
+    runner = _http["runner"]
+    if runner is None:
+        return
+    _http.update(runner=None, site=None, port=None)
+    await runner.cleanup()
+
+def _on_config_reload(changes):
+    if "MCP_PORT" in changes and _http["runner"] is not None:
+        asyncio.get_running_loop().create_task(rebind_http())
+
+Config.on_reload(_on_config_reload)
+
 async def stdio_loop():
     await DeltaChatRPC().ensure_configured()
     while True:
-        line = sys.stdin.readline()
+        # Read off the loop so background tasks keep running between requests
+        line = await asyncio.to_thread(sys.stdin.readline)
         if not line:
             break
         try:
@@ -67,20 +198,59 @@ async def stdio_loop():
             resp = server.format_error(req, str(e))
         print(resp, flush=True)
 
-async def main():
+def _install_reload_handler():
+    """Reload the configuration on SIGHUP where the platform supports it"""
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, Config.reload)
+    except (NotImplementedError, RuntimeError, ValueError):
+        # Not available on Windows or outside the main thread
+        pass
+
+async def main(mode: Optional[str] = None, started: Optional[Callable[[], None]] = None):
+    """Run the server in ``mode`` ("http" or "stdio"), MCP_MODE by default
+
+    ``started()`` is called once the server accepts requests, i.e. after
+    the HTTP port is bound.
+    """
+    mode = mode or Config.MCP_MODE
     Config.validate()
+    _install_reload_handler()
 
     # Initialize automatic pairing service if enabled
     Config.initialize_auto_pairing()
 
-    rpc = DeltaChatRPC()
-    await rpc.ensure_configured()
+    if Config.PROFILE_MODE:
+        try:
+            profiler.start(mode=Config.PROFILE_MODE, seconds=Config.PROFILE_SECONDS)
+        except (ValueError, RuntimeError) as e:
+            print(f"Warning: not profiling at startup: {e}")
+
+    loop_monitor = asyncio.create_task(metrics.monitor_loop())
+    try:
+        rpc = DeltaChatRPC()
+        await rpc.ensure_configured()
+
+        # Drain messages queued before a restart
+        if Config.OUTBOX_ENABLED:
+            outbox.ensure_started(deliver_message)
 
-    if Config.MCP_MODE == "http":
-        await start_http()
-        await asyncio.Event().wait()  # keep alive
-    else:
-        await stdio_loop()
+        if mode == "http":
+            await start_http()
+            if started is not None:
+                started()
+            await asyncio.Event().wait()  # keep alive
+        else:
+            if started is not None:
+                started()
+            await stdio_loop()
+    finally:
+        loop_monitor.cancel()
+        await stop_http()
+        await outbox.stop()
+        await auto_pairing.stop()
+        request_history.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
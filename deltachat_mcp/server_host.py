@@ -0,0 +1,145 @@
+# deltachat_mcp/server_host.py
+"""
+In-process server hosting for the desktop GUI
+The server runs on one asyncio loop in a background thread that lives as
+long as the host, so the RPC singleton, the outbox and auto-pairing stay
+bound to the same loop across restarts. The GUI never waits on the
+server: commands are posted to the loop thread, and state changes come
+back through a queue it polls from Tk's after().
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+STOP_TIMEOUT = 10.0  # Seconds the server gets to shut down before the host gives up waiting
+
+ServerEvent = Tuple[str, Optional[str]]
+
+
+def _default_main(started: Callable[[], None]) -> Awaitable:
+    from .server import main
+    return main(mode="http", started=started)
+
+
+class ServerHost:
+    """Start, stop and restart ``server.main`` without blocking the caller
+
+    States are stopped -> starting -> running -> stopping -> stopped, or
+    failed when the server exits with an error. ``main(started)`` calls
+    ``started()`` once it listens, which moves the host to running. Every
+    change is put on ``events`` as ``(state, detail)``.
+    """
+
+    def __init__(self, main: Callable[[Callable[[], None]], Awaitable] = _default_main):
+        self._main = main
+        self.state = 'stopped'
+        self.events: "queue.SimpleQueue[ServerEvent]" = queue.SimpleQueue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._restart = False
+        self._lock = threading.Lock()
+
+    def _set(self, state: str, detail: Optional[str] = None):
+        self.state = state
+        self.events.put((state, detail))
+
+    def running(self) -> bool:
+        return self.state in ('starting', 'running')
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="dc-mcp-server", daemon=True)
+            self._thread.start()
+        return self._loop
+
+    def start(self) -> bool:
+        """Start the server; False if it is already running or stopping"""
+        with self._lock:
+            if self.state in ('starting', 'running', 'stopping'):
+                return False
+            self._set('starting')
+            loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._spawn)
+        return True
+
+    def stop(self) -> bool:
+        """Ask the server to shut down; False if it is not running"""
+        with self._lock:
+            if self.state not in ('starting', 'running'):
+                return False
+            self._set('stopping')
+        self._loop.call_soon_threadsafe(self._cancel)
+        return True
+
+    def restart(self):
+        """Stop the server if it runs and start it again once it has shut down"""
+        with self._lock:
+            self._restart = self.state in ('starting', 'running', 'stopping')
+        if not self._restart:
+            self.start()
+        else:
+            self.stop()
+
+    def shutdown(self, timeout: float = STOP_TIMEOUT):
+        """Stop the server and the loop thread, waiting up to ``timeout`` seconds"""
+        if self._loop is None:
+            return
+        self._restart = False
+        done: Future = asyncio.run_coroutine_threadsafe(self._finish(), self._loop)
+        try:
+            done.result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop = None
+
+    def drain_events(self) -> List[ServerEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    # -- loop thread -----------------------------------------------------
+
+    def _spawn(self):
+        self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _started(self):
+        with self._lock:
+            if self.state == 'starting':
+                self._set('running')
+
+    async def _serve(self):
+        main = asyncio.ensure_future(self._main(self._started))
+        try:
+            await main
+            self._set('stopped', "server exited")
+        except asyncio.CancelledError:
+            main.cancel()
+            await asyncio.gather(main, return_exceptions=True)
+            self._set('stopped')
+        except Exception as e:
+            self._set('failed', str(e))
+        finally:
+            self._task = None
+            if self._restart:
+                self._restart = False
+                self.start()
+
+    async def _finish(self):
+        task = self._task
+        if task is not None:
+            self._set('stopping')
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
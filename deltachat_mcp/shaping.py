@@ -0,0 +1,130 @@
+# deltachat_mcp/shaping.py
+"""
+Response shaping for the read tools
+``fields`` limits the rows of list_chats and get_messages to the named
+fields, and ``max_bytes`` / ``max_chars`` caps the size of the response as
+compact JSON. Budgets are met the same way every time: rows are left out
+first (the oldest messages, the least recently active chats), keeping the
+most rows that fit with texts cut to MIN_TEXT_CHARS, and then texts are cut
+to the longest common length that still fits. The response's ``budget``
+entry says what was cut; left-out rows are always a contiguous run, so it
+names only the ids of the first and last of them and stays small however
+many rows are dropped.
+"""
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ELLIPSIS = '…'
+MIN_TEXT_CHARS = 40  # Texts are not cut shorter than this before rows are left out
+BUDGET_UNITS = {'max_bytes': 'bytes', 'max_chars': 'chars'}
+
+Budget = Tuple[str, int]
+
+
+def parse_fields(params: dict, available: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """The requested fields in order, or None for all of them"""
+    fields = params.get("fields")
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    if not isinstance(fields, list) or not fields or not all(isinstance(f, str) for f in fields):
+        raise ValueError("fields must be a non-empty list of field names")
+    available = list(available)
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f"Unknown field(s) {', '.join(unknown)}; available: {', '.join(available)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def parse_budget(params: dict) -> Optional[Budget]:
+    """(unit, limit) from max_bytes or max_chars, or None without a budget"""
+    given = [(BUDGET_UNITS[name], params[name]) for name in BUDGET_UNITS if params.get(name) is not None]
+    if not given:
+        return None
+    if len(given) > 1:
+        raise ValueError("Use either max_bytes or max_chars, not both")
+    unit, limit = given[0]
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+        raise ValueError(f"max_{unit} must be a positive integer")
+    return unit, limit
+
+
+def project(rows: List[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    if fields is None:
+        return rows
+    return [{f: row[f] for f in fields if f in row} for row in rows]
+
+
+def response_size(response: Dict, unit: str) -> int:
+    text = json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+    return len(text.encode()) if unit == 'bytes' else len(text)
+
+
+def _cut(rows: List[Dict], text_field: Optional[str], cap: Optional[int]) -> Tuple[List[Dict], int]:
+    if text_field is None or cap is None:
+        return rows, 0
+    cut, count = [], 0
+    for row in rows:
+        text = row.get(text_field)
+        if isinstance(text, str) and len(text) > cap:
+            row = {**row, text_field: text[:cap] + ELLIPSIS}
+            count += 1
+        cut.append(row)
+    return cut, count
+
+
+def _largest(lo: int, hi: int, fits: Callable[[int], bool]) -> Optional[int]:
+    """Largest n in [lo, hi] with fits(n), for fits monotonic in n"""
+    if not fits(lo):
+        return None
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def fit_budget(response: Dict, key: str, budget: Budget, text_field: Optional[str] = None,
+               keep: str = 'end') -> Dict:
+    """Cut ``response[key]`` until the response fits ``budget``
+
+    ``keep='end'`` keeps the last rows (newest messages), ``'start'`` the
+    first ones (most recently active chats).
+    """
+    unit, limit = budget
+    rows = response[key]
+
+    def build(kept: int, cap: Optional[int]) -> Dict:
+        chosen = rows[len(rows) - kept:] if keep == 'end' else rows[:kept]
+        omitted = rows[:len(rows) - kept] if keep == 'end' else rows[kept:]
+        chosen, truncated = _cut(chosen, text_field, cap)
+        report = {
+            'unit': unit,
+            'limit': limit,
+            'omitted': len(omitted),
+            'omitted_range': [omitted[0]['id'], omitted[-1]['id']] if omitted and 'id' in omitted[0] else None,
+            'truncated_texts': truncated,
+            'text_limit': cap if truncated else None,
+        }
+        return {**response, key: chosen, 'budget': report}
+
+    def fits(kept: int, cap: Optional[int]) -> bool:
+        return response_size(build(kept, cap), unit) <= limit
+
+    if fits(len(rows), None):
+        return build(len(rows), None)
+
+    floor = MIN_TEXT_CHARS if text_field else None
+    kept = _largest(0, len(rows), lambda n: fits(n, floor))
+    if kept is None:
+        minimum = response_size(build(0, None), unit)
+        raise ValueError(f"max_{unit} of {limit} is too small for this response; it needs at least {minimum}")
+
+    cap = None
+    if text_field is not None and not fits(kept, None):
+        longest = max((len(row.get(text_field) or '') for row in rows), default=0)
+        cap = _largest(floor, max(floor, longest), lambda c: fits(kept, c))
+    return build(kept, cap)
@@ -1,68 +1,239 @@
 # deltachat_mcp/tools.py
-from deltatachat2 import Account
-from typing import List, Dict
+from typing import TYPE_CHECKING, Any, Callable, List, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from deltatachat2 import Account
+
 from .rpc import DeltaChatRPC
+from .instrumentation import rpc_stats
+from .metrics import metrics
+from .profiling import profiler
+from .config import Config
+from .cache import chat_cache, message_cache, cache_stats
+from .backup_import import backup_importer
+from .outbox import outbox
+from .backup_sources import backup_sources
+from .device_setup import device_setup
+from .shaping import parse_fields, parse_budget, project, fit_budget
+from .changes import change_log
+
+# Row fields of list_chats and get_messages and how each is read from the core;
+# fields that are not requested are not read at all
+CHAT_FIELDS = {
+    "id": lambda c: c.id,
+    "name": lambda c: c.name or c.addr or "Unnamed",
+    "addr": lambda c: c.addr,
+    "is_group": lambda c: c.is_group(),
+    "unread_count": lambda c: c.get_unread_message_count(),
+}
+MESSAGE_FIELDS = {
+    "id": lambda m: m.id,
+    "from": lambda m: m.sender.addr,
+    "text": lambda m: m.text,
+    "timestamp": lambda m: m.timestamp,
+    "is_outgoing": lambda m: m.is_outgoing,
+    "is_encrypted": lambda m: m.is_encrypted,
+}
+
+async def deliver_message(entry: dict) -> dict:
+    """Send one queued outbox entry through the core"""
+    account: "Account" = DeltaChatRPC().get_account()
+    if entry.get("chat_id"):
+        chat = await account.get_chat_by_id(int(entry["chat_id"]))
+    else:
+        contact = await account.create_contact(addr=entry["addr"])
+        chat = await account.create_chat(contact=contact)
+
+    msg = await chat.send_text(entry["text"])
+    # Also invalidates the cached messages and chatlist
+    change_log.record("message", "created", chat.id, msg.id)
+    change_log.record("chat", "modified", chat.id)
+    return {"message_id": msg.id, "chat_id": chat.id}
 
 async def send_message(params: dict) -> dict:
-    account: Account = DeltaChatRPC().get_account()
     addr = params.get("addr")
     chat_id = params.get("chat_id")
     text = params["text"]
 
     if not text:
         raise ValueError("text is required")
-
-    if chat_id:
-        chat = await account.get_chat_by_id(int(chat_id))
-    elif addr:
-        contact = await account.create_contact(addr=addr)
-        chat = await account.create_chat(contact=contact)
-    else:
+    if not chat_id and not addr:
         raise ValueError("Need addr or chat_id")
 
-    msg = await chat.send_text(text)
-    return {"message_id": msg.id, "chat_id": chat.id, "text": text}
+    entry = {"addr": addr, "chat_id": int(chat_id) if chat_id else None, "text": text}
+    if not Config.OUTBOX_ENABLED:
+        result = await deliver_message(entry)
+        return {"message_id": result["message_id"], "chat_id": result["chat_id"], "text": text}
 
-async def list_chats(_: dict) -> dict:
-    account: Account = DeltaChatRPC().get_account()
-    chats = await account.get_chats()
-    return {
-        "chats": [
-            {
-                "id": c.id,
-                "name": c.name or c.addr or "Unnamed",
-                "addr": c.addr,
-                "is_group": c.is_group(),
-                "unread_count": c.get_unread_message_count()
-            }
-            for c in chats
-            if not c.is_self_talk()
-        ]
-    }
+    outbox.ensure_started(deliver_message)
+    status = outbox.enqueue(text, addr=entry["addr"], chat_id=entry["chat_id"])
+    await outbox.sync()
+    if params.get("wait"):
+        status = await outbox.wait(status["outbox_id"], timeout=params.get("timeout"))
+    return {**status, "text": text}
+
+async def get_send_status(params: dict) -> dict:
+    outbox_id = params.get("outbox_id")
+    if not outbox_id:
+        raise ValueError("outbox_id required")
+    status = outbox.status(outbox_id)
+    if status is None:
+        raise ValueError(f"Unknown outbox_id: {outbox_id}")
+    return status
+
+def _covers(cached_fields: Optional[Tuple[str, ...]], fields: Tuple[str, ...]) -> bool:
+    """Whether a cache entry read with ``cached_fields`` (None: all) holds ``fields``"""
+    return cached_fields is None or set(fields) <= set(cached_fields)
+
+def cached_during_setup(cache, key, what: str, wanted: Tuple[str, ...],
+                        fields_of: Callable[[Any], Optional[Tuple[str, ...]]]):
+    """While second-device setup runs the core is not usable; serve whatever the cache still holds
+
+    ``fields_of`` tells which fields a cached value was read with, so a
+    value missing some of ``wanted`` is not served as if it had them.
+    """
+    value = cache.peek(key)
+    if value is None or not _covers(fields_of(value), wanted):
+        raise RuntimeError(f"Second-device setup in progress ({device_setup.state}), no cached {what} yet")
+    return value
+
+async def load_chatlist(account: "Account", fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    """Get the chat rows and total unread count, from cache when fresh
+
+    With ``fields`` only those are read from the core; the unread total is
+    only known when ``unread_count`` is among them.
+    """
+    wanted = fields or tuple(CHAT_FIELDS)
+    # Each projection is cached under its own key so alternating projections
+    # do not evict each other; the full list ("chatlist") serves any of them
+    key = "chatlist" if fields is None else ("chatlist", tuple(sorted(wanted)))
+    chatlist = chat_cache.get(key)
+    if chatlist is None and key != "chatlist":
+        # peek: this lookup was already counted as a miss above
+        chatlist = chat_cache.peek("chatlist")
+    if chatlist is None and device_setup.running():
+        setup_key = "chatlist" if chat_cache.peek("chatlist") is not None else key
+        chatlist = cached_during_setup(chat_cache, setup_key, "chats", wanted, lambda c: c.get("fields"))
+    if chatlist is None:
+        readers = [(name, CHAT_FIELDS[name]) for name in wanted if name != "unread_count"]
+        with_unread = "unread_count" in wanted
+        chats = await account.get_chats()
+        rows = []
+        unread_total = 0
+        for c in chats:
+            unread = c.get_unread_message_count() if with_unread else None
+            if with_unread:
+                unread_total += unread
+            if c.is_self_talk():
+                continue
+            row = {name: read(c) for name, read in readers}
+            if with_unread:
+                row["unread_count"] = unread
+            rows.append(row)
+        chatlist = {"chats": rows, "unread_count": unread_total if with_unread else None,
+                    "fields": None if fields is None else wanted}
+        chat_cache.set(key, chatlist)
+    return chatlist
+
+async def load_messages(account: "Account", chat_id: int, limit: int = 20,
+                        fields: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+    """Get the last ``limit`` messages of a chat, from cache when fresh
+
+    With ``fields`` only those are read from the core.
+    """
+    wanted = fields or tuple(MESSAGE_FIELDS)
+    cached = message_cache.get(chat_id)
+    if cached is not None and cached[0] >= limit and _covers(cached[2], wanted):
+        return cached[1][-limit:]
+    if device_setup.running():
+        cached = cached_during_setup(message_cache, chat_id, "messages", wanted,
+                                     lambda c: c[2])
+        return cached[1][-limit:]
+
+    readers = [(name, MESSAGE_FIELDS[name]) for name in wanted]
+    chat = await account.get_chat_by_id(chat_id)
+    msgs = await chat.get_messages()
+    rows = [{name: read(m) for name, read in readers} for m in msgs[-limit:]]
+    message_cache.set(chat_id, (limit, rows, None if fields is None else wanted))
+    return rows
+
+async def list_chats(params: dict) -> dict:
+    fields = parse_fields(params, CHAT_FIELDS)
+    budget = parse_budget(params)
+    account: "Account" = DeltaChatRPC().get_account()
+    chatlist = await load_chatlist(account, fields)
+    response = {"chats": project(chatlist["chats"], fields)}
+    return fit_budget(response, "chats", budget, keep="start") if budget else response
 
 async def get_messages(params: dict) -> dict:
-    account: Account = DeltaChatRPC().get_account()
     chat_id = params.get("chat_id")
     if not chat_id:
         raise ValueError("chat_id required")
-    chat = await account.get_chat_by_id(int(chat_id))
-    msgs = await chat.get_messages()
+    fields = parse_fields(params, MESSAGE_FIELDS)
+    budget = parse_budget(params)
+    account: "Account" = DeltaChatRPC().get_account()
+    messages = project(await load_messages(account, int(chat_id), fields=fields), fields)
+    response = {"messages": messages}
+    if not budget:
+        return response
+    text_field = "text" if fields is None or "text" in fields else None
+    return fit_budget(response, "messages", budget, text_field=text_field, keep="end")
+
+async def get_unread_count(_: dict) -> dict:
+    account: "Account" = DeltaChatRPC().get_account()
+    chatlist = await load_chatlist(account, ("unread_count",))
+    return {"unread_count": chatlist["unread_count"]}
+
+async def get_changes(params: dict) -> dict:
+    limit = params.get("limit", 500)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+        raise ValueError("limit must be a positive integer")
+    return change_log.changes_since(params.get("since_token"), limit=limit)
+
+async def get_rpc_stats(params: dict) -> dict:
+    stats = rpc_stats.snapshot()
+    if params.get("reset"):
+        rpc_stats.reset()
     return {
-        "messages": [
-            {
-                "id": m.id,
-                "from": m.sender.addr,
-                "text": m.text,
-                "timestamp": m.timestamp,
-                "is_outgoing": m.is_outgoing,
-                "is_encrypted": m.is_encrypted
-            }
-            for m in msgs[-20:]
-        ]
+        "methods": stats,
+        "caches": cache_stats(),
+        "warmup": DeltaChatRPC().warmup_stats
     }
 
-async def get_unread_count(_: dict) -> dict:
-    account: Account = DeltaChatRPC().get_account()
-    chats = await account.get_chats()
-    total = sum(c.get_unread_message_count() for c in chats)
-    return {"unread_count": total}
+async def get_server_metrics(params: dict) -> dict:
+    snapshot = metrics.snapshot()
+    if params.get("reset"):
+        metrics.reset()
+    return snapshot
+
+async def start_profiling(params: dict) -> dict:
+    mode = params.get("mode") or Config.PROFILE_MODE or "sample"
+    seconds = float(params.get("seconds") or Config.PROFILE_SECONDS)
+    if seconds <= 0:
+        raise ValueError("seconds must be positive")
+    return profiler.start(mode=mode, seconds=seconds)
+
+async def stop_profiling(_: dict) -> dict:
+    output = profiler.stop()
+    return {"output": str(output) if output else None}
+
+async def get_import_status(_: dict) -> dict:
+    return backup_importer.status()
+
+async def reload_config(_: dict) -> dict:
+    return Config.reload()
+
+async def get_setup_status(_: dict) -> dict:
+    return device_setup.status()
+
+async def cancel_setup(_: dict) -> dict:
+    return {"cancelled": device_setup.cancel(), "state": device_setup.state}
+
+async def submit_backup_string(params: dict) -> dict:
+    backup_string = params.get("backup_string")
+    if not backup_string:
+        raise ValueError("backup_string required")
+    result = backup_sources.submit(backup_string, source="mcp")
+    if not result["accepted"]:
+        raise ValueError(result["error"])
+    return result
@@ -0,0 +1,65 @@
+# deltachat_mcp/warmup.py
+"""
+Startup warm-up of the in-process caches
+Runs in the background once IO has started and prefetches the chatlist,
+the unread counts and the most recent messages of the most recently active
+chats, so the first tool calls an agent makes are served from cache
+"""
+import asyncio
+import sys
+import time
+from typing import Dict
+
+from .config import Config
+from .metrics import metrics
+
+IDLE_POLL = 0.05  # Seconds between checks for tool calls to finish
+
+
+async def _wait_until_idle():
+    """Hold the warm-up back while tool calls are being served"""
+    while metrics.in_flight > 0:
+        await asyncio.sleep(IDLE_POLL)
+
+
+async def warm_up(account) -> Dict:
+    """Prefetch the chatlist and the last messages of the top chats
+
+    The core returns the chatlist ordered by last activity, so the first
+    ``WARMUP_TOP_CHATS`` entries are the most recently active chats.
+    Message prefetches run with a small concurrency limit, wait while tool
+    calls are in flight, and rest as long as each prefetch took, so the
+    warm-up uses at most about half of the core's time.
+    """
+    from .tools import load_chatlist, load_messages
+
+    start = time.perf_counter()
+    chatlist = await load_chatlist(account)
+    chatlist_time = time.perf_counter() - start
+
+    top_chats = [row["id"] for row in chatlist["chats"][:Config.WARMUP_TOP_CHATS]]
+    semaphore = asyncio.Semaphore(max(1, Config.WARMUP_CONCURRENCY))
+
+    async def prefetch(chat_id):
+        async with semaphore:
+            await _wait_until_idle()
+            started = time.perf_counter()
+            await load_messages(account, chat_id, max(Config.WARMUP_MESSAGES, 1))
+            await asyncio.sleep(time.perf_counter() - started)
+
+    results = await asyncio.gather(*(prefetch(chat_id) for chat_id in top_chats), return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    for failure in failures:
+        print(f"Warning: warm-up prefetch failed: {failure}", file=sys.stderr)
+
+    stats = {
+        'duration': round(time.perf_counter() - start, 3),
+        'chatlist_duration': round(chatlist_time, 3),
+        'chats': len(chatlist["chats"]),
+        'prefetched_chats': len(top_chats) - len(failures),
+        'failed_chats': len(failures),
+        'finished_at': time.time(),
+    }
+    print(f"🔥 Cache warm-up finished in {stats['duration']:.2f}s "
+          f"({stats['prefetched_chats']}/{len(top_chats)} chats prefetched, chatlist {chatlist_time:.2f}s)", file=sys.stderr)
+    return stats
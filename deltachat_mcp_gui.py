@@ -16,6 +16,99 @@ import os
 import sys
 from pathlib import Path
 
+from collections import deque
+
+from deltachat_mcp.logbuffer import LOG_LEVELS, LogBuffer, LogStream
+from deltachat_mcp.history import request_history
+from deltachat_mcp.metrics import metrics
+from deltachat_mcp.server_host import ServerHost
+
+LOG_FLUSH_MS = 33  # Log view refresh, about 30 frames per second
+LOG_BUFFER_SIZE = 10000  # Records kept for filtering
+LOG_MAX_LINES = 2000  # Lines kept in the text widget
+LOG_COLORS = {"info": "black", "success": "green", "warning": "orange", "error": "red"}
+SERVER_POLL_MS = 16  # Server state polling, one check per frame at 60 fps
+DASHBOARD_SAMPLE_MS = 1000  # Dashboard metrics sampling
+DASHBOARD_HISTORY = 120  # Samples shown per sparkline
+REQUESTS_REFRESH_MS = 1000  # Request history refresh while its tab is shown
+REQUESTS_ROWS = 15  # Rows the request history shows at a time
+REQUEST_WINDOWS = {"all": None, "last hour": 3600, "last day": 86400}
+
+
+class Sparkline:
+    """Small line chart of the last DASHBOARD_HISTORY values on a canvas"""
+
+    def __init__(self, parent, width=200, height=36, color="steelblue"):
+        self.width, self.height = width, height
+        self.values = deque(maxlen=DASHBOARD_HISTORY)
+        self.canvas = tk.Canvas(parent, width=width, height=height, background="white", highlightthickness=0)
+        self.line = self.canvas.create_line(0, height, 0, height, fill=color, width=1.5)
+
+    def add(self, value):
+        self.values.append(value)
+        if len(self.values) < 2:
+            return
+        top = max(self.values) or 1.0
+        step = self.width / (DASHBOARD_HISTORY - 1)
+        start = self.width - step * (len(self.values) - 1)
+        coords = []
+        for i, v in enumerate(self.values):
+            coords.extend((start + i * step, self.height - 2 - (self.height - 4) * v / top))
+        self.canvas.coords(self.line, *coords)
+
+class VirtualTreeview:
+    """Treeview that only holds the rows in view, fetched by offset on scroll
+
+    ``fetch(offset, limit)`` returns the rows as value tuples and ``count()``
+    the total number of rows.
+    """
+
+    def __init__(self, parent, columns, headings, fetch, count, rows=REQUESTS_ROWS):
+        self.fetch, self.count, self.rows = fetch, count, rows
+        self.offset = 0
+        self.total = 0
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=rows, selectmode="browse")
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=90, anchor=tk.W)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        for i in range(rows):
+            self.tree.insert("", tk.END, iid=str(i), values=())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self.on_wheel)
+
+    def refresh(self):
+        """Re-read the total and the rows at the current offset"""
+        self.total = self.count()
+        self.offset = max(0, min(self.offset, self.total - self.rows))
+        values = self.fetch(self.offset, self.rows)
+        for i in range(self.rows):
+            self.tree.item(str(i), values=values[i] if i < len(values) else ())
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.rows) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        self.offset = int(offset)
+        self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.total)
+        else:
+            step = self.rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_to(self.offset + (-3 if up else 3))
+        return "break"
+
+
 class DeltaChatMCPServer:
     """Main desktop application class"""
 
@@ -28,11 +121,15 @@ class DeltaChatMCPServer:
         # Application state
         self.server_running = False
         self.delta_connected = False
-        self.mcp_requests = []
+        self.request_history = request_history
         self.config_file = Path("config.env")
+        self.log_buffer = LogBuffer(maxlen=LOG_BUFFER_SIZE)
+        self.server_host = ServerHost()
+        self.saved_streams = None
 
         # Setup UI
         self.setup_ui()
+        self.toggle_capture()
 
         # Load configuration (try auto-detection first)
         self.load_config()
@@ -45,6 +142,15 @@ class DeltaChatMCPServer:
         # Check Delta Chat availability
         self.check_delta_chat()
 
+        # Start the batched log view refresh
+        self.root.after(LOG_FLUSH_MS, self.flush_logs)
+
+        # Follow the in-process server and shut it down with the window
+        self.root.after(SERVER_POLL_MS, self.poll_server)
+        self.root.after(DASHBOARD_SAMPLE_MS, self.sample_dashboard)
+        self.root.after(REQUESTS_REFRESH_MS, self.poll_requests)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def setup_ui(self):
         """Setup the user interface"""
         # Main notebook for tabs
@@ -54,9 +160,15 @@ class DeltaChatMCPServer:
         # Status tab
         self.create_status_tab()
 
+        # Dashboard tab
+        self.create_dashboard_tab()
+
         # Configuration tab
         self.create_config_tab()
 
+        # Request history tab
+        self.create_requests_tab()
+
         # Logs tab
         self.create_logs_tab()
 
@@ -96,6 +208,142 @@ class DeltaChatMCPServer:
         self.auto_pairing_status_label = ttk.Label(delta_frame, text="🔄 Auto-pairing: Disabled", foreground="gray")
         self.auto_pairing_status_label.pack(anchor=tk.W)
 
+    def create_dashboard_tab(self):
+        """Create the live performance dashboard tab"""
+        dashboard_frame = ttk.Frame(self.notebook)
+        self.notebook.add(dashboard_frame, text="📈 Dashboard")
+
+        graphs_frame = ttk.LabelFrame(dashboard_frame, text="Server Metrics", padding=10)
+        graphs_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.dashboard_graphs = {}
+        panels = [
+            ("requests_per_sec", "Requests/s"),
+            ("in_flight", "In flight"),
+            ("tool_p99", "Tool p99 (ms)"),
+            ("core_p99", "Core RPC p99 (ms)"),
+            ("loop_lag", "Loop lag (ms)"),
+            ("cache_hit_ratio", "Cache hit ratio"),
+        ]
+        for i, (key, title) in enumerate(panels):
+            row, column = divmod(i, 2)
+            panel = ttk.Frame(graphs_frame)
+            panel.grid(row=row, column=column, sticky=tk.W, padx=10, pady=4)
+            ttk.Label(panel, text=title, font=("Arial", 9)).grid(row=0, column=0, sticky=tk.W)
+            value_label = ttk.Label(panel, text="–", font=("Arial", 11, "bold"))
+            value_label.grid(row=0, column=1, sticky=tk.E, padx=5)
+            sparkline = Sparkline(panel)
+            sparkline.canvas.grid(row=1, column=0, columnspan=2)
+            self.dashboard_graphs[key] = (value_label, sparkline)
+
+        tools_frame = ttk.LabelFrame(dashboard_frame, text="Tools", padding=10)
+        tools_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        columns = ("calls", "errors", "p50_ms", "p99_ms")
+        self.tools_tree = ttk.Treeview(tools_frame, columns=columns, height=6)
+        self.tools_tree.heading("#0", text="Tool")
+        for column, title in zip(columns, ("Calls", "Errors", "p50 ms", "p99 ms")):
+            self.tools_tree.heading(column, text=title)
+            self.tools_tree.column(column, width=80, anchor=tk.E)
+        self.tools_tree.pack(fill=tk.BOTH, expand=True)
+
+    def sample_dashboard(self):
+        """Read the server metrics and advance the sparklines by one sample"""
+        try:
+            snapshot = metrics.snapshot()
+            tools = snapshot["tools"]
+            caches = snapshot["caches"].values()
+            lookups = sum(c["hits"] + c["misses"] for c in caches)
+            values = {
+                "requests_per_sec": snapshot["requests_per_sec"],
+                "in_flight": snapshot["in_flight"],
+                "tool_p99": max((t["p99_ms"] for t in tools.values()), default=0.0),
+                "core_p99": snapshot["core_rpc"]["p99_ms"],
+                "loop_lag": snapshot["loop_lag"]["last_ms"],
+                "cache_hit_ratio": sum(c["hits"] for c in caches) / lookups if lookups else 0.0,
+            }
+            for key, value in values.items():
+                value_label, sparkline = self.dashboard_graphs[key]
+                value_label.config(text=f"{value:.2f}" if isinstance(value, float) else str(value))
+                sparkline.add(value)
+
+            for name, stats in tools.items():
+                row = tuple(stats[column] for column in ("calls", "errors", "p50_ms", "p99_ms"))
+                if self.tools_tree.exists(name):
+                    self.tools_tree.item(name, values=row)
+                else:
+                    self.tools_tree.insert("", tk.END, iid=name, text=name, values=row)
+        finally:
+            self.root.after(DASHBOARD_SAMPLE_MS, self.sample_dashboard)
+
+    def create_requests_tab(self):
+        """Create the MCP request history tab"""
+        self.requests_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.requests_frame, text="🧾 Requests")
+
+        filter_frame = ttk.Frame(self.requests_frame)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.request_filters = {}
+        filters = [
+            ("tool", "Tool:", ("all",), 18),
+            ("status", "Status:", ("all", "ok", "error"), 8),
+            ("window", "Window:", tuple(REQUEST_WINDOWS), 10),
+            ("order", "Order:", ("recent", "slowest"), 10),
+        ]
+        for key, label, values, width in filters:
+            ttk.Label(filter_frame, text=label).pack(side=tk.LEFT, padx=(10, 2))
+            var = tk.StringVar(value=values[0])
+            combo = ttk.Combobox(filter_frame, textvariable=var, values=values, state="readonly", width=width)
+            combo.pack(side=tk.LEFT)
+            combo.bind("<<ComboboxSelected>>", lambda _event: self.refresh_requests(reset=True))
+            self.request_filters[key] = (var, combo)
+
+        self.requests_count_label = ttk.Label(filter_frame, text="")
+        self.requests_count_label.pack(side=tk.RIGHT, padx=5)
+
+        columns = ("seq", "time", "tool", "status", "duration_ms", "error")
+        headings = ("#", "Time", "Tool", "Status", "Duration ms", "Error")
+        self.requests_view = VirtualTreeview(self.requests_frame, columns, headings,
+                                             self.fetch_requests, self.count_requests)
+        self.requests_view.frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+    def request_query(self):
+        """Filter arguments for the request history from the tab's controls"""
+        tool, status, window, order = (self.request_filters[key][0].get()
+                                       for key in ("tool", "status", "window", "order"))
+        seconds = REQUEST_WINDOWS[window]
+        return {
+            "tool": None if tool == "all" else tool,
+            "status": None if status == "all" else status,
+            "since": time.time() - seconds if seconds else None,
+        }, order
+
+    def fetch_requests(self, offset, limit):
+        query, order = self.request_query()
+        return [(r["seq"], time.strftime("%H:%M:%S", time.localtime(r["started"])), r["tool"], r["status"],
+                 r["duration_ms"], r["error"] or "")
+                for r in self.request_history.query(order=order, limit=limit, offset=offset, **query)]
+
+    def count_requests(self):
+        query, _order = self.request_query()
+        return self.request_history.count(**query)
+
+    def refresh_requests(self, reset=False):
+        if reset:
+            self.requests_view.offset = 0
+        self.requests_view.refresh()
+        self.request_filters["tool"][1].config(values=("all",) + tuple(self.request_history.tools()))
+        self.requests_count_label.config(text=f"{self.requests_view.total} requests")
+
+    def poll_requests(self):
+        """Refresh the request history while its tab is shown"""
+        try:
+            if self.notebook.select() == str(self.requests_frame):
+                self.refresh_requests()
+        finally:
+            self.root.after(REQUESTS_REFRESH_MS, self.poll_requests)
+
     def create_config_tab(self):
         """Create the configuration tab"""
         config_frame = ttk.Frame(self.notebook)
@@ -182,6 +430,8 @@ class DeltaChatMCPServer:
 
         self.log_text = scrolledtext.ScrolledText(log_frame, height=20, font=("Consolas", 9))
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        for level, color in LOG_COLORS.items():
+            self.log_text.tag_config(level, foreground=color)
 
         # Log controls
         control_frame = ttk.Frame(logs_frame)
@@ -190,10 +440,22 @@ class DeltaChatMCPServer:
         self.clear_logs_button = ttk.Button(control_frame, text="🗑️ Clear Logs", command=self.clear_logs)
         self.clear_logs_button.pack(side=tk.LEFT, padx=5)
 
+        ttk.Label(control_frame, text="Level:").pack(side=tk.LEFT, padx=(15, 2))
+        self.log_level_var = tk.StringVar(value="all")
+        level_combo = ttk.Combobox(control_frame, textvariable=self.log_level_var, values=("all",) + LOG_LEVELS,
+                                   state="readonly", width=10)
+        level_combo.pack(side=tk.LEFT)
+        level_combo.bind("<<ComboboxSelected>>", lambda _event: self.refilter_logs())
+
         self.auto_scroll_var = tk.BooleanVar(value=True)
         self.auto_scroll_check = ttk.Checkbutton(control_frame, text="Auto-scroll", variable=self.auto_scroll_var)
         self.auto_scroll_check.pack(side=tk.RIGHT, padx=5)
 
+        self.capture_output_var = tk.BooleanVar(value=True)
+        self.capture_output_check = ttk.Checkbutton(control_frame, text="Capture server output",
+                                                    variable=self.capture_output_var, command=self.toggle_capture)
+        self.capture_output_check.pack(side=tk.RIGHT, padx=5)
+
     def create_control_panel(self):
         """Create the control buttons panel"""
         control_frame = ttk.Frame(self.root)
@@ -209,6 +471,9 @@ class DeltaChatMCPServer:
         self.stop_button = ttk.Button(left_frame, text="⏹️ Stop Server", command=self.stop_server, state=tk.DISABLED, style="Stop.TButton")
         self.stop_button.pack(side=tk.LEFT, padx=5)
 
+        self.restart_button = ttk.Button(left_frame, text="🔄 Restart Server", command=self.restart_server, state=tk.DISABLED)
+        self.restart_button.pack(side=tk.LEFT, padx=5)
+
         # Right side - info
         right_frame = ttk.Frame(control_frame)
         right_frame.pack(side=tk.RIGHT)
@@ -235,7 +500,7 @@ class DeltaChatMCPServer:
 
         try:
             # Import config here to avoid circular imports
-            from .config import Config
+            from deltachat_mcp.config import Config
 
             success = Config.register_second_device(backup_text)
             if success:
@@ -261,7 +526,7 @@ class DeltaChatMCPServer:
 
         try:
             # Import config here to avoid circular imports
-            from .config import Config
+            from deltachat_mcp.config import Config
 
             if enabled:
                 Config.AUTO_PAIRING_ENABLED = True
@@ -287,8 +552,8 @@ class DeltaChatMCPServer:
     def manual_pairing(self):
         """Manually trigger pairing attempt"""
         try:
-            from .pairing import auto_pairing
-            from .config import Config
+            from deltachat_mcp.pairing import auto_pairing
+            from deltachat_mcp.config import Config
 
             self.log_message("🔄 Starting manual pairing attempt...", "info")
 
@@ -311,7 +576,7 @@ class DeltaChatMCPServer:
     def update_auto_pairing_status(self):
         """Update automatic pairing status display"""
         try:
-            from .config import Config
+            from deltachat_mcp.config import Config
 
             if Config.AUTO_PAIRING_ENABLED:
                 self.auto_pairing_status_label.config(
@@ -332,7 +597,7 @@ class DeltaChatMCPServer:
     def update_pairing_status(self):
         """Update pairing status display"""
         try:
-            from .config import Config
+            from deltachat_mcp.config import Config
 
             if hasattr(Config, 'IS_SECOND_DEVICE') and Config.IS_SECOND_DEVICE:
                 if hasattr(Config, 'BACKUP_INFO') and Config.BACKUP_INFO:
@@ -357,34 +622,34 @@ class DeltaChatMCPServer:
         except Exception as e:
             self.log_message(f"Error updating pairing status: {e}", "error")
 
-def load_config(self):
-    """Load configuration from file"""
-    if self.config_file.exists():
-        content = self.config_file.read_text()
-        for line in content.split('\n'):
-            line = line.strip()
-            if line and not line.startswith('#'):
-                if line.startswith('DC_ADDR='):
-                    self.email_var.set(line.split('=', 1)[1])
-                elif line.startswith('DC_MAIL_PW='):
-                    self.password_var.set(line.split('=', 1)[1])
-                elif line.startswith('MCP_PORT='):
-                    self.port_var.set(line.split('=', 1)[1])
-                elif line.startswith('MCP_MODE='):
-                    self.mode_var.set(line.split('=', 1)[1])
-                elif line.startswith('BACKUP_STRING='):
-                    self.backup_entry.delete("1.0", tk.END)
-                    self.backup_entry.insert("1.0", line.split('=', 1)[1])
-                elif line.startswith('AUTO_PAIRING_ENABLED='):
-                    self.auto_pairing_var.set(line.split('=', 1)[1].lower() == 'true')
-                elif line.startswith('AUTO_PAIRING_SCAN_INTERVAL='):
-                    self.scan_interval_var.set(line.split('=', 1)[1])
-                elif line.startswith('AUTO_PAIRING_TIMEOUT='):
-                    self.timeout_var.set(line.split('=', 1)[1])
-
-        # Update status displays after loading config
-        self.update_auto_pairing_status()
-        self.update_pairing_status()
+    def load_config(self):
+        """Load configuration from file"""
+        if self.config_file.exists():
+            content = self.config_file.read_text()
+            for line in content.split('\n'):
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    if line.startswith('DC_ADDR='):
+                        self.email_var.set(line.split('=', 1)[1])
+                    elif line.startswith('DC_MAIL_PW='):
+                        self.password_var.set(line.split('=', 1)[1])
+                    elif line.startswith('MCP_PORT='):
+                        self.port_var.set(line.split('=', 1)[1])
+                    elif line.startswith('MCP_MODE='):
+                        self.mode_var.set(line.split('=', 1)[1])
+                    elif line.startswith('BACKUP_STRING='):
+                        self.backup_entry.delete("1.0", tk.END)
+                        self.backup_entry.insert("1.0", line.split('=', 1)[1])
+                    elif line.startswith('AUTO_PAIRING_ENABLED='):
+                        self.auto_pairing_var.set(line.split('=', 1)[1].lower() == 'true')
+                    elif line.startswith('AUTO_PAIRING_SCAN_INTERVAL='):
+                        self.scan_interval_var.set(line.split('=', 1)[1])
+                    elif line.startswith('AUTO_PAIRING_TIMEOUT='):
+                        self.timeout_var.set(line.split('=', 1)[1])
+
+            # Update status displays after loading config
+            self.update_auto_pairing_status()
+            self.update_pairing_status()
 
     def save_config(self):
         """Save configuration to file"""
@@ -421,8 +686,8 @@ def load_config(self):
         self.log_message("🔍 Testing Delta Chat connection...", "info")
 
         try:
-            from .config import Config
-            from .rpc import DeltaChatRPC
+            from deltachat_mcp.config import Config
+            from deltachat_mcp.rpc import DeltaChatRPC
 
             # Update config from GUI
             Config.DC_ADDR = self.email_var.get()
@@ -443,20 +708,44 @@ def load_config(self):
 
     def clear_logs(self):
         """Clear the log display"""
+        self.log_buffer.clear()
         self.log_text.delete("1.0", tk.END)
 
     def log_message(self, message, level="info"):
-        """Add a message to the log display"""
-        color = {
-            "info": "black",
-            "success": "green",
-            "warning": "orange",
-            "error": "red"
-        }.get(level, "black")
-
-        self.log_text.insert(tk.END, f"{message}\n", color)
-        self.log_text.tag_add(color, "end-2c linestart", "end-1c")
-        self.log_text.tag_config(color, foreground=color)
+        """Add a message to the log display (safe to call from any thread)"""
+        self.log_buffer.append(message, level)
+
+    def _visible_levels(self):
+        level = self.log_level_var.get()
+        return None if level == "all" else (level,)
+
+    def flush_logs(self):
+        """Write the records queued since the last frame to the widget in one batch"""
+        try:
+            levels = self._visible_levels()
+            records = [r for r in self.log_buffer.drain() if levels is None or r.level in levels]
+            if records:
+                self._render_logs(records[-LOG_MAX_LINES:])
+        finally:
+            self.root.after(LOG_FLUSH_MS, self.flush_logs)
+
+    def refilter_logs(self):
+        """Re-render the widget from the buffer for the selected level"""
+        self.log_buffer.drain()
+        self.log_text.delete("1.0", tk.END)
+        self._render_logs(self.log_buffer.records(self._visible_levels(), limit=LOG_MAX_LINES))
+
+    def _render_logs(self, records):
+        chunks = []
+        for record in records:
+            chunks.extend((f"{record.message}\n", record.level))
+        if chunks:
+            self.log_text.insert(tk.END, *chunks)
+
+        # Trim the oldest lines beyond the widget limit
+        lines = int(self.log_text.index("end-1c").split(".")[0]) - 1
+        if lines > LOG_MAX_LINES:
+            self.log_text.delete("1.0", f"{lines - LOG_MAX_LINES + 1}.0")
 
         if self.auto_scroll_var.get():
             self.log_text.see(tk.END)
@@ -466,14 +755,81 @@ def load_config(self):
         self.root.mainloop()
 
     def start_server(self):
-        """Start the MCP server"""
-        self.log_message("🚀 Starting MCP server...", "info")
-        # Implementation would go here
+        """Start the MCP server on its background thread"""
+        from deltachat_mcp.config import Config
+
+        try:
+            Config.MCP_PORT = int(self.port_var.get())
+        except ValueError:
+            self.log_message(f"❌ Invalid port: {self.port_var.get()}", "error")
+            return
+        Config.DC_ADDR = self.email_var.get() or Config.DC_ADDR
+        Config.DC_MAIL_PW = self.password_var.get() or Config.DC_MAIL_PW
+
+        if self.server_host.start():
+            self.log_message("🚀 Starting MCP server...", "info")
 
     def stop_server(self):
-        """Stop the MCP server"""
-        self.log_message("🛑 Stopping MCP server...", "info")
-        # Implementation would go here
+        """Stop the MCP server without waiting for it to shut down"""
+        if self.server_host.stop():
+            self.log_message("🛑 Stopping MCP server...", "info")
+
+    def restart_server(self):
+        """Stop the MCP server and start it again once it has shut down"""
+        self.log_message("🔄 Restarting MCP server...", "info")
+        self.server_host.restart()
+
+    def toggle_capture(self):
+        """Show the server's stdout and stderr in the log view while enabled"""
+        if self.capture_output_var.get():
+            if self.saved_streams is None:
+                self.saved_streams = (sys.stdout, sys.stderr)
+                sys.stdout = sys.stderr = LogStream(self.log_buffer)
+        elif self.saved_streams is not None:
+            sys.stdout, sys.stderr = self.saved_streams
+            self.saved_streams = None
+
+    def poll_server(self):
+        """Apply server state changes posted from the server thread"""
+        try:
+            for state, detail in self.server_host.drain_events():
+                self.show_server_state(state, detail)
+        finally:
+            self.root.after(SERVER_POLL_MS, self.poll_server)
+
+    def show_server_state(self, state, detail=None):
+        from deltachat_mcp.config import Config
+
+        self.server_running = state == "running"
+        active = state in ("starting", "running")
+        self.start_button.config(state=tk.DISABLED if active or state == "stopping" else tk.NORMAL)
+        self.stop_button.config(state=tk.NORMAL if active else tk.DISABLED)
+        self.restart_button.config(state=tk.NORMAL if active else tk.DISABLED)
+
+        if state == "running":
+            url = f"http://127.0.0.1:{Config.MCP_PORT}/tool"
+            self.server_status_label.config(text="🟢 Server Running")
+            self.server_url_label.config(text=f"MCP URL: {url}")
+            self.info_label.config(text="Server running")
+            self.log_message(f"✅ MCP server running at {url}", "success")
+        elif state in ("starting", "stopping"):
+            self.server_status_label.config(text=f"🟡 Server {state.capitalize()}")
+            self.info_label.config(text=f"Server {state}...")
+        else:
+            self.server_status_label.config(text="🔴 Server Stopped")
+            self.server_url_label.config(text="MCP URL: Not running")
+            self.info_label.config(text="Ready to start")
+            if state == "failed":
+                self.log_message(f"❌ MCP server failed: {detail}", "error")
+            else:
+                self.log_message(f"🛑 MCP server stopped{f' ({detail})' if detail else ''}", "info")
+
+    def on_close(self):
+        """Shut the server down before closing the window"""
+        self.server_host.shutdown()
+        self.capture_output_var.set(False)
+        self.toggle_capture()
+        self.root.destroy()
 
     def check_delta_chat(self):
         """Check if Delta Chat is available"""
@@ -0,0 +1,77 @@
+"""Fake core objects shared by the tool, cache and recording tests
+
+The class names match the core's, so recorded handles read "Chat:1" as
+they do against a real account.
+"""
+import pytest
+
+
+class Sender:
+    addr = "bob@example.org"
+
+
+class Message:
+    def __init__(self, msg_id, text):
+        self.id = msg_id
+        self.sender = Sender()
+        self.text = text
+        self.timestamp = msg_id
+        self.is_outgoing = False
+        self.is_encrypted = True
+
+
+class Chat:
+    def __init__(self, account, chat_id):
+        self.id = chat_id
+        self.name = account.names.get(chat_id, f"chat {chat_id}")
+        self.addr = None
+        self._account = account
+
+    def is_self_talk(self):
+        return False
+
+    def is_group(self):
+        self._account.calls.append("is_group")
+        return False
+
+    def get_unread_message_count(self):
+        self._account.calls.append("unread")
+        return self._account.unread
+
+    async def get_messages(self):
+        return [Message(i, f"message {i}{self._account.padding}") for i in range(1, self._account.messages + 1)]
+
+    async def send_text(self, text):
+        return Message(100 + self.id, text)
+
+
+class Account:
+    """Core account with ``chats`` chats of ``messages`` messages each
+
+    ``calls`` lists the chat reads a projection may skip (is_group, unread),
+    ``fetched`` the chat ids passed to get_chat_by_id.
+    """
+
+    id = 1
+
+    def __init__(self, chats=10, messages=50, unread=1, padding="", names=None):
+        self.chats = chats
+        self.messages = messages
+        self.unread = unread
+        self.padding = padding
+        self.names = names or {}
+        self.calls = []
+        self.fetched = []
+
+    async def get_chats(self):
+        return [Chat(self, i) for i in range(1, self.chats + 1)]
+
+    async def get_chat_by_id(self, chat_id):
+        self.fetched.append(chat_id)
+        return Chat(self, chat_id)
+
+
+@pytest.fixture
+def fake_account():
+    """Factory for the fake core Account"""
+    return Account
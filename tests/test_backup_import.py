@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from deltachat_mcp.backup_import import BackupImporter
+
+
+@pytest.mark.asyncio
+async def test_backup_string_reaches_the_core_as_a_file_path(tmp_path):
+    payload = "DCBACKUP3:" + "ä€" * 3000
+    importer = BackupImporter(tmp_path)
+    imported = []
+
+    async def core_import(path):
+        imported.append(open(path, encoding="utf-8").read())
+        return True
+
+    assert await importer.import_backup(payload, "node", core_import)
+    status = importer.status()
+    assert status["state"] == "done"
+    assert status["bytes_total"] == len(payload.encode())
+    assert imported == [payload]
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_core_import_progress_is_reported(tmp_path):
+    importer = BackupImporter(tmp_path)
+    events = asyncio.Queue()
+    seen = []
+
+    async def core_import(path):
+        for event in ({"kind": "ImexProgress", "progress": 250}, {"kind": "Info", "msg": "hi"},
+                      {"contextId": 1, "event": {"kind": "ImexProgress", "progress": 600}}):
+            await events.put(event)
+        while events.qsize():
+            await asyncio.sleep(0)
+        seen.append(importer.status()["percent"])
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        await importer.import_backup("DCBACKUP3:data", "node", core_import, events.get)
+    assert seen == [60.0]
+    status = importer.status()
+    assert status["state"] == "failed"
+    assert status["error"] == "disk full"
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_file_payload_is_imported_in_place(tmp_path):
+    staging = tmp_path / "staging"
+    backup = tmp_path / "backup.tar"
+    backup.write_bytes(b"backup data")
+    importer = BackupImporter(staging)
+    imported = []
+
+    async def core_import(path):
+        imported.append(path)
+        return True
+
+    assert await importer.import_backup(backup, "node", core_import)
+    assert imported == [str(backup)]
+    assert backup.exists()
+    assert not staging.exists()
+    assert importer.status()["state"] == "done"
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from deltachat_mcp import backup_sources
+from deltachat_mcp.backup_sources import BackupStringPipeline, ClipboardSource, DropDirectorySource, EnvFileSource
+from deltachat_mcp.tools import submit_backup_string
+
+BACKUP = 'DCBACKUP3:secret&{"node_id":"n1","direct_addresses":["192.168.1.5:42654"]}'
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_dropped_files_and_env_are_picked_up_once(tmp_path):
+    drop_dir = tmp_path / "drop"
+    env = tmp_path / ".env"
+    env.write_text("DC_ADDR=bot@example.org\n")
+    pipeline = BackupStringPipeline([DropDirectorySource(drop_dir), EnvFileSource(env)])
+    heard = []
+    pipeline.add_listener(heard.append)
+
+    task = asyncio.create_task(pipeline.run())
+    try:
+        await wait_for(drop_dir.exists)
+        (drop_dir / "pairing.txt").write_text(BACKUP + "\n")
+        await wait_for(lambda: heard)
+
+        env.write_text(f"DC_ADDR=bot@example.org\nBACKUP_STRING='{BACKUP}'\n")
+        other = BACKUP.replace("n1", "n2")
+        (drop_dir / "other.txt").write_text(other)
+        await wait_for(lambda: len(heard) == 2)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert heard == [BACKUP, other]
+    assert pipeline.latest() == other
+
+
+@pytest.mark.asyncio
+async def test_submit_backup_string_tool_validates_and_dedups():
+    with pytest.raises(ValueError):
+        await submit_backup_string({"backup_string": "hello"})
+
+    first = await submit_backup_string({"backup_string": BACKUP.replace("n1", "tool")})
+    again = await submit_backup_string({"backup_string": BACKUP.replace("n1", "tool")})
+    assert (first["accepted"], first["duplicate"], first["node_id"]) == (True, False, "tool")
+    assert again["duplicate"]
+
+
+def test_seen_hashes_are_capped(monkeypatch):
+    monkeypatch.setattr(backup_sources, "SEEN_LIMIT", 3)
+    pipeline = BackupStringPipeline([])
+    strings = [BACKUP.replace("n1", f"cap{i}") for i in range(5)]
+    for backup_string in strings:
+        assert not pipeline.submit(backup_string)["duplicate"]
+    assert len(pipeline._seen) == 3
+    assert pipeline.submit(strings[-1])["duplicate"]
+    assert not pipeline.submit(strings[0])["duplicate"]
+
+
+def test_x11_clipboard_without_clipnotify_is_not_watched(monkeypatch):
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+    monkeypatch.setenv("DISPLAY", ":0")
+    tools = {"xclip": "/usr/bin/xclip"}
+    monkeypatch.setattr(backup_sources.shutil, "which", tools.get)
+    assert not ClipboardSource().available()
+    tools["clipnotify"] = "/usr/bin/clipnotify"
+    assert ClipboardSource().available()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_x11_watch_reaps_clipnotify(tmp_path, monkeypatch):
+    notifier = tmp_path / "clipnotify"
+    notifier.write_text("#!/bin/sh\nsleep 30\n")
+    notifier.chmod(0o755)
+    monkeypatch.setattr(backup_sources.shutil, "which", {"clipnotify": str(notifier)}.get)
+    spawned = []
+    spawn = asyncio.create_subprocess_exec
+
+    async def recording_spawn(*args, **kwargs):
+        spawned.append(await spawn(*args, **kwargs))
+        return spawned[-1]
+
+    monkeypatch.setattr(backup_sources.asyncio, "create_subprocess_exec", recording_spawn)
+    source = ClipboardSource()
+    monkeypatch.setattr(source, "_x11_reader", lambda: ["echo", "not a backup"])
+
+    watcher = asyncio.create_task(source._watch_x11(lambda *args: None))
+    await wait_for(lambda: len(spawned) == 2)
+    watcher.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await watcher
+    assert all(proc.returncode is not None for proc in spawned)
@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from deltachat_mcp.cache import TTLCache, chat_cache, follow_events, message_cache
+from deltachat_mcp.config import Config
+from deltachat_mcp.metrics import metrics
+from deltachat_mcp.tools import load_chatlist
+from deltachat_mcp.warmup import warm_up
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.ttl = -1
+    cache.set("d", 4)
+    assert cache.get("d") is None
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_warm_up_prefetches_top_chats(monkeypatch, fake_account):
+    monkeypatch.setattr(Config, "WARMUP_TOP_CHATS", 3)
+    monkeypatch.setattr(Config, "WARMUP_MESSAGES", 20)
+    chat_cache.invalidate()
+    message_cache.invalidate()
+
+    account = fake_account()
+    stats = await warm_up(account)
+
+    assert stats["prefetched_chats"] == 3
+    assert sorted(account.fetched) == [1, 2, 3]
+    assert chat_cache.get("chatlist")["unread_count"] == 10
+    assert len(message_cache.get(2)[1]) == 20
+
+
+@pytest.mark.asyncio
+async def test_warm_up_waits_for_tool_calls_in_flight(monkeypatch, fake_account):
+    monkeypatch.setattr(Config, "WARMUP_TOP_CHATS", 2)
+    monkeypatch.setattr(metrics, "in_flight", 1)
+    chat_cache.invalidate()
+    message_cache.invalidate()
+
+    account = fake_account()
+    task = asyncio.create_task(warm_up(account))
+    await asyncio.sleep(0.2)
+    assert account.fetched == []
+
+    metrics.in_flight = 0
+    stats = await asyncio.wait_for(task, 5)
+    assert stats["prefetched_chats"] == 2
+
+
+@pytest.mark.asyncio
+async def test_projection_miss_counts_once(fake_account):
+    chat_cache.invalidate()
+    misses = chat_cache.misses
+    await load_chatlist(fake_account(), ("id", "unread_count"))
+    assert chat_cache.misses == misses + 1
+
+
+def test_following_events_switches_to_the_longer_ttl(monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_TTL", 10.0)
+    monkeypatch.setattr(Config, "CACHE_EVENT_TTL", 600.0)
+    try:
+        follow_events(True)
+        assert chat_cache.ttl == message_cache.ttl == 600.0
+    finally:
+        follow_events(False)
+    assert chat_cache.ttl == message_cache.ttl == 10.0
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from deltachat_mcp.cache import chat_cache, message_cache
+from deltachat_mcp.changes import ChangeLog, pump_events, record_event
+
+
+def test_changes_since_folds_and_pages():
+    log = ChangeLog()
+    start = log.changes_since(None)
+    assert start["reset"] is True
+
+    log.record("message", "created", 1, 10)
+    log.record("message", "modified", 1, 10)
+    log.record("message", "modified", 1, 11)
+    log.record("message", "deleted", 1, 11)
+    log.record("chat", "modified", 2)
+    changes = log.changes_since(start["token"])
+    assert changes["reset"] is False and changes["more"] is False
+    assert changes["messages"]["created"] == [{"chat_id": 1, "id": 10}]
+    assert changes["messages"]["deleted"] == [{"chat_id": 1, "id": 11}]
+    assert changes["chats"]["modified"] == [2]
+
+    idle = log.changes_since(changes["token"])
+    assert idle["token"] == changes["token"]
+    assert not any(idle["messages"].values()) and not any(idle["chats"].values())
+
+    page = log.changes_since(start["token"], limit=2)
+    assert page["more"] is True
+    rest = log.changes_since(page["token"])
+    assert rest["chats"]["modified"] == [2] and rest["more"] is False
+
+
+def test_unknown_or_expired_tokens_ask_for_resync():
+    log = ChangeLog(size=3)
+    token = log.changes_since(None)["token"]
+    for msg_id in range(5):
+        log.record("message", "created", 1, msg_id)
+    assert log.changes_since(token)["reset"] is True
+    assert log.changes_since(ChangeLog().token())["reset"] is True
+    assert log.changes_since("garbage")["reset"] is True
+    assert log.changes_since(log.token(2))["reset"] is False
+
+
+def test_core_events_are_recorded_and_invalidate_caches():
+    log = ChangeLog()
+    chat_cache.set("chatlist", {"chats": [], "unread_count": 0})
+    message_cache.set(5, (20, [], None))
+
+    assert record_event(log, {"kind": "IncomingMsg", "chat_id": 5, "msg_id": 50})
+    assert chat_cache.peek("chatlist") is None and message_cache.peek(5) is None
+    assert record_event(log, {"kind": "ChatDeleted", "chat_id": 6})
+    assert not record_event(log, {"kind": "Info", "msg": "connected"})
+
+    # Message events without a message id still drop the chat's cached messages
+    message_cache.set(5, (20, [], None))
+    assert record_event(log, {"kind": "MsgsNoticed", "chat_id": 5, "msg_id": 0})
+    assert message_cache.peek(5) is None
+
+    # chat_id 0 means everything may have changed
+    chat_cache.set("chatlist", {"chats": [], "unread_count": 0})
+    message_cache.set(7, (20, [], None))
+    assert not record_event(log, {"kind": "MsgsChanged", "chat_id": 0, "msg_id": 0})
+    assert chat_cache.peek("chatlist") is None and message_cache.peek(7) is None
+
+    changes = log.changes_since(log.token(0))
+    assert changes["messages"]["created"] == [{"chat_id": 5, "id": 50}]
+    assert changes["chats"]["modified"] == [5]
+    assert changes["chats"]["deleted"] == [6]
+
+
+@pytest.mark.asyncio
+async def test_pump_follows_account_events():
+    class Event:
+        def __init__(self, kind, chat_id, msg_id=0):
+            self.kind, self.chat_id, self.msg_id = kind, chat_id, msg_id
+
+    class Account:
+        def __init__(self):
+            self.events = asyncio.Queue()
+
+        async def wait_for_event(self):
+            return await self.events.get()
+
+    log, account = ChangeLog(), Account()
+    pump = asyncio.create_task(pump_events(account, log))
+    await account.events.put(Event("MsgRead", 3, 30))
+    await account.events.put(Event("ChatModified", 4))
+
+    async def recorded():
+        while len(log) < 3:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(recorded(), timeout=5)
+    pump.cancel()
+    await asyncio.gather(pump, return_exceptions=True)
+
+    changes = log.changes_since(log.token(0))
+    assert changes["messages"]["modified"] == [{"chat_id": 3, "id": 30}]
+    assert sorted(changes["chats"]["modified"]) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_pump_backs_off_and_gives_up(monkeypatch):
+    from deltachat_mcp import changes
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    class ClosedAccount:
+        async def wait_for_event(self):
+            raise ConnectionError("rpc closed")
+
+    monkeypatch.setattr(changes.asyncio, "sleep", fake_sleep)
+    await asyncio.wait_for(pump_events(ClosedAccount(), ChangeLog()), timeout=5)
+    assert delays[:4] == [1.0, 2.0, 4.0, 8.0]
+    assert len(delays) == changes.PUMP_MAX_FAILURES - 1
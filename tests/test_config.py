@@ -0,0 +1,37 @@
+import os
+
+from deltachat_mcp.cache import message_cache
+from deltachat_mcp.config import Config
+
+
+def test_reload_applies_safe_settings_and_reports_restart_ones(monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_TTL", Config.CACHE_TTL)
+    monkeypatch.setattr(Config, "AUTO_PAIRING_SCAN_INTERVAL", 30)
+    monkeypatch.setattr(message_cache, "ttl", message_cache.ttl)
+    monkeypatch.setenv("CACHE_TTL", "42")
+    monkeypatch.setenv("AUTO_PAIRING_SCAN_INTERVAL", "not a number")
+    monkeypatch.setenv("DC_ADDR", "someone-else@example.org")
+
+    result = Config.reload()
+
+    assert Config.CACHE_TTL == 42.0
+    assert message_cache.ttl == 42.0
+    assert result["applied"]["CACHE_TTL"] == "42.0"
+    assert Config.AUTO_PAIRING_SCAN_INTERVAL == 30
+    assert "AUTO_PAIRING_SCAN_INTERVAL" in result["invalid"]
+    assert "DC_ADDR" in result["restart_required"]
+
+
+def test_reload_keeps_process_environment_over_env_file(tmp_path, monkeypatch):
+    from deltachat_mcp import config
+    env_file = tmp_path / ".env"
+    env_file.write_text("DC_MCP_TEST_PORT=1234\nDC_MCP_TEST_NEW=from-file\n")
+    monkeypatch.setattr(config, "_PROCESS_ENV", config._PROCESS_ENV | {"DC_MCP_TEST_PORT"})
+    monkeypatch.setenv("DC_MCP_TEST_PORT", "9000")
+    monkeypatch.setenv("DC_MCP_TEST_NEW", "")  # Restored (removed) after the test
+    monkeypatch.delenv("DC_MCP_TEST_NEW")
+
+    config._load_env_file(str(env_file))
+
+    assert os.environ["DC_MCP_TEST_PORT"] == "9000"
+    assert os.environ["DC_MCP_TEST_NEW"] == "from-file"
@@ -0,0 +1,105 @@
+import sqlite3
+from deltachat_mcp.config import Config
+from deltachat_mcp.db_discovery import DatabaseDiscovery, DiscoveryCache, has_sqlite_header, probe_database
+
+
+def make_delta_chat_db(path, addr="bot@example.org"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE config (key TEXT, value TEXT)")
+    conn.execute("CREATE TABLE chats (id INTEGER)")
+    conn.execute("CREATE TABLE msgs (id INTEGER)")
+    conn.executemany("INSERT INTO config VALUES (?, ?)", [("addr", addr), ("mail_pw", "secret")])
+    conn.commit()
+    conn.close()
+
+
+def test_known_locations_win_without_walking(tmp_path):
+    known = tmp_path / ".config" / "DeltaChat" / "accounts" / "abc" / "dc.db"
+    make_delta_chat_db(known)
+    probed = []
+
+    def is_delta_chat_db(path):
+        probed.append(path)
+        return True
+
+    discovery = DatabaseDiscovery(is_delta_chat_db, home=tmp_path)
+    assert next(discovery.iter_databases()) == known
+    assert probed == [known]
+
+
+def test_cache_keeps_verdicts_and_walks_until_a_walk_completes(tmp_path):
+    known_dir = tmp_path / "home" / ".config" / "DeltaChat"
+    make_delta_chat_db(known_dir / "dc.db")
+    other = sqlite3.connect(str(known_dir / "other.db"))
+    other.execute("CREATE TABLE notes (text TEXT)")
+    other.close()
+    cache_path = tmp_path / "discovery.json"
+
+    first = DatabaseDiscovery(Config._is_delta_chat_db, home=tmp_path / "home", deep_scan=False,
+                              cache=DiscoveryCache(cache_path))
+    assert list(first.iter_databases()) == [known_dir / "dc.db"]
+
+    cache = DiscoveryCache(cache_path)
+    assert cache.entries[str(known_dir / "other.db")]["is_delta_chat"] is False
+    assert not cache.walk_complete
+
+    walked = tmp_path / "home" / "projects" / "dc.db"
+    make_delta_chat_db(walked)
+    second = DatabaseDiscovery(Config._is_delta_chat_db, home=tmp_path / "home", cache=cache)
+    assert walked in list(second.iter_databases())
+    assert DiscoveryCache(cache_path).walk_complete
+
+
+def test_walk_filters_by_header_and_respects_depth(tmp_path):
+    make_delta_chat_db(tmp_path / "projects" / "bot" / "dc.db")
+    make_delta_chat_db(tmp_path / "a" / "b" / "c" / "d" / "deep.db")
+    (tmp_path / "projects" / "notes.db").write_text("not a database")
+    assert not has_sqlite_header(tmp_path / "projects" / "notes.db")
+
+    discovery = DatabaseDiscovery(Config._is_delta_chat_db, home=tmp_path, max_depth=3)
+    assert list(discovery.iter_databases()) == [tmp_path / "projects" / "bot" / "dc.db"]
+
+
+def test_cache_skips_walk_and_revalidates_only_changed_files(tmp_path):
+    home = tmp_path / "home"
+    db = home / "projects" / "bot" / "dc.db"
+    make_delta_chat_db(db)
+    cache_path = tmp_path / "discovery.json"
+
+    first = DatabaseDiscovery(Config._is_delta_chat_db, home=home,
+                              cache=DiscoveryCache(cache_path))
+    assert list(first.iter_databases()) == [db]
+
+    make_delta_chat_db(home / "other" / "new.db")
+    probed = []
+
+    def is_delta_chat_db(path):
+        probed.append(path)
+        return Config._is_delta_chat_db(path)
+
+    second = DatabaseDiscovery(is_delta_chat_db, home=home, cache=DiscoveryCache(cache_path))
+    assert list(second.iter_databases()) == [db]
+    assert probed == []
+
+    db.write_bytes(b"SQLite format 3\x00" + b"\x00" * 100)
+    third = DatabaseDiscovery(is_delta_chat_db, home=home, cache=DiscoveryCache(cache_path))
+    assert list(third.iter_databases()) == []
+    assert probed == [db]
+
+
+def test_probe_reads_locked_database_in_one_pass(tmp_path):
+    db = tmp_path / "dc.db"
+    make_delta_chat_db(db)
+
+    writer = sqlite3.connect(str(db))
+    writer.execute("BEGIN EXCLUSIVE")
+    try:
+        result = probe_database(db)
+    finally:
+        writer.rollback()
+        writer.close()
+
+    assert result["is_delta_chat"]
+    assert result["config"] == {"addr": "bot@example.org", "mail_pw": "secret"}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dc.db"]
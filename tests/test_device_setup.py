@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from deltachat_mcp.cache import chat_cache
+from deltachat_mcp.config import Config
+from deltachat_mcp.device_setup import SecondDeviceSetup, device_setup
+from deltachat_mcp.tools import get_setup_status, list_chats
+
+
+class FakeRpc:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = False
+
+    async def _import_backup_data(self, backup_info):
+        await self.release.wait()
+        return True
+
+    async def _start(self, account):
+        self.started = True
+
+    def get_account(self):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_setup_runs_in_background_and_tools_serve_cache(monkeypatch):
+    monkeypatch.setattr(Config, "BACKUP_INFO", {"node_id": "n1", "encrypted_data": "x"}, raising=False)
+    monkeypatch.setattr(chat_cache, "ttl", -1)  # entries are stale as soon as they are stored
+    chat_cache.set("chatlist", {"chats": [{"id": 7, "name": "Cached"}], "unread_count": 0})
+
+    rpc = FakeRpc()
+    device_setup.start(rpc)
+    await asyncio.sleep(0)
+    try:
+        assert (await get_setup_status({}))["state"] == "importing"
+        assert (await list_chats({}))["chats"] == [{"id": 7, "name": "Cached"}]
+
+        rpc.release.set()
+        status = await device_setup.wait(timeout=5)
+    finally:
+        device_setup.cancel()
+        chat_cache.invalidate()
+
+    assert status["state"] == "ready"
+    assert [h["state"] for h in status["history"]] == ["importing", "starting_io", "ready"]
+    assert rpc.started
+
+
+@pytest.mark.asyncio
+async def test_setup_can_be_cancelled_while_waiting_for_backup(monkeypatch):
+    monkeypatch.setattr(Config, "BACKUP_INFO", None, raising=False)
+    monkeypatch.setattr(Config, "AUTO_PAIRING_ENABLED", True)
+    from deltachat_mcp.pairing import auto_pairing
+    monkeypatch.setattr(auto_pairing, "start_auto_pairing_service", lambda: None)
+    monkeypatch.setattr(auto_pairing, "backup_string", lambda: None)
+
+    setup = SecondDeviceSetup()
+    setup.start(FakeRpc())
+    await asyncio.sleep(0.05)
+    assert setup.status()["state"] == "waiting_for_backup"
+
+    assert setup.cancel()
+    status = await setup.wait(timeout=5)
+    assert status["state"] == "cancelled"
+    assert not status["running"]
+
+
+@pytest.mark.asyncio
+async def test_setup_follows_backup_string_and_pairing_without_polling(monkeypatch):
+    monkeypatch.setattr(Config, "BACKUP_INFO", None, raising=False)
+    monkeypatch.setattr(Config, "AUTO_PAIRING_ENABLED", True)
+    from deltachat_mcp.backup_sources import backup_sources
+    from deltachat_mcp.pairing import auto_pairing
+    monkeypatch.setattr(auto_pairing, "start_auto_pairing_service", lambda: None)
+    monkeypatch.setattr(auto_pairing, "backup_string", lambda: None)
+    monkeypatch.setattr(auto_pairing, "paired_info", None)
+    monkeypatch.setattr(Config, "IS_SECOND_DEVICE", False, raising=False)
+
+    setup = SecondDeviceSetup()
+    rpc = FakeRpc()
+    rpc.release.set()
+    setup.start(rpc)
+    await asyncio.sleep(0.01)
+    assert setup.state == "waiting_for_backup"
+
+    backup_sources.submit('DCBACKUP3:secret&{"node_id":"setup","direct_addresses":[]}', "test")
+    await asyncio.sleep(0.01)
+    assert setup.state == "pairing"
+
+    auto_pairing.paired_info = {"node_id": "setup", "encrypted_data": "x"}
+    auto_pairing._on_paired()
+    status = await setup.wait(timeout=5)
+    assert status["state"] == "ready"
+    assert status["node_id"] == "setup"
@@ -0,0 +1,87 @@
+import sqlite3
+import time
+
+import pytest
+from deltachat_mcp import history as history_module
+from deltachat_mcp.config import Config
+from deltachat_mcp.history import RequestHistory
+from deltachat_mcp.instrumentation import RpcStats
+from deltachat_mcp.metrics import ServerMetrics
+
+
+def fill(history):
+    for i, (tool, duration) in enumerate([("list_chats", 0.010), ("get_messages", 0.200),
+                                          ("list_chats", 0.050), ("send_message", 0.020)]):
+        history.record(tool, duration, ValueError("bad") if i == 3 else None)
+
+
+def test_ring_keeps_newest_and_filters():
+    history = RequestHistory(size=3)
+    fill(history)
+    assert len(history) == 3
+    assert [r["seq"] for r in history.query()] == [4, 3, 2]
+    assert [r["tool"] for r in history.query(order="slowest", limit=1)] == ["get_messages"]
+    assert history.count(tool="list_chats") == 1
+    assert history.query(status="error")[0]["error"] == "bad"
+    with pytest.raises(ValueError):
+        history.query(order="fastest")
+
+
+def test_sqlite_spill_outlives_ring_and_restarts(tmp_path):
+    db_path = tmp_path / "requests.sqlite"
+    history = RequestHistory(size=2, db_path=db_path)
+    fill(history)
+    assert len(history) == 2
+    assert history.count() == 4
+    assert [r["duration_ms"] for r in history.query(order="slowest", limit=2)] == [200.0, 50.0]
+    assert history.tools() == ["get_messages", "list_chats", "send_message"]
+    history.close()
+
+    reopened = RequestHistory(size=2, db_path=db_path)
+    reopened.record("get_unread_count", 0.001)
+    assert reopened.query(limit=1)[0]["seq"] == 5
+    assert reopened.count(since=time.time() - 60) == 5
+    reopened.close()
+
+
+def test_sqlite_spill_drops_calls_past_retention(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "REQUEST_HISTORY_RETENTION", 60)
+    history = RequestHistory(db_path=tmp_path / "requests.sqlite")
+    history.record("list_chats", 120.0)  # Started two minutes ago
+    history.record("list_chats", 0.01)
+    assert history.count() == 1
+    # The next prune is PRUNE_INTERVAL away, not on every write
+    history.record("list_chats", 120.0)
+    assert history.count() == 2
+    history.close()
+
+
+def test_record_leaves_sqlite_writes_to_the_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_module, "SPILL_INTERVAL", 60)
+    db_path = tmp_path / "requests.sqlite"
+    history = RequestHistory(db_path=db_path)
+    history.record("list_chats", 0.01)
+
+    def on_disk():
+        db = sqlite3.connect(str(db_path))
+        try:
+            return db.execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+        finally:
+            db.close()
+
+    assert on_disk() == 0
+    history.close()
+    assert on_disk() == 1
+
+
+@pytest.mark.asyncio
+async def test_history_follows_timed_tools():
+    metrics = ServerMetrics(RpcStats())
+    history = RequestHistory()
+    metrics.tools.add_observer(history.record)
+
+    async def list_chats(params):
+        return {"chats": []}
+
+    await metrics.timed(list_chats)({})
+    assert [r["tool"] for r in history.query()] == ["list_chats"]
@@ -0,0 +1,44 @@
+import pytest
+from deltachat_mcp.instrumentation import InstrumentedProxy, RpcStats, unwrap
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+    async def send_text(self, text):
+        return text
+
+
+class FakeAccount:
+    async def get_chats(self):
+        return [FakeChat(1), FakeChat(2)]
+
+    async def fail(self):
+        raise RuntimeError("boom")
+
+
+@pytest.mark.asyncio
+async def test_proxy_times_nested_core_objects():
+    stats = RpcStats()
+    account = InstrumentedProxy(FakeAccount(), stats)
+
+    chats = await account.get_chats()
+    assert [c.id for c in chats] == [1, 2]
+    assert isinstance(unwrap(chats[0]), FakeChat)
+    await chats[0].send_text("hi")
+
+    snapshot = stats.snapshot()
+    assert snapshot["FakeAccount.get_chats"]["calls"] == 1
+    assert snapshot["FakeChat.send_text"]["calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_proxy_counts_errors():
+    stats = RpcStats()
+    account = InstrumentedProxy(FakeAccount(), stats)
+
+    with pytest.raises(RuntimeError):
+        await account.fail()
+
+    assert stats.snapshot()["FakeAccount.fail"]["errors"] == 1
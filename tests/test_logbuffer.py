@@ -0,0 +1,65 @@
+import threading
+
+from deltachat_mcp.logbuffer import LogBuffer, LogStream
+
+
+def test_drain_returns_queued_batch_once():
+    buffer = LogBuffer(maxlen=100)
+    buffer.append("one")
+    buffer.append("two", "error")
+    batch = buffer.drain()
+    assert [r.message for r in batch] == ["one", "two"]
+    assert batch[1].level == "error"
+    assert buffer.drain() == []
+    assert len(buffer) == 2
+
+
+def test_buffer_keeps_newest_records():
+    buffer = LogBuffer(maxlen=3)
+    for i in range(10):
+        buffer.append(f"line {i}")
+    batch = buffer.drain()
+    assert [r.message for r in batch] == ["line 7", "line 8", "line 9"]
+    assert len(buffer) == 3
+
+
+def test_records_filter_by_level_and_limit():
+    buffer = LogBuffer()
+    for i, level in enumerate(["info", "error", "warning", "error", "success"]):
+        buffer.append(f"line {i}", level)
+    buffer.drain()
+    assert [r.message for r in buffer.records(["error"])] == ["line 1", "line 3"]
+    assert [r.message for r in buffer.records(limit=2)] == ["line 3", "line 4"]
+    buffer.clear()
+    assert buffer.records() == []
+
+
+def test_append_from_many_threads():
+    buffer = LogBuffer()
+
+    def writer(n):
+        for i in range(500):
+            buffer.append(f"{n}:{i}")
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batch = buffer.drain()
+    assert len(batch) == 4000
+    assert len({r.seq for r in batch}) == 4000
+
+
+def test_log_stream_splits_lines_and_guesses_levels():
+    buffer = LogBuffer()
+    stream = LogStream(buffer)
+    print("✅ Connected", file=stream)
+    stream.write("❌ partial ")
+    stream.write("line\n\nWarning: slow\nplain\n")
+    assert [(r.level, r.message) for r in buffer.drain()] == [
+        ("success", "✅ Connected"),
+        ("error", "❌ partial line"),
+        ("warning", "Warning: slow"),
+        ("info", "plain"),
+    ]
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+from deltachat_mcp.instrumentation import RpcStats
+from deltachat_mcp.metrics import ServerMetrics
+
+
+@pytest.mark.asyncio
+async def test_timed_tools_record_latency_and_in_flight():
+    metrics = ServerMetrics(RpcStats())
+    release = asyncio.Event()
+
+    async def list_chats(params):
+        await release.wait()
+        return {"chats": []}
+
+    async def broken(params):
+        raise ValueError("bad params")
+
+    timed = metrics.timed(list_chats)
+    assert timed.__name__ == "list_chats"
+    calls = [asyncio.create_task(timed({})) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert metrics.snapshot()["in_flight"] == 3
+
+    release.set()
+    await asyncio.gather(*calls)
+    with pytest.raises(ValueError):
+        await metrics.timed(broken)({})
+
+    snapshot = metrics.snapshot()
+    assert snapshot["in_flight"] == 0
+    assert snapshot["requests"] == 4
+    assert snapshot["tools"]["list_chats"]["calls"] == 3
+    assert snapshot["tools"]["broken"]["errors"] == 1
+
+
+def test_core_calls_feed_aggregate_latency():
+    core = RpcStats()
+    metrics = ServerMetrics(core)
+    core.record("Account.get_chats", 0.010)
+    core.record("Chat.get_messages", 0.030)
+    assert metrics.snapshot()["core_rpc"]["calls"] == 2
+    assert metrics.snapshot()["core_rpc"]["max_ms"] == 30.0
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_measures_blocked_loop():
+    metrics = ServerMetrics(RpcStats())
+    monitor = asyncio.create_task(metrics.monitor_loop(interval=0.01))
+    await asyncio.sleep(0)
+    time.sleep(0.05)  # Block the loop
+    await asyncio.sleep(0.03)
+    monitor.cancel()
+    assert metrics.snapshot()["loop_lag"]["max_ms"] >= 30
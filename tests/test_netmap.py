@@ -0,0 +1,71 @@
+import ipaddress
+from deltachat_mcp.config import Config
+from deltachat_mcp.netmap import NetworkMap, is_usable_address, local_networks
+from deltachat_mcp.pairing import NetworkDiscovery
+
+ROUTES = """Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT
+lan0\t00000000\t0101A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0
+lan0\t0001A8C0\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0
+docker0\t000011AC\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0
+br-1a2b3c\t000012AC\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0
+veth42\t0000FEA9\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0
+lan0\t0000000A\t0101A8C0\t0003\t0\t0\t0\t0000FFFF\t0\t0\t0
+"""
+
+
+def test_local_networks_skip_bridges_and_gateway_routes(tmp_path):
+    route_path = tmp_path / "route"
+    route_path.write_text(ROUTES)
+    assert local_networks(route_path) == ["192.168.1.0/24"]
+
+
+def test_configured_networks_replace_detection(tmp_path, monkeypatch):
+    route_path = tmp_path / "route"
+    route_path.write_text(ROUTES)
+    discovery = NetworkDiscovery()
+    discovery.network_map.close()
+    discovery.network_map = NetworkMap(route_path)
+    try:
+        assert discovery.get_local_networks() == ["192.168.1.0/24"]
+
+        monkeypatch.setattr(Config, "AUTO_PAIRING_NETWORKS", "10.1.0.0/24, 10.2.0.0/24")
+        assert discovery.get_local_networks() == ["10.1.0.0/24", "10.2.0.0/24"]
+    finally:
+        discovery.network_map.close()
+
+
+def test_direct_addresses_on_bridges_are_not_usable(tmp_path):
+    route_path = tmp_path / "route"
+    route_path.write_text(ROUTES)
+    network_map = NetworkMap(route_path)
+    try:
+        assert network_map.is_usable("192.168.1.5")
+        assert network_map.is_usable("fe80::1")
+        assert not network_map.is_usable("172.17.0.2")  # docker0
+        assert not network_map.is_usable("172.18.0.3")  # br-1a2b3c
+        assert not network_map.is_usable("127.0.0.1")
+    finally:
+        network_map.close()
+    assert not is_usable_address("10.88.0.4")  # another host's podman bridge
+    assert is_usable_address("127.0.0.10", allow_loopback=True)
+
+
+def test_user_defined_docker_networks_are_not_usable(tmp_path, monkeypatch):
+    route_path = tmp_path / "route"
+    route_path.write_text(ROUTES
+                          + "br-9f8e7d\t000014AC\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0\n"
+                          + "lan0\t000510AC\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n")
+    network_map = NetworkMap(route_path)
+    try:
+        # Routed through a br- bridge here, so skipped even without the configured ranges
+        assert not network_map.is_usable("172.20.0.5", container_networks=())
+        # Another host's user-defined network, caught by the default 172.16.0.0/12
+        assert not network_map.is_usable("172.25.0.5")
+        # Our own LAN in the same range stays usable
+        assert network_map.is_usable("172.16.5.20")
+
+        monkeypatch.setattr(Config, "AUTO_PAIRING_CONTAINER_NETWORKS", "10.99.0.0/16, bogus")
+        assert Config.get_container_networks() == (ipaddress.ip_network("10.99.0.0/16"),)
+        assert network_map.is_usable("172.25.0.5", container_networks=Config.get_container_networks())
+    finally:
+        network_map.close()
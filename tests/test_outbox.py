@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from deltachat_mcp.config import Config
+from deltachat_mcp.outbox import Outbox
+
+
+@pytest.mark.asyncio
+async def test_outbox_retries_until_sent(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "OUTBOX_RETRY_BASE", 0.01)
+    calls = []
+
+    async def deliver(entry):
+        calls.append(entry["text"])
+        if len(calls) < 3:
+            raise ConnectionError("SMTP down")
+        return {"message_id": 42, "chat_id": 7}
+
+    outbox = Outbox(tmp_path / "outbox.wal")
+    outbox.ensure_started(deliver)
+    queued = outbox.enqueue("hello", addr="bob@example.org")
+    assert queued["status"] == "queued"
+
+    status = await outbox.wait(queued["outbox_id"], timeout=5)
+    await outbox.stop()
+
+    assert status["status"] == "sent"
+    assert status["attempts"] == 2
+    assert (status["message_id"], status["chat_id"]) == (42, 7)
+    assert calls == ["hello"] * 3
+
+
+@pytest.mark.asyncio
+async def test_outbox_recovers_queued_messages_after_restart(tmp_path):
+    wal = tmp_path / "outbox.wal"
+    first = Outbox(wal)
+    outbox_id = first.enqueue("survives", chat_id=3)["outbox_id"]
+    await first.stop()
+
+    delivered = []
+
+    async def deliver(entry):
+        delivered.append((entry["chat_id"], entry["text"]))
+        return {"message_id": 1, "chat_id": entry["chat_id"]}
+
+    second = Outbox(wal)
+    second.ensure_started(deliver)
+    status = await second.wait(outbox_id, timeout=5)
+    await second.stop()
+
+    assert status["status"] == "sent"
+    assert delivered == [(3, "survives")]
+    assert Outbox(wal).status(outbox_id) is None
+    reopened = Outbox(wal)
+    reopened.open()
+    assert reopened.status(outbox_id)["status"] == "sent"
+
+
+@pytest.mark.asyncio
+async def test_outbox_keeps_order_per_destination(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "OUTBOX_RETRY_BASE", 0.05)
+    sent = []
+    failed_once = set()
+
+    async def deliver(entry):
+        if entry["text"] == "first" and "first" not in failed_once:
+            failed_once.add("first")
+            raise ConnectionError("SMTP down")
+        sent.append(entry["text"])
+        return {"message_id": len(sent), "chat_id": entry["chat_id"]}
+
+    outbox = Outbox(tmp_path / "outbox.wal")
+    ids = [outbox.enqueue(text, chat_id=chat_id)["outbox_id"]
+           for text, chat_id in [("first", 1), ("second", 1), ("other chat", 2)]]
+    await outbox.sync()
+    outbox.ensure_started(deliver)
+    for outbox_id in ids:
+        assert (await outbox.wait(outbox_id, timeout=5))["status"] == "sent"
+    await outbox.stop()
+
+    # The other chat does not wait for chat 1's retry, but "second" does
+    assert sent == ["other chat", "first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_outbox_compacts_off_the_loop_and_keeps_concurrent_appends(tmp_path):
+    wal = tmp_path / "outbox.wal"
+    outbox = Outbox(wal)
+    ids = [outbox.enqueue(f"message {i}", chat_id=1)["outbox_id"] for i in range(3)]
+    outbox._compact_due = True
+
+    syncing = asyncio.ensure_future(outbox.sync())
+    for _ in range(10):
+        if outbox._tail is not None:
+            break
+        await asyncio.sleep(0)
+    assert outbox._tail is not None  # The snapshot is being written in a thread
+    ids.append(outbox.enqueue("during compaction", chat_id=1)["outbox_id"])
+    await syncing
+    await outbox.stop()
+
+    reopened = Outbox(wal)
+    reopened.open()
+    assert [reopened.status(i)["status"] for i in ids] == ["queued"] * 4
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import websockets
+from deltachat_mcp.backup_sources import backup_sources
+from deltachat_mcp.config import Config
+from deltachat_mcp.pairing import AutoPairing, ClientTable, NetworkDiscovery, ScanScheduler, parse_direct_address
+
+
+@pytest.mark.asyncio
+async def test_async_scan_streams_open_hosts():
+    server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        discovery = NetworkDiscovery()
+        clients = [client async for client in discovery.scan_network_async(
+            "127.0.0.0/29", ports=[port, 1], concurrency=8, host_deadline=0.5)]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert [(c["ip"], c["port"]) for c in clients] == [("127.0.0.1", port)]
+    assert clients[0]["network"] == "127.0.0.0/29"
+
+
+def test_parse_direct_address():
+    assert parse_direct_address("192.168.1.5:9933") == [("192.168.1.5", 9933)]
+    assert parse_direct_address("[fe80::1]:42654") == [("fe80::1", 42654)]
+    assert parse_direct_address("10.0.0.2", [1, 2]) == [("10.0.0.2", 1), ("10.0.0.2", 2)]
+    assert parse_direct_address("not-an-ip:80") == []
+
+
+@pytest.mark.asyncio
+async def test_direct_addresses_race_and_cancel_losers(monkeypatch):
+    pairing = AutoPairing()
+    cancelled = []
+
+    async def attempt(client, backup_info, deadline):
+        if client["ip"] == "10.0.0.1":
+            try:
+                await asyncio.sleep(30)  # blackholed address
+            except asyncio.CancelledError:
+                cancelled.append(client["ip"])
+                raise
+        return client["ip"] == "192.168.1.5"
+
+    monkeypatch.setattr(pairing, "_attempt_single_pairing", attempt)
+    backup_info = {"node_id": "n1", "direct_addresses": ["10.0.0.1:9933", "192.168.1.5:9933"]}
+
+    assert await asyncio.wait_for(pairing._pair_direct(backup_info), timeout=5)
+    assert cancelled == ["10.0.0.1"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pairing_skips_refusing_hosts(monkeypatch):
+    async def handler(websocket):
+        request = json.loads(await websocket.recv())
+        accepted = request["node_id"] == "n1"
+        await websocket.send(json.dumps({"type": "pairing_accepted" if accepted else "pairing_rejected"}))
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        pairing = AutoPairing()
+        monkeypatch.setattr(pairing.network_discovery, "get_discovered_clients",
+                            lambda: [{"ip": "127.0.0.1", "port": port}])
+
+        assert not await pairing._pair({"node_id": "other", "direct_addresses": []})
+        assert pairing._recently_refused({"ip": "127.0.0.1", "port": port})
+        assert not await pairing._pair({"node_id": "n1", "direct_addresses": []})
+
+        pairing._refused.clear()
+        assert await pairing._pair({"node_id": "n1", "direct_addresses": []})
+
+
+def test_client_table_reports_only_changes():
+    table = ClientTable(ttl=60)
+    a = {"ip": "10.0.0.2", "port": 9933}
+    b = {"ip": "10.0.0.3", "port": 9933}
+
+    assert table.update([a, b], now=1000) == ([a, b], [])
+    assert table.update([a], now=1030) == ([], [])
+    added, removed = table.update([a], now=1070)
+    assert added == []
+    assert [(c["ip"], c["first_seen"], c["last_seen"]) for c in removed] == [("10.0.0.3", 1000, 1000)]
+    assert [(c["ip"], c["first_seen"], c["last_seen"]) for c in table.clients()] == [("10.0.0.2", 1000, 1070)]
+
+
+def test_scan_scheduler_backs_off_until_something_changes(monkeypatch):
+    monkeypatch.setattr(Config, "AUTO_PAIRING_SCAN_INTERVAL", 30)
+    monkeypatch.setattr(Config, "AUTO_PAIRING_SCAN_MAX_INTERVAL", 200)
+    scheduler = ScanScheduler()
+    assert not scheduler.interfaces_changed(["192.168.1.0/24"])
+
+    delays = []
+    for _ in range(4):
+        scheduler.record_pass(changed=False)
+        delays.append(scheduler.next_delay())
+    assert delays == [60, 120, 200, 200]
+
+    assert scheduler.interfaces_changed(["10.0.0.0/24"])
+    assert scheduler.next_delay() == 30
+
+
+@pytest.mark.asyncio
+async def test_wait_without_route_table_does_not_poll_the_networks(monkeypatch):
+    monkeypatch.setattr(Config, "AUTO_PAIRING_SCAN_INTERVAL", 0.05)
+    discovery = NetworkDiscovery()
+    discovery.network_map.close()
+    discovery.network_map.available = False
+    monkeypatch.setattr(discovery.scheduler, "next_delay", lambda: 0.3)
+    reads = []
+    monkeypatch.setattr(discovery, "get_local_networks", lambda: reads.append(1) or [])
+
+    started = time.monotonic()
+    await discovery._wait_for_next_scan()
+    assert time.monotonic() - started >= 0.3
+    assert reads == []
+
+
+def quiet_pairing(monkeypatch):
+    pairing = AutoPairing()
+    scans = []
+
+    async def scan(networks):
+        scans.append(networks)
+        return []
+
+    monkeypatch.setattr(pairing.network_discovery, "get_local_networks", lambda: ["127.0.0.0/30"])
+    monkeypatch.setattr(pairing.network_discovery, "scan_networks_async", scan)
+    monkeypatch.setattr(pairing, "backup_string", lambda: None)
+    monkeypatch.setattr(backup_sources, "sources", [])
+    return pairing, scans
+
+
+@pytest.mark.asyncio
+async def test_supervisor_runs_on_server_loop_until_paired(monkeypatch):
+    pairing, scans = quiet_pairing(monkeypatch)
+    pairing.start_auto_pairing_service()
+    await asyncio.sleep(0.1)
+    assert scans == [["127.0.0.0/30"]]
+
+    pairing._on_paired()
+    await asyncio.wait_for(pairing.stop(), timeout=5)
+    assert pairing._supervisor.done()
+    assert pairing._stopped.is_set()
+
+
+def test_supervisor_without_loop_uses_one_background_thread(monkeypatch):
+    pairing, scans = quiet_pairing(monkeypatch)
+    pairing.start_auto_pairing_service()
+    pairing.start_auto_pairing_service()
+    time.sleep(0.1)
+    assert scans == [["127.0.0.0/30"]]
+
+    pairing.stop_auto_pairing_service()
+    assert pairing._stopped.is_set()
+    assert [t.name for t in threading.enumerate()].count("dc-auto-pairing") == 1
+
+
+@pytest.mark.asyncio
+async def test_blackholed_direct_addresses_leave_time_for_discovered_clients(monkeypatch):
+    monkeypatch.setattr(Config, "AUTO_PAIRING_TIMEOUT", 1)
+    pairing = AutoPairing()
+    pairing.network_discovery.clients.update([{"ip": "192.168.1.7", "port": 9933}])
+
+    async def attempt(client, backup_info, deadline):
+        if client.get("source") == "direct":
+            await asyncio.sleep(30)  # blackholed address
+        return client["ip"] == "192.168.1.7"
+
+    monkeypatch.setattr(pairing, "_attempt_single_pairing", attempt)
+    backup_info = {"node_id": "n1", "direct_addresses": ["10.0.0.1:9933"]}
+    assert await pairing._pair(backup_info)
+
+
+@pytest.mark.asyncio
+async def test_discovered_clients_start_pairing_without_blocking_the_scan(monkeypatch):
+    pairing = AutoPairing()
+    release = asyncio.Event()
+
+    async def pair(backup_string=None):
+        await release.wait()
+        return True
+
+    monkeypatch.setattr(pairing, "backup_string", lambda: "DCBACKUP3:x")
+    monkeypatch.setattr(pairing, "pair", pair)
+    await asyncio.wait_for(pairing._on_clients_discovered([{"ip": "192.168.1.7", "port": 9933}], []), timeout=1)
+    assert len(pairing._pairing_tasks) == 1
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert not pairing._pairing_tasks
@@ -0,0 +1,67 @@
+import pytest
+from deltachat_mcp.instrumentation import InstrumentedProxy, RpcStats
+from deltachat_mcp.recording import RpcRecorder, ReplayRpc
+
+
+@pytest.mark.asyncio
+async def test_recorded_traffic_replays_offline(tmp_path, fake_account):
+    log = tmp_path / "rpc.jsonl.gz"
+    recorder = RpcRecorder(log, account=fake_account(chats=2, names={1: "alice", 2: "bob"}))
+    account = InstrumentedProxy(fake_account(chats=2, names={1: "alice", 2: "bob"}), RpcStats(), recorder=recorder)
+
+    chats = await account.get_chats()
+    chats[0].is_group()
+    chat = await account.get_chat_by_id(2)
+    await chat.send_text("hello")
+    recorder.close()
+
+    replay = ReplayRpc(log, speed="fast").account()
+    replayed = await replay.get_chats()
+    assert [(c.id, c.name) for c in replayed] == [(1, "alice"), (2, "bob")]
+    assert replayed[0].is_group() is False
+
+    chat = await replay.get_chat_by_id(2)
+    msg = await chat.send_text("hello")
+    assert (msg.id, msg.text) == (102, "hello")
+
+
+def test_replay_rejects_unknown_calls(tmp_path, fake_account):
+    log = tmp_path / "rpc.jsonl"
+    RpcRecorder(log, account=fake_account(chats=2, names={1: "alice", 2: "bob"})).close()
+
+    with pytest.raises(LookupError):
+        ReplayRpc(log).account().get_chats()
+
+
+def test_handles_of_objects_without_id_are_not_reused(tmp_path):
+    class Handle:
+        pass
+
+    recorder = RpcRecorder(tmp_path / "rpc.jsonl")
+    first = Handle()
+    name = recorder._handle(first)
+    assert recorder._handle(first) == name
+    assert recorder._handle(Handle()) != name
+    values = [1]  # Unhashable: kept alive instead of weakly referenced
+    assert recorder._handle(values) == recorder._handle(values)
+    assert recorder._pinned[id(values)][0] is values
+    recorder.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_replay_delay_is_paid_by_next_async_call(tmp_path, fake_account):
+    log = tmp_path / "rpc.jsonl"
+    recorder = RpcRecorder(log, account=fake_account(chats=2, names={1: "alice", 2: "bob"}))
+    account = InstrumentedProxy(fake_account(chats=2, names={1: "alice", 2: "bob"}), RpcStats(), recorder=recorder)
+    chats = await account.get_chats()
+    chats[0].is_group()
+    await account.get_chat_by_id(2)
+    recorder.close()
+
+    replay = ReplayRpc(log, speed=1.0)
+    replayed = await replay.account().get_chats()
+    replay.log.calls[("Chat:1", "is_group")][0]["duration"] = 0.05
+    replayed[0].is_group()
+    assert replay._sync_delay == pytest.approx(0.05)
+    await replay.account().get_chat_by_id(2)
+    assert replay._sync_delay == 0.0
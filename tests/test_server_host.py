@@ -0,0 +1,89 @@
+import asyncio
+import socket
+import time
+
+from deltachat_mcp.server_host import ServerHost
+
+
+def wait_for_state(host, state, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if host.state == state:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FakeServer:
+    def __init__(self, fail=False, port=0):
+        self.fail = fail
+        self.port = port
+        self.started = 0
+        self.cleaned_up = 0
+
+    async def main(self, started):
+        self.started += 1
+        listener = None
+        try:
+            if self.fail:
+                raise RuntimeError("port in use")
+            listener = await asyncio.start_server(lambda r, w: None, "127.0.0.1", self.port)
+            started()
+            await asyncio.Event().wait()
+        finally:
+            if listener is not None:
+                listener.close()
+            self.cleaned_up += 1
+
+
+def test_start_stop_restart():
+    fake = FakeServer()
+    host = ServerHost(fake.main)
+    try:
+        assert host.start()
+        assert wait_for_state(host, 'running')
+        assert not host.start()
+
+        host.restart()
+        assert wait_for_state(host, 'running')
+        assert fake.started == 2
+        assert fake.cleaned_up == 1
+
+        assert host.stop()
+        assert wait_for_state(host, 'stopped')
+        assert fake.cleaned_up == 2
+        states = [state for state, _detail in host.drain_events()]
+        assert states == ['starting', 'running', 'stopping', 'stopped', 'starting', 'running', 'stopping', 'stopped']
+    finally:
+        host.shutdown()
+
+
+def test_failed_server_reports_error_and_can_start_again():
+    fake = FakeServer(fail=True)
+    host = ServerHost(fake.main)
+    try:
+        host.start()
+        assert wait_for_state(host, 'failed')
+        assert ('failed', 'port in use') in host.drain_events()
+
+        fake.fail = False
+        assert host.start()
+        assert wait_for_state(host, 'running')
+    finally:
+        host.shutdown()
+    assert fake.cleaned_up == 2
+
+
+def test_port_in_use_fails_without_reporting_running():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        fake = FakeServer(port=taken.getsockname()[1])
+        host = ServerHost(fake.main)
+        try:
+            host.start()
+            assert wait_for_state(host, 'failed')
+            states = [state for state, _detail in host.drain_events()]
+            assert states == ['starting', 'failed']
+        finally:
+            host.shutdown()
@@ -0,0 +1,80 @@
+import pytest
+from deltachat_mcp import tools
+from deltachat_mcp.cache import chat_cache, message_cache
+from deltachat_mcp.shaping import ELLIPSIS, fit_budget, parse_budget, parse_fields, response_size
+
+
+@pytest.fixture
+def account(monkeypatch, fake_account):
+    account = fake_account(chats=5, messages=10, unread=2, padding=" " + "x" * 200)
+    chat_cache.invalidate()
+    message_cache.invalidate()
+    monkeypatch.setattr(tools, "DeltaChatRPC", lambda: type("Rpc", (), {"get_account": lambda self: account})())
+    yield account
+    chat_cache.invalidate()
+    message_cache.invalidate()
+
+
+def test_parse_fields_and_budget():
+    assert parse_fields({}, ["id", "name"]) is None
+    assert parse_fields({"fields": "name, id,name"}, ["id", "name"]) == ("name", "id")
+    with pytest.raises(ValueError):
+        parse_fields({"fields": ["id", "secret"]}, ["id", "name"])
+    assert parse_budget({"max_chars": 100}) == ("chars", 100)
+    with pytest.raises(ValueError):
+        parse_budget({"max_bytes": 100, "max_chars": 100})
+    with pytest.raises(ValueError):
+        parse_budget({"max_bytes": 0})
+
+
+def test_fit_budget_drops_oldest_rows_then_cuts_texts():
+    rows = [{"id": i, "text": "é" * 100} for i in range(10)]
+    response = fit_budget({"messages": rows}, "messages", ("bytes", 1000), text_field="text")
+    assert response_size(response, "bytes") <= 1000
+    report = response["budget"]
+    kept = response["messages"]
+    assert kept[-1]["id"] == 9 and report["omitted_range"] == [0, 9 - len(kept)]
+    assert report["truncated_texts"] == len(kept)
+    assert kept[0]["text"] == "é" * report["text_limit"] + ELLIPSIS
+
+    untouched = fit_budget({"messages": rows[:1]}, "messages", ("bytes", 1000), text_field="text")
+    assert untouched["messages"] == rows[:1] and untouched["budget"]["omitted"] == 0
+    assert untouched["budget"]["omitted_range"] is None
+    with pytest.raises(ValueError):
+        fit_budget({"messages": rows}, "messages", ("chars", 10), text_field="text")
+
+
+@pytest.mark.asyncio
+async def test_list_chats_projection_skips_unrequested_core_calls(account):
+    result = await tools.list_chats({"fields": ["id", "name"]})
+    assert result["chats"][0] == {"id": 1, "name": "chat 1"}
+    assert account.calls == []
+
+    # A cached projection is not enough for more fields, a full list serves any projection
+    result = await tools.list_chats({})
+    assert result["chats"][0]["unread_count"] == 2
+    calls = len(account.calls)
+    assert (await tools.get_unread_count({}))["unread_count"] == 10
+    assert (await tools.list_chats({"fields": ["is_group"]}))["chats"][0] == {"is_group": False}
+    assert len(account.calls) == calls
+
+
+@pytest.mark.asyncio
+async def test_get_messages_budget_keeps_newest(account):
+    result = await tools.get_messages({"chat_id": 1, "fields": ["id", "text"], "max_chars": 600})
+    assert response_size(result, "chars") <= 600
+    assert result["messages"][-1]["id"] == 10
+    assert set(result["messages"][0]) == {"id", "text"}
+    assert result["budget"]["omitted"] + len(result["messages"]) == 10
+    assert result["budget"]["truncated_texts"] > 0
+
+
+@pytest.mark.asyncio
+async def test_alternating_projections_are_cached_side_by_side(account):
+    await tools.list_chats({"fields": ["is_group"]})
+    await tools.list_chats({"fields": ["unread_count"]})
+    calls = len(account.calls)
+    assert calls > 0
+    assert (await tools.list_chats({"fields": ["is_group"]}))["chats"][0] == {"is_group": False}
+    assert (await tools.list_chats({"fields": ["unread_count"]}))["chats"][0] == {"unread_count": 2}
+    assert len(account.calls) == calls